@@ -1,44 +1,39 @@
-import imaplib
-import email
 import json
 import re
-from email.header import decode_header
-import ssl
 from modules.logger import setup_logger
-import requests
-from dotenv import load_dotenv
 import os
-from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
+from modules.mail_parser import extract_google_links
 from modules.pdf_handler import extract_relevant_pages
 from modules.url_handler import getabstract
+from modules.link_worker import process_links
+from modules import crossref
+from modules.mailbox import MailboxSession
+from modules.checkpoint import MessageTracker
+from modules import record_store
+from modules.paper_record import PaperRecord
+from modules import downloader
 import traceback
 
 class EmailClientGoogleScholar:
-    def __init__(self):
-        self.server = 'imap.gmail.com'
-        self.port = 993
+    # 该来源的发件人地址
+    sender = "scholaralerts-noreply@google.com"
+
+    def __init__(self, mailbox=None):
+        """
+        :param mailbox: 共用的 MailboxSession，为 None 时在 connect 中单独创建
+        """
         self.mail = None
+        self.mailbox = mailbox
+        self._owns_mailbox = mailbox is None
+        self.message_links = {}
         self.logger = setup_logger("EmailClient")
 
     def connect(self):
-        try:
-            # 从 .env 文件中加载邮箱账号和密码
-            load_dotenv()
-            EMAIL_ACCOUNT = os.getenv("EMAIL_ACCOUNT")
-            EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
-
-            # 检查账号和密码是否正确加载
-            if not EMAIL_ACCOUNT or not EMAIL_PASSWORD:
-                raise ValueError("邮箱账号或密码未正确加载，请检查 .env 文件。")
-
-            # 使用 SSL 连接到邮箱
-            context = ssl.create_default_context()
-            self.mail = imaplib.IMAP4_SSL(self.server, self.port, ssl_context=context)
-            self.mail.login(EMAIL_ACCOUNT, EMAIL_PASSWORD)
-            self.logger.info("成功连接到邮箱！")
-        except Exception as e:
-            self.logger.info(f"邮箱连接失败：{e}")
+        # 多个来源共用同一个会话时只会登录一次
+        if self.mailbox is None:
+            self.mailbox = MailboxSession()
+        self.mailbox.connect()
+        self.mail = self.mailbox.mail
 
     def fetch_Google_emails(self, limit=None, date_range=None):
         """
@@ -48,128 +43,37 @@ class EmailClientGoogleScholar:
                           支持最近 N 天（'Nd'）、N 月（'Nm'）、N 年（'Ny'）。
         """
         try:
-            self.mail.select("inbox")
-
-            # 根据 date_range 计算筛选日期
-            if date_range:
-                unit = date_range[-1]  # 获取单位（d, m, y）
-                value = int(date_range[:-1])  # 获取时间值
-                if unit == 'd':  # 最近 N 天
-                    since_date = datetime.now() - timedelta(days=value)
-                elif unit == 'm':  # 最近 N 月
-                    since_date = datetime.now() - timedelta(days=value * 30)
-                elif unit == 'y':  # 最近 N 年
-                    since_date = datetime.now() - timedelta(days=value * 365)
-                else:
-                    raise ValueError("无效的日期范围格式，应为 '10d', '1m' 或 '6m' 等。")
-
-                since_date_str = since_date.strftime("%d-%b-%Y")  # IMAP 日期格式
-                status, messages = self.mail.search(None,
-                                                    f'(UNSEEN FROM "scholaralerts-noreply@google.com" SINCE "{since_date_str}")')
-            else:
-                # 如果没有指定日期范围，获取所有符合条件的邮件
-                status, messages = self.mail.search(None, '(UNSEEN FROM "scholaralerts-noreply@google.com")')
+            email_ids, pending = self.collect_links(limit=limit, date_range=date_range)
 
-            email_ids = messages[0].split()
-            self.logger.info(f"找到 {len(email_ids)} 封符合条件的邮件。")
+            if len(email_ids) == 0:
+                self.logger.info("目前没有新邮件")
+                return {}
 
-            # 如果设置了 limit，则只处理前 limit 封邮件
-            if len(email_ids) > 0 and limit:
-                if limit:
-                    email_ids = email_ids[-limit:]
+            # 先把链接中能解析出的 DOI 交给 Crossref 批量查询
+            crossref.prefetch_links(pending)
 
-            # 遍历邮件并提取链接
+            # 并发处理所有链接，结果按原顺序写回 link_types
+            for link, c in pending.items():
+                self.logger.info("正在处理链接：")
+                self.logger.info(link)
+                self.logger.info(c['title'])
             link_types = {}
+            tracker = MessageTracker(self.message_links, lambda uids: self.mailbox.complete(self.sender, uids))
+            tracker.start()
 
-            if len(email_ids) == 0:
-                self.logger.info("目前没有新邮件")
-                return {}
+            def on_result(link, details):
+                # 每个链接的结果先落盘，邮件中的链接全部完成后再记录断点
+                if details is not None:
+                    self.save_link_types_to_file({link: details})
+                tracker.link_done(link)
 
-            for email_id in email_ids:
-                status, msg_data = self.mail.fetch(email_id, "(RFC822)")
-                for response_part in msg_data:
-                    if isinstance(response_part, tuple):
-                        msg = email.message_from_bytes(response_part[1])
-                        # 获取邮件主题
-                        subject, encoding = decode_header(msg["Subject"])[0]
-                        if isinstance(subject, bytes):
-                            subject = subject.decode(encoding if encoding else "utf-8")
-                        # 获取邮件日期
-                        date = msg["Date"]
-                        # 提取链接和标题
-                        links_and_titles = self._extract_body_and_links(msg)
-                        # 创建字典存储链接和其类型
-                        for link, c in links_and_titles.items():
-                            if any(domain in link for domain in
-                                   ['book', 'search.proquest.com', 'www.rivisteweb.it', 'jov.arvojournals.org',
-                                    'acoustics.org', 'www.researchgate.net']):
-                                continue
-                            self.logger.info("正在处理链接：")
-                            self.logger.info(link)
-                            self.logger.info(c['title'])
-                            title = c['title']
-                            if c['has_pdf']:
-                                filename = title.replace(" ", "_").replace("/", "_") + ".pdf"
-                                file_path = self.download_pdf(link, filename)
-                                # 提取 PDF 摘要
-                                results = extract_relevant_pages(filename)
-                                if isinstance(results, str):
-                                    try:
-                                        results = json.loads(results)
-                                    except json.JSONDecodeError as e:
-                                        self.logger.info(f"Error decoding JSON: {e}")
-                                        results = {}
-                                if isinstance(results, dict):
-                                    link_types[link] = {
-                                        "type": 'PDF',
-                                        "title": title,
-                                        "file_path": file_path,
-                                        "Authors": ", ".join(results.get('authors', [])) if isinstance(results.get('authors'), list) else 'Unknown',
-                                        "Abstract(cn)": results.get('translation', 'Unknown'),
-                                        "Abstract": results.get('abstract', 'Unknown'),
-                                        "Keywords": ", ".join(results.get('keywords', [])) if isinstance(results.get('authors'), list) else 'Unknown',
-                                        "Journal": "Unknown",
-                                        "Year": "Unknown",
-                                        "Volume": "Unknown",
-                                        "Issue": "Unknown",
-                                        "pages": "Unknown",
-                                        "DOI": "Unknown",
-                                        "APA Citation": "Unknown"
-                                    }
-                                else:
-                                    self.logger.info(f"Error: Expected a dictionary but got {type(results)}")
-                                    self.logger.info(f"Error: {results}")
-                            else:
-                                results = getabstract(link)
-                                if isinstance(results, str):
-                                    try:
-                                        results = json.loads(results)
-                                    except json.JSONDecodeError as e:
-                                        self.logger.info(f"Error decoding JSON: {e}")
-                                        results = {}
-                                if isinstance(results, dict):
-                                    link_types[link] = {
-                                        "type": 'HTML',
-                                        "title": title,
-                                        "file_path": 'None',
-                                        "Authors": results.get('authors', None),
-                                        "Abstract(cn)": results.get('translation', None),
-                                        "Abstract": results.get('abstract', None),
-                                        "Keywords": results.get('keywords', None),
-                                        "Journal": results.get('journal', None),
-                                        "Year": results.get('year', None),
-                                        "Volume": results.get('volume', None),
-                                        "Issue": results.get('issue', None),
-                                        "pages": results.get('pages', None),
-                                        "DOI": results.get('doi', None),
-                                        "APA Citation": results.get('apa_citation', None)
-                                    }
-                                else:
-                                    self.logger.info(f"Error: Expected a dictionary but got {type(results)}")
-                                    self.logger.info(f"Error: {results}")
-                # 标记邮件为已读
-                self.mail.store(email_id, '+FLAGS', '\\Seen')
-            self.save_link_types_to_file(link_types)
+            results = process_links(pending.items(), self._process_link, on_result=on_result)
+            for link, details in zip(pending, results):
+                if details is not None:
+                    link_types[link] = details
+
+            # 标记邮件为已读
+            self.mark_seen(email_ids)
 
             return link_types
 
@@ -177,97 +81,110 @@ class EmailClientGoogleScholar:
             self.logger.info(f"获取邮件时出错：{e}，出错位置：{e.__traceback__.tb_lineno}")
             return {}
 
-    def _extract_body_and_links(self, msg):
+    def collect_links(self, limit=None, date_range=None):
+        """
+        搜索符合条件的邮件，并提取其中待处理的链接。
+        :param limit: 限制处理的邮件数量，默认为全部。
+        :param date_range: 按日期筛选邮件（例如 '10d', '1m', '6m'）。
+        :return: (email_ids, pending)，pending 为按出现顺序排列的 {link: info} 字典；
+                 每封邮件包含的链接记录在 self.message_links 中
         """
-        提取邮件正文内容并提取 scholar.google.com 的链接中特定的 URL。
-        :param msg: MIME 邮件对象
-        :return: 包含正文和提取到的链接的字典
+        messages = self.mailbox.messages(self.sender, limit=limit, date_range=date_range)
+        email_ids = [email_id for email_id, _ in messages]
+        self.logger.info(f"找到 {len(email_ids)} 封符合条件的邮件。")
+
+        # 遍历邮件并提取链接
+        pending = {}
+        self.message_links = {email_id: [] for email_id in email_ids}
+        for email_id, html in messages:
+            if not html:
+                continue
+            links_and_titles = self._extract_links_from_html(html)
+            for link, c in links_and_titles.items():
+                if any(domain in link for domain in
+                       ['book', 'search.proquest.com', 'www.rivisteweb.it', 'jov.arvojournals.org',
+                        'acoustics.org', 'www.researchgate.net']):
+                    continue
+                pending[link] = c
+                self.message_links[email_id].append(link)
+
+        return email_ids, pending
+
+    def mark_seen(self, email_ids):
+        """
+        将处理完的邮件标记为已读。
+        :param email_ids: 邮件 UID 列表
         """
+        self.mailbox.mark_seen(email_ids)
 
-        links_and_titles = {}
+    def _process_link(self, link, c):
+        """
+        处理单个链接：下载 PDF 或抓取网页摘要，返回该链接的详细信息。
+        :param link: 文章链接
+        :param c: 包含 title 和 has_pdf 的字典
+        :return: PaperRecord，失败时返回 None
+        """
+        title = c['title']
+        if c['has_pdf']:
+            filename = title.replace(" ", "_").replace("/", "_") + ".pdf"
+            file_path = self.download_pdf(link, filename, title=title)
+            # 提取 PDF 摘要，下载失败或内容不是 PDF 时不再解析
+            results = extract_relevant_pages(file_path) if file_path else None
+            if isinstance(results, str):
+                try:
+                    results = json.loads(results)
+                except json.JSONDecodeError as e:
+                    self.logger.info(f"Error decoding JSON: {e}")
+                    results = {}
+            if isinstance(results, dict):
+                return PaperRecord.from_pdf(results, title, file_path)
+        else:
+            return self._html_details(c, getabstract(link))
+        self.logger.info(f"Error: Expected a dictionary but got {type(results)}")
+        self.logger.info(f"Error: {results}")
+        return None
 
+    def _html_details(self, c, results):
+        """
+        将 getabstract 返回的参考文献整理为 PaperRecord。
+        :param c: 邮件中提取到的链接信息
+        :param results: getabstract 的返回结果
+        :return: PaperRecord，结果无效时返回 None
+        """
+        if isinstance(results, str):
+            try:
+                results = json.loads(results)
+            except json.JSONDecodeError as e:
+                self.logger.info(f"Error decoding JSON: {e}")
+                results = {}
+        if isinstance(results, dict):
+            return PaperRecord.from_reference(results, title=c['title'] or None)
+        self.logger.info(f"Error: Expected a dictionary but got {type(results)}")
+        self.logger.info(f"Error: {results}")
+        return None
+
+    def _extract_links_from_html(self, html_content):
+        """
+        从邮件的 HTML 正文中提取 scholar.google.com 的链接中特定的 URL。
+        :param html_content: 邮件的 HTML 正文
+        :return: 提取到的 {链接: 信息} 字典
+        """
         try:
-            if msg.is_multipart():
-                # 如果是 multipart，遍历每个部分
-                for part in msg.walk():
-                    content_type = part.get_content_type()
-                    content_disposition = str(part.get("Content-Disposition"))
-
-                    # 取 text/plain 部分作为正文
-                    if content_type == "text/plain" and "attachment" not in content_disposition:
-                        body = part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8")
-                    elif content_type == "text/html" and "attachment" not in content_disposition:
-                        html_content = part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8")
-
-                        pdf_flag = False  # 默认没有 PDF 标志
-                        # 使用 BeautifulSoup 解析 HTML 并提取正文
-                        soup = BeautifulSoup(html_content, "html.parser")
-                        # 提取 scholar.google.com 链接和标题
-                        for a_tag in soup.find_all('a', href=True, class_='gse_alrt_title'):
-                            link = a_tag['href']
-                            title = a_tag.get_text()
-                            match = re.search(r"url=(https?://.*?)(?=&hl=en&)", link)
-                            if match:
-                                parent = a_tag.find_parent("h3")
-                                if parent:
-                                    span_tag = parent.find("span")
-                                    if span_tag and "PDF" in span_tag.get_text(strip=True):
-                                        pdf_flag = True
-                                extracted_link = match.group(1)
-                                if '/pdf/' in extracted_link:
-                                    extracted_link = extracted_link.replace('/pdf/', '/full/', 1)
-                                    pdf_flag = False
-                                links_and_titles[extracted_link] = title
-                                links_and_titles[extracted_link] = {
-                                    "title": title,
-                                    "has_pdf": pdf_flag
-                                }
-                                pdf_flag = False
-            else:
-                # 如果不是 multipart，直接提取正文
-                content_type = msg.get_content_type()
-                if content_type == "text/plain":
-                    body = msg.get_payload(decode=True).decode(msg.get_content_charset() or "utf-8")
-                elif content_type == "text/html":
-                    html_content = msg.get_payload(decode=True).decode(msg.get_content_charset() or "utf-8")
-                    pdf_flag = False  # 默认没有 PDF 标志
-                    soup = BeautifulSoup(html_content, "html.parser")
-                    for a_tag in soup.find_all('a', href=True, class_='gse_alrt_title'):
-                        link = a_tag['href']
-                        title = a_tag.get_text()
-                        match = re.search(r"url=(https?://.*?)(?=&hl=en&)", link)
-                        if match:
-                            parent = a_tag.find_parent("h3")
-                            if parent:
-                                span_tag = parent.find("span")
-                                if span_tag and "PDF" in span_tag.get_text(strip=True):
-                                    pdf_flag = True
-                            extracted_link = match.group(1)
-                            if '/pdf/' in extracted_link:
-                                extracted_link = extracted_link.replace('/pdf/', '/full/', 1)
-                                pdf_flag = False
-                            links_and_titles[extracted_link] = title
-                            links_and_titles[extracted_link] = {
-                                "title": title,
-                                "has_pdf": pdf_flag
-                            }
-                            pdf_flag = False
-
-                # 删除特定链接
-                if 'https://scholar.google.com/scholar/images/cleardot.gif' in links_and_titles:
-                    del links_and_titles['https://scholar.google.com/scholar/images/cleardot.gif']
-
+            return extract_google_links(html_content)
         except Exception as e:
             self.logger.info(f"解析邮件正文时出错：{e}")
-
-        return links_and_titles
+            return {}
 
     def save_link_types_to_file(self, link_types, save_folder="output"):
         """
-        将 link_types 中的每个链接对应的字典保存为单独的 txt 文件。
+        将 link_types 保存到记录存储（cache/records.sqlite3），PAPERBOT_TXT_ARCHIVE=1 时
+        另外把每个链接对应的字典存为单独的 txt 文件作为存档。
         :param link_types: 链接类型字典
         :param save_folder: 保存文件的文件夹
         """
+        record_store.save(link_types)
+        if os.getenv("PAPERBOT_TXT_ARCHIVE", "0") != "1":
+            return
         try:
             # 确保保存文件夹存在
             if not os.path.exists(save_folder):
@@ -290,56 +207,22 @@ class EmailClientGoogleScholar:
         except Exception as e:
             self.logger.info(f"保存 link types 文件时出错：{e}")
 
-    def download_pdf(self, link, filename, save_folder="pdf_storage"):
+    def download_pdf(self, link, filename, save_folder="pdf_storage", title=None):
         """
-        下载 PDF 文件并保存到本地。
+        下载 PDF 文件并保存到本地，同一内容的 PDF 只保存一份。
         :param link: PDF 文件链接
-        :param filename: 保存的文件名
-        :param save_folder: 保存文件的文件夹
-        :return: 保存的文件路径
+        :param filename: 下载时使用的文件名
+        :param save_folder: 下载时使用的文件夹
+        :param title: 论文标题，用于识别已下载过的论文
+        :return: 保存的文件路径，下载失败时返回 None
         """
-        try:
-            # 确保保存文件夹存在
-            if not os.path.exists(save_folder):
-                os.makedirs(save_folder)
-
-            # 构建完整路径
-            filename = re.sub(r'[\\/*?:"<>|&;]', '_', filename)
-            file_path = os.path.join(save_folder, filename)
-
-            # 如果文件已存在，跳过下载
-            if os.path.exists(file_path):
-                self.logger.info(f"文件已存在，跳过下载：{file_path}")
-                return None
-
-            # 下载 PDF 文件
-            response = requests.get(link, timeout=10, stream=True)
-            if response.status_code == 200:
-                with open(file_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                self.logger.info(f"PDF 文件已下载并保存到：{file_path}")
-                return file_path
-            else:
-                self.logger.info(f"下载失败，状态码：{response.status_code}")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{link}\n")
-                return None
-        except Exception as e:
-            self.logger.info(f"下载 PDF 时出错：{link} -> {e}")
-            # 将出错链接保存到本地 txt 文件
-            with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                error_file.write(f"{link}\n")
-            return None
+        return downloader.download_pdf(link, filename, save_folder, title=title)
 
     def logout(self):
-        # 退出登录
-        if self.mail:
-            try:
-                self.mail.logout()
-                self.logger.info("成功断开邮箱连接。")
-            except Exception as e:
-                self.logger.info(f"断开连接时出错：{e}")
+        # 退出登录，共用的会话由创建者负责断开
+        if self.mailbox is not None and self._owns_mailbox:
+            self.mailbox.logout()
+        self.mail = None
 
     def check_errortxt(self):
         error_file = os.path.join(os.getcwd(), 'error_links.txt')
@@ -384,22 +267,7 @@ class EmailClientGoogleScholar:
                     self.logger.info(f"Error decoding JSON: {e}")
                     results = {}
             if isinstance(results, dict):
-                link_types[link] = {
-                    "type": 'HTML',
-                    "title": results.get('title', None),
-                    "file_path": 'None',
-                    "Authors": results.get('authors', None),
-                    "Abstract(cn)": results.get('translation', None),
-                    "Abstract": results.get('abstract', None),
-                    "Keywords": results.get('keywords', None),
-                    "Journal": results.get('journal', None),
-                    "Year": results.get('year', None),
-                    "Volume": results.get('volume', None),
-                    "Issue": results.get('issue', None),
-                    "pages": results.get('pages', None),
-                    "DOI": results.get('doi', None),
-                    "APA Citation": results.get('apa_citation', None)
-                }
+                link_types[link] = PaperRecord.from_reference(results)
                 original_link = link.replace('/full/', '/pdf/', 1)
                 links.remove(original_link)
             else:
@@ -1,42 +1,36 @@
-import imaplib
-import email
 import json
 import re
-from email.header import decode_header
-import ssl
 from modules.logger import setup_logger
-import requests
-from dotenv import load_dotenv
 import os
-from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
+from modules.mail_parser import extract_hippocampus_links
 from modules.url_handler import getabstract
+from modules.link_worker import process_links
+from modules import crossref
+from modules.mailbox import MailboxSession
+from modules.checkpoint import MessageTracker
+from modules import record_store
+from modules.paper_record import PaperRecord
 
 class EmailClientHippocampus:
-    def __init__(self):
-        self.server = 'imap.gmail.com'
-        self.port = 993
+    # 该来源的发件人地址
+    sender = "wileyonlinelibrary@wiley.com"
+
+    def __init__(self, mailbox=None):
+        """
+        :param mailbox: 共用的 MailboxSession，为 None 时在 connect 中单独创建
+        """
         self.mail = None
+        self.mailbox = mailbox
+        self._owns_mailbox = mailbox is None
+        self.message_links = {}
         self.logger = setup_logger("EmailClient")
 
     def connect(self):
-        try:
-            # 从 .env 文件中加载邮箱账号和密码
-            load_dotenv()
-            EMAIL_ACCOUNT = os.getenv("EMAIL_ACCOUNT")
-            EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
-
-            # 检查账号和密码是否正确加载
-            if not EMAIL_ACCOUNT or not EMAIL_PASSWORD:
-                raise ValueError("邮箱账号或密码未正确加载，请检查 .env 文件。")
-
-            # 使用 SSL 连接到邮箱
-            context = ssl.create_default_context()
-            self.mail = imaplib.IMAP4_SSL(self.server, self.port, ssl_context=context)
-            self.mail.login(EMAIL_ACCOUNT, EMAIL_PASSWORD)
-            self.logger.info("成功连接到邮箱！")
-        except Exception as e:
-            self.logger.info(f"邮箱连接失败：{e}")
+        # 多个来源共用同一个会话时只会登录一次
+        if self.mailbox is None:
+            self.mailbox = MailboxSession()
+        self.mailbox.connect()
+        self.mail = self.mailbox.mail
 
     def fetch_Hippocampus_emails(self, limit=None, date_range=None):
         """
@@ -46,91 +40,36 @@ class EmailClientHippocampus:
                           支持最近 N 天（'Nd'）、N 月（'Nm'）、N 年（'Ny'）。
         """
         try:
-            self.mail.select("inbox")
-
-            # 根据 date_range 计算筛选日期
-            if date_range:
-                unit = date_range[-1]  # 获取单位（d, m, y）
-                value = int(date_range[:-1])  # 获取时间值
-                if unit == 'd':  # 最近 N 天
-                    since_date = datetime.now() - timedelta(days=value)
-                elif unit == 'm':  # 最近 N 月
-                    since_date = datetime.now() - timedelta(days=value * 30)
-                elif unit == 'y':  # 最近 N 年
-                    since_date = datetime.now() - timedelta(days=value * 365)
-                else:
-                    raise ValueError("无效的日期范围格式，应为 '10d', '1m' 或 '6m' 等。")
-
-                since_date_str = since_date.strftime("%d-%b-%Y")  # IMAP 日期格式
-                status, messages = self.mail.search(None,
-                                                    f'(UNSEEN FROM "wileyonlinelibrary@wiley.com" SINCE "{since_date_str}")')
-            else:
-                # 如果没有指定日期范围，获取所有符合条件的邮件
-                status, messages = self.mail.search(None, '(UNSEEN FROM "wileyonlinelibrary@wiley.com")')
-
-            email_ids = messages[0].split()
-            self.logger.info(f"找到 {len(email_ids)} 封符合条件的邮件。")
-
-            # 如果设置了 limit，则只处理前 limit 封邮件
-            if len(email_ids) > 0 and limit:
-                if limit:
-                    email_ids = email_ids[-limit:]
-
-            # 遍历邮件并提取链接
-            link_types = {}
+            email_ids, pending = self.collect_links(limit=limit, date_range=date_range)
 
             if len(email_ids) == 0:
                 self.logger.info("目前没有新邮件")
                 return {}
 
-            for email_id in email_ids:
-                status, msg_data = self.mail.fetch(email_id, "(RFC822)")
-                for response_part in msg_data:
-                    if isinstance(response_part, tuple):
-                        msg = email.message_from_bytes(response_part[1])
-                        # 获取邮件主题
-                        subject, encoding = decode_header(msg["Subject"])[0]
-                        if isinstance(subject, bytes):
-                            subject = subject.decode(encoding if encoding else "utf-8")
-                        # 获取邮件日期
-                        date = msg["Date"]
-                        # 提取链接和标题
-                        links_and_titles = self._extract_body_and_links(msg)
-                        for link, c in links_and_titles.items():
-                            self.logger.info("正在处理链接：")
-                            self.logger.info(link)
-                            self.logger.info(c['title'])
-                            title = c['title']
-                            results = getabstract(link)
-                            if isinstance(results, str):
-                                try:
-                                    results = json.loads(results)
-                                except json.JSONDecodeError as e:
-                                    self.logger.info(f"Error decoding JSON: {e}")
-                                    results = {}
-                            if isinstance(results, dict):
-                                link_types[link] = {
-                                    "type": 'HTML',
-                                    "title": title,
-                                    "file_path": 'None',
-                                    "Authors": results.get('authors', None),
-                                    "Abstract(cn)": results.get('translation', None),
-                                    "Abstract": results.get('abstract', None),
-                                    "Keywords": results.get('keywords', None),
-                                    "Journal": results.get('journal', None),
-                                    "Year": results.get('year', None),
-                                    "Volume": results.get('volume', None),
-                                    "Issue": results.get('issue', None),
-                                    "pages": results.get('pages', None),
-                                    "DOI": results.get('doi', None),
-                                    "APA Citation": results.get('apa_citation', None)
-                                }
-                            else:
-                                self.logger.info(f"Error: Expected a dictionary but got {type(results)}")
-                                self.logger.info(f"Error: {results}")
-
-                self.mail.store(email_id, '+FLAGS', '\\Seen')
-            self.save_link_types_to_file(link_types)
+            # 先把链接中能解析出的 DOI 交给 Crossref 批量查询
+            crossref.prefetch_links(pending)
+
+            # 并发处理所有链接，结果按原顺序写回 link_types
+            for link, c in pending.items():
+                self.logger.info("正在处理链接：")
+                self.logger.info(link)
+                self.logger.info(c['title'])
+            link_types = {}
+            tracker = MessageTracker(self.message_links, lambda uids: self.mailbox.complete(self.sender, uids))
+            tracker.start()
+
+            def on_result(link, details):
+                # 每个链接的结果先落盘，邮件中的链接全部完成后再记录断点
+                if details is not None:
+                    self.save_link_types_to_file({link: details})
+                tracker.link_done(link)
+
+            results = process_links(pending.items(), self._process_link, on_result=on_result)
+            for link, details in zip(pending, results):
+                if details is not None:
+                    link_types[link] = details
+
+            self.mark_seen(email_ids)
 
             return link_types
 
@@ -138,41 +77,88 @@ class EmailClientHippocampus:
             self.logger.info(f"获取邮件时出错：{e}")
             return {}
 
-    def _extract_body_and_links(self, msg):
+    def collect_links(self, limit=None, date_range=None):
+        """
+        搜索符合条件的邮件，并提取其中待处理的链接。
+        :param limit: 限制处理的邮件数量，默认为全部。
+        :param date_range: 按日期筛选邮件（例如 '10d', '1m', '6m'）。
+        :return: (email_ids, pending)，pending 为按出现顺序排列的 {link: info} 字典；
+                 每封邮件包含的链接记录在 self.message_links 中
         """
-        提取邮件正文内容并提取特定的 URL。
-        :param msg: MIME 邮件对象
-        :return: 包含正文和提取到的链接的字典
+        messages = self.mailbox.messages(self.sender, limit=limit, date_range=date_range)
+        email_ids = [email_id for email_id, _ in messages]
+        self.logger.info(f"找到 {len(email_ids)} 封符合条件的邮件。")
+
+        # 遍历邮件并提取链接
+        pending = {}
+        self.message_links = {email_id: [] for email_id in email_ids}
+        for email_id, html in messages:
+            if not html:
+                continue
+            links_and_titles = self._extract_links_from_html(html)
+            for link, c in links_and_titles.items():
+                pending[link] = c
+                self.message_links[email_id].append(link)
+
+        return email_ids, pending
+
+    def mark_seen(self, email_ids):
         """
+        将处理完的邮件标记为已读。
+        :param email_ids: 邮件 UID 列表
+        """
+        self.mailbox.mark_seen(email_ids)
 
-        links_and_titles = {}
+    def _process_link(self, link, c):
+        """
+        处理单个链接：抓取网页摘要，返回该链接的详细信息。
+        :param link: 文章链接
+        :param c: 包含 title 的字典
+        :return: PaperRecord，失败时返回 None
+        """
+        return self._html_details(c, getabstract(link))
 
+    def _html_details(self, c, results):
+        """
+        将 getabstract 返回的参考文献整理为 PaperRecord。
+        :param c: 邮件中提取到的链接信息
+        :param results: getabstract 的返回结果
+        :return: PaperRecord，结果无效时返回 None
+        """
+        if isinstance(results, str):
+            try:
+                results = json.loads(results)
+            except json.JSONDecodeError as e:
+                self.logger.info(f"Error decoding JSON: {e}")
+                results = {}
+        if isinstance(results, dict):
+            return PaperRecord.from_reference(results, title=c['title'] or None)
+        self.logger.info(f"Error: Expected a dictionary but got {type(results)}")
+        self.logger.info(f"Error: {results}")
+        return None
+
+    def _extract_links_from_html(self, html_content):
+        """
+        从邮件的 HTML 正文中提取文章链接和标题。
+        :param html_content: 邮件的 HTML 正文
+        :return: 提取到的 {链接: 信息} 字典
+        """
         try:
-            # 如果是 multipart，遍历每个部分
-            for part in msg.walk():
-                # 取 text/plain 部分作为正文
-                html_content = part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8")
-
-                # 使用 BeautifulSoup 解析 HTML 并提取正文
-                soup = BeautifulSoup(html_content, "html.parser")
-                for a in soup.find_all('a', class_='issue-item__title', href=True, style=True):
-                    link = a['href']
-                    title = a.find('h5', style=True).get_text(strip=True) if a.find('h5', style=True) else 'No Title'
-                    links_and_titles[link] = {
-                        "title": title
-                    }
-
+            return extract_hippocampus_links(html_content)
         except Exception as e:
             self.logger.info(f"解析邮件正文时出错：{e}")
-
-        return links_and_titles
+            return {}
 
     def save_link_types_to_file(self, link_types, save_folder="output"):
         """
-        将 link_types 中的每个链接对应的字典保存为单独的 txt 文件。
+        将 link_types 保存到记录存储（cache/records.sqlite3），PAPERBOT_TXT_ARCHIVE=1 时
+        另外把每个链接对应的字典存为单独的 txt 文件作为存档。
         :param link_types: 链接类型字典
         :param save_folder: 保存文件的文件夹
         """
+        record_store.save(link_types)
+        if os.getenv("PAPERBOT_TXT_ARCHIVE", "0") != "1":
+            return
         try:
             # 确保保存文件夹存在
             if not os.path.exists(save_folder):
@@ -196,13 +182,10 @@ class EmailClientHippocampus:
             self.logger.info(f"保存 link types 文件时出错：{e}")
 
     def logout(self):
-        # 退出登录
-        if self.mail:
-            try:
-                self.mail.logout()
-                self.logger.info("成功断开邮箱连接。")
-            except Exception as e:
-                self.logger.info(f"断开连接时出错：{e}")
+        # 退出登录，共用的会话由创建者负责断开
+        if self.mailbox is not None and self._owns_mailbox:
+            self.mailbox.logout()
+        self.mail = None
 
 if __name__ == '__main__':
     email_client = EmailClientHippocampus()
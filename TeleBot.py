@@ -1,17 +1,30 @@
 import os
+import random
 import time
 from datetime import datetime
 from modules.logger import setup_logger
-import requests
+from modules import http_client
+from modules import metrics
+from modules import record_store
+from modules.telegram_queue import DeliveryQueue, bucket_for
 from dotenv import load_dotenv
 
 load_dotenv()
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")  # 替换为您的 Token
 CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")  # 替换为您的 Chat ID
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")  # 本地测试时可指向替身服务器
+script_dir = os.path.dirname(os.path.abspath(__file__))  # 当前脚本所在目录
+
+# 发送失败（429、5xx、网络错误）后的重试次数，以及指数退避的初始和最长等待时间（秒）
+DEFAULT_RETRIES = 5
+BACKOFF_BASE = 1
+BACKOFF_MAX = 30
+
 
 class TelegramBot:
     """
     一个用于发送 Telegram 消息的类，包含文件夹内容读取和消息发送功能。
+    消息先进入发送队列，按会话限速、打包发送，未送达的消息保存在 cache/telegram_outbox.json。
     """
 
     def __init__(self, bot_token, chat_id):
@@ -24,38 +37,111 @@ class TelegramBot:
         self.bot_token = bot_token
         self.chat_id = chat_id
         self.logger = setup_logger("TelegramBot")
+        self.retries = int(os.getenv("PAPERBOT_TELEGRAM_RETRIES", DEFAULT_RETRIES))
+        outbox = os.getenv("PAPERBOT_TELEGRAM_OUTBOX", os.path.join(script_dir, "cache", "telegram_outbox.json"))
+        self.queue = DeliveryQueue(self._deliver, outbox)
+
+    def _deliver(self, chat_id, text):
+        return self.send_message(text, chat_id=chat_id)
 
-    def send_message(self, message):
+    def send_message(self, message, chat_id=None):
         """
-        发送消息到 Telegram Bot
+        发送消息到 Telegram Bot，遇到 429 按服务器要求的时间等待，遇到 5xx 和网络错误按指数退避重试。
         :param message: 要发送的消息
+        :param chat_id: 目标 Chat ID，默认使用初始化时的 Chat ID
+        :return: 送达返回 True，消息本身有问题无法送达返回 False，重试用尽仍失败返回 None
         """
-        try:
-
-            url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
-            payload = {
-                "chat_id": self.chat_id,
-                "text": message,
-                "parse_mode": "HTML"  # 支持 HTML 格式化
-            }
-            response = requests.post(url, json=payload)
+        chat_id = chat_id or self.chat_id
+        bucket = bucket_for(chat_id)
+        url = f"{TELEGRAM_API_URL.rstrip('/')}/bot{self.bot_token}/sendMessage"
+        payload = {
+            "chat_id": chat_id,
+            "text": message,
+            "parse_mode": "HTML"  # 支持 HTML 格式化
+        }
+        for attempt in range(self.retries + 1):
+            bucket.acquire()
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+            try:
+                with metrics.timer("telegram"):
+                    response = http_client.post(url, json=payload)
+            except Exception as e:
+                self.logger.info(f"发送消息时出错：{e}")
+                metrics.incr("telegram_messages_total", status="error")
+                time.sleep(delay)
+                continue
+
+            metrics.incr("telegram_messages_total", status=response.status_code)
+            if response.status_code == 200:
+                self.logger.info("消息发送成功")
+                return True
             if response.status_code == 429:
-                retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+                try:
+                    retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+                except ValueError:
+                    retry_after = 1
                 self.logger.info(f"速率限制，等待 {retry_after} 秒后重试")
-                time.sleep(retry_after + 1)
-            elif response.status_code == 200:
-                self.logger.info("消息发送成功")
+                # 清空令牌桶，同一会话的其他消息也一起等待
+                bucket.pause(retry_after)
+            elif response.status_code >= 500:
+                self.logger.info(f"Telegram 服务器错误，状态码：{response.status_code}，{delay:.1f} 秒后重试")
+                time.sleep(delay)
+            elif response.status_code == 400 and "parse_mode" in payload:
+                # 摘要中的 < > & 会让 HTML 解析失败，改为纯文本再发一次
+                self.logger.info(f"HTML 解析失败，改为纯文本发送：{response.text}")
+                payload.pop("parse_mode")
             else:
                 self.logger.info(f"消息发送失败，状态码：{response.status_code}，原因：{response.text}")
+                return False
+        self.logger.info(f"重试 {self.retries} 次后仍未送达")
+        return None
 
-        except Exception as e:
-            self.logger.info(f"发送消息时出错：{e}")
+    def enqueue(self, message):
+        """
+        把消息加入发送队列，立即返回。
+        :param message: 要发送的消息
+        """
+        self.queue.put(self.chat_id, message)
+
+    def flush(self, timeout=None):
+        """
+        等待发送队列中的消息全部送达。
+        :param timeout: 最长等待时间（秒）
+        :return: 全部送达时返回 True
+        """
+        done = self.queue.flush(timeout)
+        if not done:
+            self.logger.info(f"还有 {len(self.queue)} 条消息未送达，下次运行时继续发送")
+        return done
+
+    def send_record(self, link, details):
+        """
+        直接发送一篇论文的记录，内容格式与 output 文件夹中的 txt 文件一致。
+        :param link: 文章链接
+        :param details: 链接详细信息字典
+        """
+        lines = [f"Link: {link}"] + [f"{key}: {value}" for key, value in details.items()]
+        self.enqueue("\n".join(lines) + "\n\n")
+
+    def send_records(self, link_types):
+        """
+        发送本次运行收集到的所有论文记录，并等待全部送达。
+        :param link_types: {链接: 链接详细信息字典}
+        """
+        for link, details in link_types.items():
+            self.send_record(link, details)
+        self.flush()
 
     def process_folder(self, folder_path):
         """
-        读取指定文件夹中的所有 .txt 文件并发送内容到 Telegram。
+        发送今天写入的论文记录。优先从记录存储按日期查询，记录存储不可用时才扫描文件夹中的 .txt 文件。
         :param folder_path: 文件夹路径
         """
+        records = record_store.records_on(datetime.now().date())
+        if records is not None:
+            self.logger.info(f"记录存储中今天共有 {len(records)} 篇论文")
+            self.send_records(records)
+            return
         try:
             if not os.path.exists(folder_path):
                 self.logger.info(f"文件夹不存在：{folder_path}")
@@ -78,11 +164,12 @@ class TelegramBot:
                         content = file.read()
                         self.logger.info(f"读取文件：{filename}")
 
-                    # 发送内容到 Telegram
-                    self.send_message(content)
+                    # 加入发送队列，短消息会拼成一条发送
+                    self.enqueue(content)
 
         except Exception as e:
             self.logger.info(f"处理文件夹时出错：{e}")
+        self.flush()
 
 
 if __name__ == "__main__":
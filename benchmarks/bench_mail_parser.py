@@ -0,0 +1,213 @@
+"""
+邮件正文解析的微基准：比较原来的 BeautifulSoup(html.parser) 实现与 modules/mail_parser 的 lxml 实现。
+
+用法：
+    python benchmarks/bench_mail_parser.py --corpus saved_alerts/      # 保存下来的 .eml / .html 提醒邮件
+    python benchmarks/bench_mail_parser.py --synthetic 50              # 没有样本时生成模拟邮件
+
+每个文件会按内容自动识别来源（Google Scholar、Stork、Hippocampus），
+两种实现的结果必须一致，否则会列出不一致的文件。
+"""
+import argparse
+import email
+import os
+import re
+import sys
+import time
+
+script_dir = os.path.dirname(os.path.abspath(__file__))  # 当前脚本所在目录
+project_root = os.path.abspath(os.path.join(script_dir, ".."))  # 项目根目录
+sys.path.insert(0, project_root)
+
+from bs4 import BeautifulSoup  # noqa: E402
+from modules.mail_parser import (  # noqa: E402
+    extract_google_links, extract_stork_links, extract_hippocampus_links
+)
+
+
+def bs4_google_links(html_content):
+    # 原 EmailClientGoogleScholar._extract_body_and_links 中的解析逻辑
+    links_and_titles = {}
+    pdf_flag = False
+    soup = BeautifulSoup(html_content, "html.parser")
+    for a_tag in soup.find_all('a', href=True, class_='gse_alrt_title'):
+        link = a_tag['href']
+        title = a_tag.get_text()
+        match = re.search(r"url=(https?://.*?)(?=&hl=en&)", link)
+        if match:
+            parent = a_tag.find_parent("h3")
+            if parent:
+                span_tag = parent.find("span")
+                if span_tag and "PDF" in span_tag.get_text(strip=True):
+                    pdf_flag = True
+            extracted_link = match.group(1)
+            if '/pdf/' in extracted_link:
+                extracted_link = extracted_link.replace('/pdf/', '/full/', 1)
+                pdf_flag = False
+            links_and_titles[extracted_link] = {"title": title, "has_pdf": pdf_flag}
+            pdf_flag = False
+    links_and_titles.pop('https://scholar.google.com/scholar/images/cleardot.gif', None)
+    return links_and_titles
+
+
+def bs4_stork_links(html_content):
+    # 原 EmailClientStork._extract_body_and_links 中的解析逻辑
+    links_and_titles = {}
+    soup = BeautifulSoup(html_content, "html.parser")
+    for div_tag in soup.find_all('div', id=True):
+        a_tag = div_tag.find('a', href=True, target=True)
+        if a_tag and a_tag['href'].startswith('https://www.storkapp.me'):
+            href = a_tag['href']
+            match1 = re.search(r'url=\[pubmed[^\]]+\](https?://[^?\s&]+)', href)
+            match2 = re.search(r'url=(https?://[^\s]+)', href)
+            if match1:
+                extracted_link = match1.group(1)
+                title = a_tag.get_text()
+                if '/pdf/' in extracted_link:
+                    extracted_link = extracted_link.replace('/pdf/', '/full/', 1)
+                links_and_titles[extracted_link] = {"title": title, "stork_flag": False}
+            if match2:
+                links_and_titles[match2.group(1)] = {"title": False, "stork_flag": True}
+    return links_and_titles
+
+
+def bs4_hippocampus_links(html_content):
+    # 原 EmailClientHippocampus._extract_body_and_links 中的解析逻辑
+    links_and_titles = {}
+    soup = BeautifulSoup(html_content, "html.parser")
+    for a in soup.find_all('a', class_='issue-item__title', href=True, style=True):
+        link = a['href']
+        title = a.find('h5', style=True).get_text(strip=True) if a.find('h5', style=True) else 'No Title'
+        links_and_titles[link] = {"title": title}
+    return links_and_titles
+
+
+PARSERS = {
+    "google": (bs4_google_links, extract_google_links),
+    "stork": (bs4_stork_links, extract_stork_links),
+    "hippocampus": (bs4_hippocampus_links, extract_hippocampus_links),
+}
+
+
+def detect_source(html_content):
+    """
+    按内容判断邮件来源。
+    :param html_content: HTML 正文
+    :return: 来源名称，无法识别时返回 None
+    """
+    if 'gse_alrt_title' in html_content:
+        return "google"
+    if 'storkapp.me' in html_content:
+        return "stork"
+    if 'issue-item__title' in html_content:
+        return "hippocampus"
+    return None
+
+
+def html_from_file(path):
+    """
+    读取 .html 文件，或从 .eml 文件中取出 text/html 部分。
+    :param path: 文件路径
+    :return: HTML 文本，没有 HTML 部分时返回 None
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    if not path.lower().endswith(".eml"):
+        return data.decode("utf-8", errors="replace")
+    msg = email.message_from_bytes(data)
+    for part in msg.walk():
+        if part.get_content_type() == "text/html" and "attachment" not in str(part.get("Content-Disposition")):
+            return part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="replace")
+    return None
+
+
+def load_corpus(folder):
+    corpus = []
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith((".eml", ".html", ".htm")):
+            continue
+        html_content = html_from_file(os.path.join(folder, name))
+        source = detect_source(html_content) if html_content else None
+        if source:
+            corpus.append((name, source, html_content))
+        else:
+            print(f"跳过无法识别的文件：{name}")
+    return corpus
+
+
+def synthetic_corpus(count, entries=10):
+    """
+    生成模拟的提醒邮件，结构与真实邮件的相关部分一致，并带有大段无关的样式和表格。
+    """
+    filler = "<table>" + "<tr><td style='padding:4px'><img src='cid:logo'/>&nbsp;</td></tr>" * 40 + "</table>"
+    corpus = []
+    for n in range(count):
+        google = "".join(
+            f"<h3><span>[PDF]</span> <a class='gse_alrt_title' href='https://scholar.google.com/scholar_url?"
+            f"url=https://example.org/pdf/{n}-{i}.pdf&amp;hl=en&amp;sa=X'>Paper {n}-{i} on memory</a></h3>"
+            f"<div>Authors {i}</div>{filler}"
+            for i in range(entries)
+        )
+        stork = "".join(
+            f"<div id='item{i}'><a target='_blank' href='https://www.storkapp.me/r?"
+            f"url=[pubmed {n}{i}]https://doi.org/10.1000/{n}.{i}?x=1'>Stork paper {n}-{i}</a></div>{filler}"
+            for i in range(entries)
+        )
+        hippocampus = "".join(
+            f"<a class='issue-item__title' style='color:#000' href='https://onlinelibrary.wiley.com/doi/10.1002/hipo.{n}{i}'>"
+            f"<h5 style='margin:0'> Hippocampal paper <i>{n}-{i}</i> </h5></a>{filler}"
+            for i in range(entries)
+        )
+        for source, body in (("google", google), ("stork", stork), ("hippocampus", hippocampus)):
+            corpus.append((f"synthetic-{source}-{n}", source, f"<html><body>{body}</body></html>"))
+    return corpus
+
+
+def bench(corpus, repeat):
+    totals = {}
+    mismatches = []
+    for name, source, html_content in corpus:
+        old, new = PARSERS[source]
+        if old(html_content) != new(html_content):
+            mismatches.append(name)
+        for label, parser in (("bs4", old), ("lxml", new)):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                parser(html_content)
+            elapsed = time.perf_counter() - start
+            stats = totals.setdefault(source, {"files": 0, "bytes": 0, "bs4": 0.0, "lxml": 0.0})
+            stats[label] += elapsed
+        stats["files"] += 1
+        stats["bytes"] += len(html_content.encode("utf-8"))
+    return totals, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较 BeautifulSoup 与 lxml 的邮件解析耗时")
+    parser.add_argument("--corpus", help="保存的提醒邮件文件夹（.eml / .html）")
+    parser.add_argument("--synthetic", type=int, default=0, help="每个来源生成的模拟邮件数")
+    parser.add_argument("--repeat", type=int, default=5, help="每个文件重复解析的次数")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else []
+    if args.synthetic or not corpus:
+        corpus += synthetic_corpus(args.synthetic or 20)
+
+    totals, mismatches = bench(corpus, args.repeat)
+    print(f"{'来源':<12}{'文件数':>8}{'KB':>10}{'bs4 ms/封':>12}{'lxml ms/封':>12}{'加速比':>8}")
+    for source, stats in sorted(totals.items()):
+        runs = stats["files"] * args.repeat
+        bs4_ms = stats["bs4"] * 1000 / runs
+        lxml_ms = stats["lxml"] * 1000 / runs
+        speedup = bs4_ms / lxml_ms if lxml_ms else float("inf")
+        print(f"{source:<12}{stats['files']:>8}{stats['bytes'] / 1024:>10.1f}{bs4_ms:>12.3f}{lxml_ms:>12.3f}{speedup:>8.1f}x")
+
+    if mismatches:
+        print(f"\n以下 {len(mismatches)} 个文件两种实现的结果不一致：")
+        for name in mismatches:
+            print(f"  {name}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
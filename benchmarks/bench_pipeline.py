@@ -0,0 +1,253 @@
+"""
+端到端吞吐基准：在本地替身服务（benchmarks/standins.py）上完整运行 paperbot，
+从 IMAP 取信、Crossref 查询、页面抓取、翻译，到 Telegram 推送和 Markdown 生成，不访问外网。
+
+用法：
+    python benchmarks/bench_pipeline.py --papers 60                 # 模拟语料，同步模式
+    python benchmarks/bench_pipeline.py --papers 60 --mode async    # 异步流水线
+    python benchmarks/bench_pipeline.py --corpus recorded/ --json result.json
+    python benchmarks/bench_pipeline.py --save-corpus recorded/     # 保存模拟语料，便于固定基准数据
+
+输出每秒处理的论文数、各阶段耗时的 p50 / p95，以及进程的峰值内存。
+替身服务运行在子进程中，不计入峰值内存。
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+script_dir = os.path.dirname(os.path.abspath(__file__))  # 当前脚本所在目录
+project_root = os.path.abspath(os.path.join(script_dir, ".."))  # 项目根目录
+sys.path.insert(0, project_root)
+
+from benchmarks import corpus as corpus_module  # noqa: E402
+from benchmarks import standins  # noqa: E402
+
+
+class StageTimer:
+    """
+    按阶段记录每次调用的耗时，多线程安全。
+    """
+
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    def wrap(self, stage, func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def timed_async(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.add(stage, time.perf_counter() - start)
+            return timed_async
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return timed
+
+    def patch(self, owner, name, stage):
+        setattr(owner, name, self.wrap(stage, getattr(owner, name)))
+
+    def summary(self):
+        result = {}
+        for stage, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            result[stage] = {
+                "count": len(ordered),
+                "p50_ms": percentile(ordered, 50) * 1000,
+                "p95_ms": percentile(ordered, 95) * 1000,
+                "total_s": sum(ordered),
+            }
+        return result
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 的单位是 KB，macOS 是字节
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def configure_environment(workdir, imap_port, http_port):
+    """
+    把 paperbot 的所有外部依赖指向替身服务，缓存和断点写到临时目录。
+    必须在导入 paperbot 之前调用。
+    """
+    base = f"http://127.0.0.1:{http_port}"
+    os.environ.update({
+        "PAPERBOT_IMAP_HOST": "127.0.0.1",
+        "PAPERBOT_IMAP_PORT": str(imap_port),
+        "PAPERBOT_IMAP_SSL": "0",
+        "EMAIL_ACCOUNT": "bench@example.org",
+        "EMAIL_PASSWORD": "bench",
+        "HTTP_PROXY": base,
+        "http_proxy": base,
+        "NO_PROXY": "127.0.0.1,localhost",
+        "no_proxy": "127.0.0.1,localhost",
+        "CROSSREF_API_URL": f"{base}/crossref",
+        "OPENAI_BASE_URL": f"{base}/openai/v1",
+        "OPENAI_API_KEY": "bench",
+        "TELEGRAM_API_URL": f"{base}/telegram",
+        "TELEGRAM_BOT_TOKEN": "bench",
+        "TELEGRAM_CHAT_ID": "1",
+        # 替身服务没有速率限制，不按 Telegram 的会话限速等待
+        "PAPERBOT_TELEGRAM_RATE": "1000",
+        "PAPERBOT_TELEGRAM_OUTBOX": os.path.join(workdir, "telegram_outbox.json"),
+        "PAPERBOT_CACHE_PATH": os.path.join(workdir, "results.sqlite3"),
+        "PAPERBOT_TRANSLATION_MEMO": os.path.join(workdir, "translations.sqlite3"),
+        "PAPERBOT_CHECKPOINT_PATH": os.path.join(workdir, "mail_checkpoint.json"),
+        "PAPERBOT_RECORD_STORE": os.path.join(workdir, "records.sqlite3"),
+        "PAPERBOT_MARKDOWN_MANIFEST": os.path.join(workdir, "markdown_manifest.json"),
+        "PAPERBOT_METRICS_REPORT": os.path.join(workdir, "metrics.json"),
+    })
+
+
+def instrument(timer):
+    """
+    给流水线的各个阶段加上计时。
+    """
+    import paperbot
+    import TeleBot
+    import markdown_write
+    from modules import mailbox, crossref, url_handler, translator, async_pipeline
+
+    timer.patch(mailbox.MailboxSession, "prefetch", "imap_prefetch")
+    timer.patch(mailbox.MailboxSession, "mark_seen", "imap_store")
+    timer.patch(crossref, "_fetch_many", "crossref_batch")
+    timer.patch(crossref, "_fetch_single", "crossref_single")
+    timer.patch(url_handler, "scrape_abstract", "scrape")
+    timer.patch(translator, "translate_single", "translate")
+    timer.patch(translator, "translate_batch", "translate_batch")
+    timer.patch(translator, "translate_async", "translate")
+    for client in (paperbot.EmailClientGoogleScholar, paperbot.EmailClientHippocampus, paperbot.EmailClientStork):
+        timer.patch(client, "_process_link", "paper")
+    timer.patch(async_pipeline.AsyncPipeline, "_process", "paper")
+    timer.patch(TeleBot.TelegramBot, "send_message", "telegram")
+    timer.patch(markdown_write.MarkdownHandler, "save_markdown_file", "markdown")
+    return paperbot
+
+
+def fetch_stats(http_port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{http_port}/stats", timeout=5) as response:
+        return json.load(response)
+
+
+def report(result):
+    print(f"模式：{result['mode']}  论文：{result['papers']}  用时：{result['wall_s']:.2f} s  "
+          f"吞吐：{result['papers_per_s']:.2f} 篇/s  峰值内存：{result['peak_rss_mb'] or 0:.1f} MB")
+    print(f"\n{'阶段':<18}{'次数':>8}{'p50 ms':>10}{'p95 ms':>10}{'合计 s':>10}")
+    for stage, stats in result["stages"].items():
+        print(f"{stage:<18}{stats['count']:>8}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['total_s']:>10.2f}")
+    print("\n替身服务收到的请求：" + "，".join(f"{k} {v}" for k, v in sorted(result["requests"].items())))
+    print("\n计数器：")
+    for counter in result["metrics"]["counters"]:
+        labels = ",".join(f"{k}={v}" for k, v in counter["labels"].items())
+        print(f"  {counter['name']}{{{labels}}} {counter['value']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在本地替身服务上运行 paperbot 的端到端吞吐基准")
+    parser.add_argument("--corpus", help="录制好的语料文件夹（emails/*.eml、pages.json、works.json）")
+    parser.add_argument("--papers", type=int, default=60, help="模拟语料的论文数")
+    parser.add_argument("--per-email", type=int, default=5, help="模拟语料中每封邮件的论文数")
+    parser.add_argument("--crossref-abstracts", type=float, default=0.5, help="Crossref 元数据带摘要的比例")
+    parser.add_argument("--save-corpus", help="把使用的语料保存到该文件夹")
+    parser.add_argument("--mode", choices=("sync", "async"), default="sync", help="运行 run_sync 或 run_async")
+    parser.add_argument("--latency", action="append", default=[], metavar="类型=毫秒",
+                        help="替身服务的延迟，例如 page=200、openai=800；类型见 standins.DEFAULT_LATENCY")
+    parser.add_argument("--json", help="把结果写入 JSON 文件，便于比较不同版本")
+    parser.add_argument("--verbose", action="store_true", help="保留 paperbot 的日志输出")
+    args = parser.parse_args()
+    if args.json:
+        # 运行时会切换到临时目录
+        args.json = os.path.abspath(args.json)
+
+    if args.corpus:
+        corpus = corpus_module.load_corpus(args.corpus)
+    else:
+        corpus = corpus_module.synthetic_corpus(args.papers, args.per_email, args.crossref_abstracts)
+    if args.save_corpus:
+        corpus_module.save_corpus(corpus, args.save_corpus)
+    latency = {kind: float(ms) for kind, ms in (item.split("=", 1) for item in args.latency)}
+
+    context = multiprocessing.get_context("spawn")
+    ready = context.Queue()
+    server = context.Process(target=standins.serve, args=(corpus, latency, ready), daemon=True)
+    server.start()
+    try:
+        imap_port, http_port = ready.get(timeout=60)
+        workdir = tempfile.mkdtemp(prefix="paperbot-bench-")
+        configure_environment(workdir, imap_port, http_port)
+        os.chdir(workdir)
+
+        if not args.verbose:
+            logging.disable(logging.CRITICAL)
+        timer = StageTimer()
+        paperbot = instrument(timer)
+        from modules import metrics
+        paperbot.MARKDOWN_FOLDER = os.path.join(workdir, "markdown")
+        logger = logging.getLogger("bench")
+
+        start = time.perf_counter()
+        if args.mode == "async":
+            paperbot.run_async(logger)
+        else:
+            paperbot.run_sync(logger)
+        wall = time.perf_counter() - start
+
+        output = os.path.join(workdir, paperbot.OUTPUT_FOLDER)
+        markdown = paperbot.MARKDOWN_FOLDER
+        papers = len(os.listdir(markdown)) if os.path.isdir(markdown) else 0
+        result = {
+            "mode": args.mode,
+            "papers": papers,
+            "txt_files": len(os.listdir(output)) if os.path.isdir(output) else 0,
+            "wall_s": wall,
+            "papers_per_s": papers / wall if wall else 0.0,
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": timer.summary(),
+            "requests": fetch_stats(http_port),
+            "metrics": metrics.report(),
+            "workdir": workdir,
+        }
+    finally:
+        server.terminate()
+
+    report(result)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(result, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+端到端基准使用的语料：提醒邮件、出版商页面和 Crossref 元数据。
+
+语料是一个字典：
+    {"emails": [RFC822 字节串, ...], "pages": {链接: HTML}, "works": {DOI: Crossref message}}
+
+可以用 synthetic_corpus 生成，也可以从录制好的文件夹读取：
+    <folder>/emails/*.eml     保存下来的提醒邮件
+    <folder>/pages.json       {链接: HTML}
+    <folder>/works.json       {DOI: Crossref message}
+"""
+import json
+import os
+import random
+from datetime import datetime
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import format_datetime
+
+GOOGLE_SENDER = "scholaralerts-noreply@google.com"
+HIPPOCAMPUS_SENDER = "wileyonlinelibrary@wiley.com"
+STORK_SENDER = "support@storkapp.me"
+
+# 模拟邮件中的内嵌图片，用来体现只下载 HTML 部分的效果
+INLINE_IMAGE = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 64
+
+WORDS = ("memory hippocampus consolidation sleep attention network cortex learning replay "
+         "encoding retrieval plasticity theta oscillation spatial navigation episodic").split()
+
+
+def _sentence(rng, words=18):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _abstract(rng):
+    return " ".join(_sentence(rng) for _ in range(8))
+
+
+def _work(doi, title, abstract, rng):
+    work = {
+        "DOI": doi,
+        "title": [title],
+        "author": [{"given": rng.choice(["Ana", "Wei", "Sam", "Lea"]), "family": rng.choice(["Li", "Ng", "Roy", "Kim"])}
+                   for _ in range(3)],
+        "container-title": ["Journal of Synthetic Neuroscience"],
+        "created": {"date-parts": [[2024, 5, 1]]},
+        "volume": "12",
+        "issue": "3",
+        "page": "100-120",
+    }
+    if abstract:
+        work["abstract"] = f"<jats:title>Abstract</jats:title><jats:p>{abstract}</jats:p>"
+    return work
+
+
+def _email(sender, subject, html_body):
+    msg = MIMEMultipart("mixed")
+    msg["From"] = sender
+    msg["To"] = "bench@example.org"
+    msg["Subject"] = subject
+    msg["Date"] = format_datetime(datetime.now().astimezone())
+    alternative = MIMEMultipart("alternative")
+    alternative.attach(MIMEText("This alert is best viewed as HTML.", "plain", "utf-8"))
+    alternative.attach(MIMEText(html_body, "html", "utf-8"))
+    msg.attach(alternative)
+    image = MIMEImage(INLINE_IMAGE, _subtype="png")
+    image.add_header("Content-Disposition", "inline", filename="logo.png")
+    msg.attach(image)
+    return msg.as_bytes()
+
+
+def _paper(source, index, rng, crossref_abstract_ratio, pages, works):
+    """
+    生成一篇论文的链接，并登记对应的出版商页面和 Crossref 元数据。
+    :return: (链接, 标题)
+    """
+    title = f"Synthetic paper {index} on {rng.choice(WORDS)} and {rng.choice(WORDS)}"
+    abstract = _abstract(rng)
+    with_crossref_abstract = rng.random() < crossref_abstract_ratio
+
+    if source == "google" and index % 10 == 0:
+        # 链接中没有 DOI 的出版商，只能抓取页面
+        doi = f"10.1016/j.synth.2024.{index:06d}"
+        url = f"http://www.sciencedirect.com/science/article/pii/S0000000024{index:06d}"
+        pages[url] = (
+            f"<html><body><h1>{title}</h1>"
+            f"<div class=\"u-margin-s-bottom\" id=\"sp0010\">{abstract}</div>"
+            f"<a class=\"anchor doi anchor-primary\" title=\"Persistent link using digital object identifier\" "
+            f"href=\"https://doi.org/{doi}\">https://doi.org/{doi}</a></body></html>"
+        )
+    elif source == "google":
+        doi = f"10.1177/09567976{index:06d}"
+        url = f"http://journals.sagepub.com/doi/{doi}"
+        pages[url] = (
+            f"<html><body><h1>{title}</h1><div role=\"paragraph\">{abstract}</div>"
+            f"<a property=\"sameAs\" href=\"https://doi.org/{doi}\">https://doi.org/{doi}</a></body></html>"
+        )
+    elif source == "hippocampus":
+        doi = f"10.1002/hipo.{index:06d}"
+        url = f"http://onlinelibrary.wiley.com/doi/full/{doi}"
+        pages[url] = (
+            f"<html><body><h1>{title}</h1><div class=\"article-section__content en main\"><p>{abstract}</p></div>"
+            f"<a class=\"epub-doi\" href=\"https://doi.org/{doi}\">https://doi.org/{doi}</a></body></html>"
+        )
+    else:
+        doi = f"10.1080/02699931.2024.{index:06d}"
+        url = f"http://www.tandfonline.com/doi/full/{doi}"
+        pages[url] = (
+            f"<html><body><h1>{title}</h1><p class=\"last\">{abstract}</p>"
+            f"<ul><li class=\"dx-doi\">https://doi.org/{doi}</li></ul></body></html>"
+        )
+
+    works[doi] = _work(doi, title, abstract if with_crossref_abstract else None, rng)
+    return url, title
+
+
+def synthetic_corpus(papers=60, per_email=5, crossref_abstract_ratio=0.5, seed=0):
+    """
+    生成模拟语料，论文平均分给 Google Scholar、Hippocampus、Stork 三个来源。
+    :param papers: 论文总数
+    :param per_email: 每封提醒邮件包含的论文数
+    :param crossref_abstract_ratio: Crossref 元数据带摘要的比例，其余论文需要抓取页面
+    :param seed: 随机种子
+    :return: 语料字典
+    """
+    rng = random.Random(seed)
+    pages, works, emails = {}, {}, []
+    sources = ("google", "hippocampus", "stork")
+    by_source = {source: [] for source in sources}
+    for index in range(papers):
+        source = sources[index % len(sources)]
+        by_source[source].append(_paper(source, index, rng, crossref_abstract_ratio, pages, works))
+
+    for source, entries in by_source.items():
+        for start in range(0, len(entries), per_email):
+            chunk = entries[start:start + per_email]
+            if source == "google":
+                body = "".join(
+                    f"<h3 style=\"font-weight:normal\"><a class=\"gse_alrt_title\" "
+                    f"href=\"https://scholar.google.com/scholar_url?url={url}&amp;hl=en&amp;sa=X\">{title}</a></h3>"
+                    f"<div style=\"color:#006621\">A Author, B Author - Journal, 2024</div>"
+                    for url, title in chunk
+                )
+                emails.append(_email(GOOGLE_SENDER, "New articles", f"<html><body>{body}</body></html>"))
+            elif source == "hippocampus":
+                body = "".join(
+                    f"<a class=\"issue-item__title\" style=\"color:#000\" href=\"{url}\">"
+                    f"<h5 style=\"margin:0\">{title}</h5></a>"
+                    for url, title in chunk
+                )
+                emails.append(_email(HIPPOCAMPUS_SENDER, "Hippocampus: new issue", f"<html><body>{body}</body></html>"))
+            else:
+                body = "".join(
+                    f"<div id=\"paper{n}\"><a target=\"_blank\" "
+                    f"href=\"https://www.storkapp.me/pubpaper/{n}?url=[pubmed {n}]{url}\">{title}</a></div>"
+                    for n, (url, title) in enumerate(chunk, start)
+                )
+                emails.append(_email(STORK_SENDER, "Stork alert", f"<html><body>{body}</body></html>"))
+
+    return {"emails": emails, "pages": pages, "works": works}
+
+
+def load_corpus(folder):
+    """
+    读取录制好的语料文件夹。
+    :param folder: 语料文件夹
+    :return: 语料字典
+    """
+    corpus = {"emails": [], "pages": {}, "works": {}}
+    email_folder = os.path.join(folder, "emails")
+    if os.path.isdir(email_folder):
+        for name in sorted(os.listdir(email_folder)):
+            if name.lower().endswith(".eml"):
+                with open(os.path.join(email_folder, name), 'rb') as file:
+                    corpus["emails"].append(file.read())
+    for key in ("pages", "works"):
+        path = os.path.join(folder, f"{key}.json")
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                corpus[key] = json.load(file)
+    return corpus
+
+
+def save_corpus(corpus, folder):
+    """
+    把语料保存为文件夹，便于固定一份基准数据或手动替换为真实邮件和页面。
+    :param corpus: 语料字典
+    :param folder: 目标文件夹
+    """
+    os.makedirs(os.path.join(folder, "emails"), exist_ok=True)
+    for index, raw in enumerate(corpus["emails"]):
+        with open(os.path.join(folder, "emails", f"{index:04d}.eml"), 'wb') as file:
+            file.write(raw)
+    for key in ("pages", "works"):
+        with open(os.path.join(folder, f"{key}.json"), 'w', encoding='utf-8') as file:
+            json.dump(corpus[key], file, ensure_ascii=False, indent=2)
@@ -0,0 +1,451 @@
+"""
+基准测试用的本地替身服务：IMAP 邮箱，以及一个同时充当出版商页面代理、Crossref、
+OpenAI 和 Telegram 接口的 HTTP 服务器。所有响应都来自语料（见 benchmarks/corpus.py），
+每类请求可以配置固定延迟，用来模拟真实网络的往返时间。
+
+HTTP 路由：
+    GET  http://<出版商>/...                  通过 HTTP_PROXY 转发过来的页面请求（仅支持 http://）
+    GET  /crossref/works/<doi>              单个 DOI
+    GET  /crossref/works?filter=doi:a,...   批量查询
+    POST /openai/v1/chat/completions        单条翻译和 json_schema 批量翻译
+    POST /telegram/bot<token>/sendMessage
+    GET  /stats                             各类请求的次数
+"""
+import email
+import json
+import re
+import socketserver
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from email.utils import parseaddr, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+# 各类请求的默认延迟（毫秒）
+DEFAULT_LATENCY = {"imap": 20, "page": 150, "crossref": 80, "openai": 600, "telegram": 40}
+
+SEARCH_TOKEN = re.compile(r'\(|\)|"(?:[^"\\]|\\.)*"|[^\s()]+')
+FETCH_ITEM = re.compile(r'BODY(\.PEEK)?\[([^\]]*)\]|BODYSTRUCTURE|UID|FLAGS|RFC822')
+
+
+def _quote(value):
+    if value is None:
+        return "NIL"
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _unquote(token):
+    if token.startswith('"') and token.endswith('"'):
+        return re.sub(r'\\(.)', r'\1', token[1:-1])
+    return token
+
+
+def bodystructure(part):
+    """
+    按 RFC 3501 生成邮件部分的 BODYSTRUCTURE。
+    :param part: email.message.Message
+    :return: BODYSTRUCTURE 字符串
+    """
+    if part.is_multipart():
+        children = "".join(bodystructure(child) for child in part.get_payload())
+        return f"({children} {_quote(part.get_content_subtype().upper())})"
+
+    payload = part.get_payload()
+    maintype, subtype = part.get_content_maintype(), part.get_content_subtype()
+    params = part.get_params() or []
+    params = " ".join(f"{_quote(k.upper())} {_quote(v)}" for k, v in params[1:])
+    encoding = (part.get("Content-Transfer-Encoding") or "7bit").upper()
+    fields = (f"{_quote(maintype.upper())} {_quote(subtype.upper())} {f'({params})' if params else 'NIL'} "
+              f"NIL NIL {_quote(encoding)} {len(payload)}")
+    if maintype == "text":
+        fields += f" {payload.count(chr(10))}"
+    disposition = part.get_content_disposition()
+    disposition = f"({_quote(disposition.upper())} NIL)" if disposition else "NIL"
+    return f"({fields} NIL {disposition} NIL)"
+
+
+class StoredMessage:
+    def __init__(self, uid, raw):
+        # IMAP 要求 CRLF 换行
+        self.uid = uid
+        self.raw = re.sub(rb'\r?\n', b'\r\n', raw)
+        self.message = email.message_from_bytes(self.raw)
+        self.sender = parseaddr(self.message.get("From", ""))[1].lower()
+        try:
+            self.date = parsedate_to_datetime(self.message["Date"]).date()
+        except (TypeError, ValueError):
+            self.date = datetime.now().date()
+        self.flags = set()
+        self.bodystructure = bodystructure(self.message)
+
+    def section(self, name):
+        """
+        取出 BODY[<name>] 对应的字节串。
+        """
+        header, _, body = self.raw.partition(b"\r\n\r\n")
+        upper = name.upper()
+        if not name:
+            return self.raw
+        if upper == "TEXT":
+            return body
+        if upper == "HEADER":
+            return header + b"\r\n\r\n"
+        if upper.startswith("HEADER.FIELDS"):
+            fields = re.findall(r'[^\s()"]+', name[len("HEADER.FIELDS"):])
+            lines = "".join(f"{field}: {self.message[field]}\r\n" for field in fields if self.message[field])
+            return (lines + "\r\n").encode("utf-8")
+
+        part = self.message
+        for index in name.split("."):
+            if part.is_multipart():
+                part = part.get_payload()[int(index) - 1]
+            elif index != "1":
+                return b""
+        return part.get_payload().encode("ascii", "surrogateescape")
+
+
+class ImapState:
+    """
+    替身邮箱的内容和计数器，多个连接共用。
+    """
+
+    def __init__(self, emails, latency=0.0):
+        self.messages = [StoredMessage(uid, raw) for uid, raw in enumerate(emails, 1)]
+        self.latency = latency
+        self.commands = Counter()
+        self.lock = threading.Lock()
+
+    def select(self, spec, by_uid):
+        """
+        按 UID 集合或序号集合选出邮件。
+        :return: (序号, StoredMessage) 列表
+        """
+        largest = self.messages[-1].uid if by_uid and self.messages else len(self.messages)
+        ranges = []
+        for item in spec.split(","):
+            low, _, high = item.partition(":")
+            low = largest if low == "*" else int(low)
+            high = low if not high else (largest if high == "*" else int(high))
+            ranges.append((min(low, high), max(low, high)))
+        return [(seq, message) for seq, message in enumerate(self.messages, 1)
+                if any(low <= (message.uid if by_uid else seq) <= high for low, high in ranges)]
+
+    def search(self, criteria, by_uid):
+        stack = [[]]
+        for token in SEARCH_TOKEN.findall(criteria):
+            if token == "(":
+                stack.append([])
+            elif token == ")":
+                group = stack.pop()
+                stack[-1].append(group)
+            else:
+                stack[-1].append(token)
+        found = []
+        for seq, message in enumerate(self.messages, 1):
+            if self._match_all(stack[0], message, seq, by_uid):
+                found.append(message.uid if by_uid else seq)
+        return found
+
+    def _match_all(self, tokens, message, seq, by_uid):
+        pos, matched = 0, True
+        while pos < len(tokens):
+            ok, pos = self._match(tokens, pos, message, seq, by_uid)
+            matched = matched and ok
+        return matched
+
+    def _match(self, tokens, pos, message, seq, by_uid):
+        token = tokens[pos]
+        pos += 1
+        if isinstance(token, list):
+            return self._match_all(token, message, seq, by_uid), pos
+        key = token.upper()
+        if key == "ALL":
+            return True, pos
+        if key in ("SEEN", "UNSEEN"):
+            return ("\\Seen" in message.flags) == (key == "SEEN"), pos
+        if key == "FROM":
+            return _unquote(tokens[pos]).lower() in message.sender, pos + 1
+        if key == "SINCE":
+            since = datetime.strptime(_unquote(tokens[pos]), "%d-%b-%Y").date()
+            return message.date >= since, pos + 1
+        if key == "UID":
+            return any(m is message for _, m in self.select(tokens[pos], True)), pos + 1
+        if key == "NOT":
+            ok, pos = self._match(tokens, pos, message, seq, by_uid)
+            return not ok, pos
+        if key == "OR":
+            first, pos = self._match(tokens, pos, message, seq, by_uid)
+            second, pos = self._match(tokens, pos, message, seq, by_uid)
+            return first or second, pos
+        if key[0].isdigit():
+            return any(m is message for _, m in self.select(token, False)), pos
+        raise ValueError(f"不支持的搜索条件：{token}")
+
+
+class ImapHandler(socketserver.StreamRequestHandler):
+    """
+    实现 MailboxSession 用到的 IMAP4rev1 命令子集。
+    """
+    disable_nagle_algorithm = True
+
+    def send(self, data):
+        self.wfile.write(data if isinstance(data, bytes) else data.encode("utf-8"))
+
+    def handle(self):
+        state = self.server.state
+        self.send("* OK IMAP4rev1 stand-in ready\r\n")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            tag, _, rest = line.decode("utf-8").rstrip("\r\n").partition(" ")
+            command, _, args = rest.partition(" ")
+            command = command.upper()
+            by_uid = command == "UID"
+            if by_uid:
+                command, _, args = args.partition(" ")
+                command = command.upper()
+            with state.lock:
+                state.commands[("UID " if by_uid else "") + command] += 1
+            if state.latency:
+                time.sleep(state.latency)
+            try:
+                if self.dispatch(tag, command, args, by_uid):
+                    return
+            except Exception as e:
+                self.send(f"{tag} BAD {e}\r\n")
+
+    def dispatch(self, tag, command, args, by_uid):
+        state = self.server.state
+        if command == "CAPABILITY":
+            self.send("* CAPABILITY IMAP4rev1 AUTH=PLAIN\r\n")
+        elif command in ("SELECT", "EXAMINE"):
+            self.send(f"* {len(state.messages)} EXISTS\r\n* 0 RECENT\r\n"
+                      f"* OK [UIDVALIDITY 1] UIDs valid\r\n"
+                      f"* OK [UIDNEXT {len(state.messages) + 1}] Predicted next UID\r\n")
+            self.send(f"{tag} OK [READ-WRITE] {command} completed\r\n")
+            return False
+        elif command == "SEARCH":
+            with state.lock:
+                found = state.search(args, by_uid)
+            self.send(f"* SEARCH {' '.join(map(str, found))}\r\n".replace(" \r\n", "\r\n"))
+        elif command == "FETCH":
+            self.fetch(args, by_uid)
+        elif command == "STORE":
+            spec, mode, flags = args.split(" ", 2)
+            flags = set(re.findall(r'\\?\w+', flags))
+            with state.lock:
+                for _, message in state.select(spec, by_uid):
+                    if mode.upper().startswith("-"):
+                        message.flags -= flags
+                    elif mode.upper().startswith("+"):
+                        message.flags |= flags
+                    else:
+                        message.flags = set(flags)
+        elif command == "LOGOUT":
+            self.send("* BYE stand-in logging out\r\n")
+            self.send(f"{tag} OK LOGOUT completed\r\n")
+            return True
+        elif command not in ("LOGIN", "NOOP", "CLOSE"):
+            self.send(f"{tag} BAD unsupported command {command}\r\n")
+            return False
+        self.send(f"{tag} OK {command} completed\r\n")
+        return False
+
+    def fetch(self, args, by_uid):
+        state = self.server.state
+        spec, _, items = args.partition(" ")
+        wanted = list(FETCH_ITEM.finditer(items))
+        with state.lock:
+            selected = state.select(spec, by_uid)
+        for seq, message in selected:
+            pieces = [f"UID {message.uid}".encode()] if by_uid else []
+            for item in wanted:
+                name = item.group(0)
+                if name == "UID":
+                    if not by_uid:
+                        pieces.append(f"UID {message.uid}".encode())
+                elif name == "BODYSTRUCTURE":
+                    pieces.append(b"BODYSTRUCTURE " + message.bodystructure.encode("utf-8"))
+                elif name == "FLAGS":
+                    pieces.append(f"FLAGS ({' '.join(sorted(message.flags))})".encode())
+                else:
+                    section = item.group(2) if item.group(0).startswith("BODY") else ""
+                    data = message.section(section or "")
+                    label = f"BODY[{section}]" if name.startswith("BODY") else "RFC822"
+                    pieces.append(f"{label} {{{len(data)}}}\r\n".encode() + data)
+                    # 不带 PEEK 的 BODY[] 会把邮件标记为已读
+                    if not item.group(1):
+                        with state.lock:
+                            message.flags.add("\\Seen")
+            self.send(f"* {seq} FETCH (".encode() + b" ".join(pieces) + b")\r\n")
+
+
+class ImapServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, state):
+        super().__init__(address, ImapHandler)
+        self.state = state
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """
+    出版商页面代理、Crossref、OpenAI、Telegram 四类接口共用的处理器。
+    """
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分两次写出，开启 Nagle 算法会额外多出一次延迟确认的等待
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body, ensure_ascii=False).encode("utf-8") if content_type == "application/json" \
+                else body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def delay(self, kind):
+        fixture = self.server.fixture
+        with fixture.lock:
+            fixture.requests[kind] += 1
+        if fixture.latency.get(kind):
+            time.sleep(fixture.latency[kind])
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        fixture = self.server.fixture
+        if self.path.startswith("http://"):
+            self.delay("page")
+            page = fixture.page(self.path)
+            if page is None:
+                return self.reply(404, "<html><body>Not Found</body></html>", "text/html")
+            return self.reply(200, page, "text/html")
+
+        parsed = urlparse(self.path)
+        if parsed.path == "/stats":
+            with fixture.lock:
+                return self.reply(200, dict(fixture.requests))
+        if parsed.path == "/crossref/works":
+            self.delay("crossref_batch")
+            query = parse_qs(parsed.query)
+            dois = [d.split(":", 1)[1] for d in ",".join(query.get("filter", [""])).split(",") if d.startswith("doi:")]
+            items = [fixture.works[d.lower()] for d in dois if d.lower() in fixture.works]
+            return self.reply(200, {"status": "ok", "message-type": "work-list",
+                                    "message": {"total-results": len(items), "items": items}})
+        if parsed.path.startswith("/crossref/works/"):
+            self.delay("crossref")
+            work = fixture.works.get(unquote(parsed.path[len("/crossref/works/"):]).lower())
+            if work is None:
+                return self.reply(404, "Resource not found.", "text/plain")
+            return self.reply(200, {"status": "ok", "message-type": "work", "message": work})
+        self.reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        if path.endswith("/chat/completions"):
+            self.delay("openai")
+            return self.reply(200, completion(self.read_json()))
+        if path.startswith("/telegram/bot") and path.endswith("/sendMessage"):
+            self.delay("telegram")
+            payload = self.read_json()
+            return self.reply(200, {"ok": True, "result": {"message_id": 1, "chat": {"id": payload.get("chat_id")},
+                                                           "text": payload.get("text", "")}})
+        self.reply(404, {"error": "not found"})
+
+    def do_CONNECT(self):
+        # 不做 TLS 拦截，语料中的出版商链接需要使用 http://
+        self.reply(501, "HTTPS is not supported by the stand-in proxy", "text/plain")
+
+
+def _translation(text):
+    return "【译文】" + " ".join(text.split())[:200]
+
+
+def completion(request):
+    """
+    根据请求生成 OpenAI Chat Completions 格式的响应。
+    带 json_schema 的批量翻译请求会按提示中的 JSON 数组逐条返回。
+    """
+    prompt = request.get("messages", [{}])[-1].get("content", "")
+    if (request.get("response_format") or {}).get("type") == "json_schema":
+        match = re.search(r'\n\n(\[.*\])\n\n', prompt, re.S)
+        items = json.loads(match.group(1)) if match else []
+        content = json.dumps({"translations": [{"id": item["id"], "translation": _translation(item["abstract"])}
+                                               for item in items]}, ensure_ascii=False)
+    else:
+        text = prompt.split("\n\n")[1] if prompt.count("\n\n") >= 2 else prompt
+        content = _translation(text)
+    prompt_tokens = sum(len(m.get("content", "")) for m in request.get("messages", [])) // 4
+    completion_tokens = len(content) // 2
+    return {
+        "id": "chatcmpl-standin",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "gpt-4o-mini"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+class Fixture:
+    def __init__(self, pages, works, latency):
+        # 页面按去掉协议和结尾斜杠的链接查找
+        self.pages = {self.key(url): html for url, html in pages.items()}
+        self.works = {doi.lower(): work for doi, work in works.items()}
+        self.latency = latency
+        self.requests = Counter()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(url):
+        return url.split("://", 1)[-1].rstrip("/")
+
+    def page(self, url):
+        return self.pages.get(self.key(url))
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, fixture):
+        super().__init__(address, FixtureHandler)
+        self.fixture = fixture
+
+
+def start(corpus, latency=None, host="127.0.0.1"):
+    """
+    在后台线程中启动两个替身服务，端口由系统分配。
+    :param corpus: 语料字典
+    :param latency: {请求类型: 毫秒} 字典，未指定的类型使用 DEFAULT_LATENCY
+    :return: (imap_server, http_server)
+    """
+    latency = {**DEFAULT_LATENCY, **(latency or {})}
+    seconds = {kind: ms / 1000 for kind, ms in latency.items()}
+    seconds.setdefault("crossref_batch", seconds.get("crossref", 0))
+    imap = ImapServer((host, 0), ImapState(corpus["emails"], seconds.get("imap", 0)))
+    http = FixtureServer((host, 0), Fixture(corpus["pages"], corpus["works"], seconds))
+    for server in (imap, http):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return imap, http
+
+
+def serve(corpus, latency, ready):
+    """
+    子进程入口：启动替身服务，把端口放入 ready 队列后一直运行，直到进程被终止。
+    """
+    imap, http = start(corpus, latency)
+    ready.put((imap.server_address[1], http.server_address[1]))
+    threading.Event().wait()
@@ -1,37 +1,97 @@
+import hashlib
+import json
 import os
+import re
+import threading
 from datetime import datetime
 from pathlib import Path
 from modules.logger import setup_logger
+from modules import metrics
+from modules import record_store
+from modules.paper_record import LEGACY_KEYS
+
+script_dir = os.path.dirname(os.path.abspath(__file__))  # 当前脚本所在目录
+
+# 生成内容的结束标记，标记之后是用户自己写的笔记，更新时原样保留
+GENERATED_END = "<!-- paperbot:end -->"
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 
 class MarkdownHandler:
-    def __init__(self, output_folder, markdown_folder):
+    def __init__(self, output_folder, markdown_folder, incremental=None):
         """
         初始化 MarkdownHandler
         :param output_folder: 存储 txt 文件的文件夹路径
         :param markdown_folder: 存储生成 markdown 文件的文件夹路径
+        :param incremental: 是否只写入有变化的笔记，默认开启，PAPERBOT_MARKDOWN_SYNC=0 时每次都覆盖
         """
         self.output_folder = output_folder
         self.markdown_folder = markdown_folder
         self.logger = setup_logger("MarkdownHandler")
+        if incremental is None:
+            incremental = os.getenv("PAPERBOT_MARKDOWN_SYNC", "1") != "0"
+        self.incremental = incremental
+        # 清单记录每篇笔记生成内容的哈希和上次写入后的文件大小、修改时间，放在项目的 cache 文件夹，不随笔记库同步
+        self.manifest_path = os.getenv("PAPERBOT_MARKDOWN_MANIFEST",
+                                       os.path.join(script_dir, "cache", "markdown_manifest.json"))
+        self.manifest = self._load_manifest() if incremental else {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._deferred = False
 
         # 确保 markdown 文件夹存在
         Path(self.markdown_folder).mkdir(parents=True, exist_ok=True)
 
+    def _load_manifest(self):
+        try:
+            if os.path.exists(self.manifest_path):
+                with open(self.manifest_path, 'r', encoding='utf-8') as file:
+                    return json.load(file)
+        except Exception as e:
+            self.logger.info(f"读取 Markdown 清单时出错：{e}")
+        return {}
+
+    def save_manifest(self):
+        """
+        保存清单，没有变化时不写入。
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+                tmp_path = self.manifest_path + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as file:
+                    json.dump(self.manifest, file, ensure_ascii=False)
+                os.replace(tmp_path, self.manifest_path)
+                self._dirty = False
+            except Exception as e:
+                self.logger.info(f"保存 Markdown 清单时出错：{e}")
+
     def process_txt_to_dict(self, txt_path):
         """
-        将 txt 文件内容解析为字典
+        将 txt 文件内容解析为字典。只有以已知键开头的行才开始一个新字段，
+        摘要等多行内容的后续行（包括其中带冒号的行）追加到上一个字段。
         :param txt_path: txt 文件路径
         :return: 字典
         """
+        known_keys = {"Link", *LEGACY_KEYS.values()}
         data_dict = {}
         try:
             with open(txt_path, 'r', encoding='utf-8') as file:
+                key = None
                 for line in file:
-                    line = line.strip()
-                    if ":" in line:
-                        key, value = map(str.strip, line.split(":", 1))  # 以冒号分割，最多分割一次
-                        data_dict[key] = value
+                    line = line.rstrip("\n")
+                    name, sep, value = line.partition(":")  # 以冒号分割，最多分割一次
+                    if sep and name.strip() in known_keys:
+                        key = name.strip()
+                        data_dict[key] = value.strip()
+                    elif key is not None:
+                        data_dict[key] += "\n" + line
+            data_dict = {key: value.strip() for key, value in data_dict.items()}
         except Exception as e:
             self.logger.info(f"解析 TXT 文件时出错：{e}")
         return data_dict
@@ -76,24 +136,137 @@ Citation：
             citation=data_dict.get('APA Citation', '')
         )
 
+    @metrics.timed("markdown")
     def save_markdown_file(self, markdown_content, filename):
         """
-        保存 markdown 内容为 .md 文件
+        保存 markdown 内容为 .md 文件。增量模式下内容没有变化的笔记不会重写，
+        结束标记之后用户写的内容会保留。
         :param markdown_content: 生成的 markdown 内容
         :param filename: 文件名（不包含扩展名）
         """
         markdown_path = os.path.join(self.markdown_folder, f"{filename}.md")
         try:
-            with open(markdown_path, 'w', encoding='utf-8') as file:
-                file.write(markdown_content)
-            self.logger.info(f"Markdown 文件已保存到：{markdown_path}")
+            if not self.incremental:
+                self._write_atomic(markdown_path, markdown_content)
+                self.logger.info(f"Markdown 文件已保存到：{markdown_path}")
+                return
+            result = self._sync_note(markdown_path, markdown_content)
+            metrics.incr("markdown_notes_total", result=result)
+            if result == "written":
+                self.logger.info(f"Markdown 文件已保存到：{markdown_path}")
+            elif result == "kept":
+                self.logger.info(f"笔记已被手动修改且没有结束标记，保留原文件：{markdown_path}")
+            if not self._deferred:
+                self.save_manifest()
         except Exception as e:
             self.logger.info(f"保存 Markdown 文件时出错：{e}")
 
+    def _write_atomic(self, path, content):
+        # 先写同一文件夹中的临时文件再替换，同步软件不会读到写了一半的笔记
+        folder, name = os.path.split(path)
+        tmp_path = os.path.join(folder, f".{name}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        os.replace(tmp_path, path)
+
+    def _remember(self, path, generated_hash, content):
+        stat = os.stat(path)
+        entry = {
+            "generated": generated_hash,
+            "file": _sha256(content),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+        with self._lock:
+            if self.manifest.get(path) != entry:
+                self.manifest[path] = entry
+                self._dirty = True
+
+    def _sync_note(self, path, generated):
+        """
+        把生成的内容合并进笔记。
+        :param path: 笔记路径
+        :param generated: 生成的 markdown 内容
+        :return: written（已写入）、unchanged（没有变化）或 kept（保留用户修改过的旧笔记）
+        """
+        generated_hash = _sha256(generated)
+        with self._lock:
+            entry = self.manifest.get(path)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stat = None
+
+        # 生成内容和文件本身都没变时不需要读取文件
+        if (entry and stat and entry.get("generated") == generated_hash
+                and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns):
+            return "unchanged"
+
+        existing = None
+        if stat is not None:
+            with open(path, 'r', encoding='utf-8') as file:
+                existing = file.read()
+
+        head = generated.rstrip("\n") + "\n\n" + GENERATED_END
+        if existing is None:
+            content = head + "\n"
+        elif GENERATED_END in existing:
+            content = head + existing.split(GENERATED_END, 1)[1]
+        elif (entry and entry.get("file") == _sha256(existing)) or existing.strip() == generated.strip():
+            # 之前版本生成、没有被修改过的笔记，补上结束标记
+            content = head + "\n"
+        else:
+            return "kept"
+
+        if content != existing:
+            self._write_atomic(path, content)
+            self._remember(path, generated_hash, content)
+            return "written"
+        self._remember(path, generated_hash, content)
+        return "unchanged"
+
+    def process_record(self, link, details):
+        """
+        直接根据一篇论文的记录生成 markdown 文件，无需先写入再解析 txt 文件。
+        :param link: 文章链接
+        :param details: 链接详细信息字典
+        """
+        data_dict = {"Link": link}
+        for key, value in details.items():
+            data_dict[key] = str(value).strip()
+
+        title = re.sub(r'[\\/*?:"<>|&;]', '_', str(details.get("title", "unknown_title")))
+        markdown_content = self.fill_markdown_template(data_dict, title)
+        self.save_markdown_file(markdown_content, title)
+
+    def process_records(self, link_types):
+        """
+        根据本次运行收集到的所有论文记录生成 markdown 文件。
+        :param link_types: {链接: 链接详细信息字典}
+        """
+        # 整批处理完后再保存一次清单
+        self._deferred = True
+        try:
+            for link, details in link_types.items():
+                try:
+                    self.process_record(link, details)
+                except Exception as e:
+                    self.logger.info(f"生成 Markdown 文件时出错：{link} -> {e}")
+        finally:
+            self._deferred = False
+            self.save_manifest()
+
     def process_all_txt_files(self):
         """
-        遍历 output 文件夹中的所有 txt 文件，生成对应的 markdown 文件
+        为今天写入的论文记录生成 markdown 文件。优先从记录存储按日期查询，
+        记录存储不可用时才遍历 output 文件夹中的 txt 文件。
         """
+        records = record_store.records_on(datetime.now().date())
+        if records is not None:
+            self.logger.info(f"记录存储中今天共有 {len(records)} 篇论文")
+            self.process_records(records)
+            return
+
         if not os.path.exists(self.output_folder):
             self.logger.info(f"输出文件夹不存在：{self.output_folder}")
             return
@@ -0,0 +1,140 @@
+import asyncio
+import os
+from urllib.parse import urlparse
+from modules.logger import setup_logger
+from modules import crossref
+from modules.url_handler import getabstract_async
+from modules.checkpoint import MessageTracker
+from modules import metrics
+
+log = setup_logger("async_pipeline")
+
+DEFAULT_MAX_WORKERS = 6
+DEFAULT_PER_DOMAIN_LIMIT = 2
+
+
+class AsyncPipeline:
+    """
+    异步流水线：三个邮件来源同时抓取，链接经队列交给处理协程，
+    每篇论文处理完成后立即交给输出回调（Telegram、Markdown）。
+    """
+
+    def __init__(self, sources, on_record=None, max_workers=None, per_domain_limit=None):
+        """
+        :param sources: (名称, 邮件客户端) 列表，客户端需提供 connect、collect_links、message_links、
+                        mark_seen、logout、_process_link、_html_details、save_link_types_to_file
+        :param on_record: 每篇论文完成后调用的回调 on_record(link, details)
+        :param max_workers: 同时处理的最大链接数
+        :param per_domain_limit: 每个域名的最大并发数
+        """
+        self.sources = sources
+        self.on_record = on_record
+        self.max_workers = max_workers or int(os.getenv("PAPERBOT_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+        self.per_domain_limit = per_domain_limit or int(os.getenv("PAPERBOT_PER_DOMAIN_LIMIT", DEFAULT_PER_DOMAIN_LIMIT))
+        self._domains = {}
+        self._seen_links = set()
+        self._trackers = {}
+
+    def _domain_semaphore(self, link):
+        domain = urlparse(link).netloc.lower()
+        if domain not in self._domains:
+            self._domains[domain] = asyncio.Semaphore(self.per_domain_limit)
+        return self._domains[domain]
+
+    async def _produce(self, name, client, queue):
+        """
+        连接邮箱并提取链接，放入队列。
+        :return: 需要标记为已读的邮件 ID 列表
+        """
+        await asyncio.to_thread(client.connect)
+        email_ids, pending = await asyncio.to_thread(client.collect_links)
+        log.info(f"{name}：找到 {len(pending)} 个待处理链接")
+        crossref.prefetch_links(pending)
+        tracker = MessageTracker(client.message_links, lambda uids: client.mailbox.complete(client.sender, uids))
+        self._trackers[name] = tracker
+        await asyncio.to_thread(tracker.start)
+        for link, c in pending.items():
+            # 不同来源指向同一篇文章时只处理一次
+            if link in self._seen_links:
+                await asyncio.to_thread(tracker.link_done, link)
+                continue
+            self._seen_links.add(link)
+            await queue.put((name, client, link, c))
+        return email_ids
+
+    async def _process(self, client, link, c):
+        async with self._domain_semaphore(link):
+            # PDF 和 Stork 页面走原有的同步处理流程
+            if c.get('has_pdf') or c.get('stork_flag'):
+                return await asyncio.to_thread(client._process_link, link, c)
+            results = await getabstract_async(link)
+            return client._html_details(c, results)
+
+    async def _consume(self, queue, link_types):
+        while True:
+            item = await queue.get()
+            if item is None:
+                queue.task_done()
+                return
+            name, client, link, c = item
+            domain = metrics.domain_of(link)
+            outcome = "error"
+            try:
+                log.info(f"正在处理链接：{link}")
+                with metrics.timer("link", domain=domain):
+                    details = await self._process(client, link, c)
+                outcome = "ok" if details is not None else "empty"
+                if details is not None:
+                    link_types[name][link] = details
+                    await asyncio.to_thread(client.save_link_types_to_file, {link: details})
+                    if self.on_record is not None:
+                        await asyncio.to_thread(self.on_record, link, details)
+            except Exception as e:
+                log.info(f"处理链接时出错：{e}")
+            finally:
+                metrics.incr("links_total", domain=domain, result=outcome)
+                # 结果落盘并发送后，再推进该链接所在邮件的断点
+                await asyncio.to_thread(self._trackers[name].link_done, link)
+                queue.task_done()
+
+    async def run(self):
+        """
+        运行流水线。
+        :return: {来源名称: link_types} 字典
+        """
+        queue = asyncio.Queue(maxsize=self.max_workers * 4)
+        link_types = {name: {} for name, _ in self.sources}
+
+        workers = [
+            asyncio.create_task(self._consume(queue, link_types))
+            for _ in range(self.max_workers)
+        ]
+        produced = await asyncio.gather(
+            *(self._produce(name, client, queue) for name, client in self.sources),
+            return_exceptions=True
+        )
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+        # 全部处理完成后再标记已读并断开连接
+        for (name, client), email_ids in zip(self.sources, produced):
+            if isinstance(email_ids, Exception):
+                log.info(f"{name} 获取邮件时出错：{email_ids}")
+            elif email_ids:
+                await asyncio.to_thread(client.mark_seen, email_ids)
+            await asyncio.to_thread(client.logout)
+
+        return link_types
+
+
+def run_pipeline(sources, on_record=None, max_workers=None, per_domain_limit=None):
+    """
+    以异步模式运行整个流水线。
+    :param sources: (名称, 邮件客户端) 列表
+    :param on_record: 每篇论文完成后调用的回调
+    :return: {来源名称: link_types} 字典
+    """
+    pipeline = AsyncPipeline(sources, on_record=on_record, max_workers=max_workers,
+                             per_domain_limit=per_domain_limit)
+    return asyncio.run(pipeline.run())
@@ -0,0 +1,166 @@
+import atexit
+import os
+import threading
+from contextlib import contextmanager
+from DrissionPage import Chromium
+from modules.logger import setup_logger
+
+log = setup_logger("browser_pool")
+
+# 同时打开的标签页上限，以及浏览器加载多少个页面后重启
+DEFAULT_MAX_TABS = 2
+DEFAULT_MAX_PAGES = 50
+
+
+class BrowserPool:
+    """
+    管理一个长期运行的浏览器，在多个链接之间复用标签页。
+    浏览器加载的页面数达到上限后不再分配新标签页，等正在使用的标签页归还后重启；
+    浏览器崩溃时立即丢弃并启动新的浏览器。
+    """
+
+    def __init__(self, max_tabs=DEFAULT_MAX_TABS, max_pages=DEFAULT_MAX_PAGES):
+        """
+        :param max_tabs: 同时使用的标签页上限
+        :param max_pages: 浏览器加载多少个页面后重启
+        """
+        self.max_pages = max(1, max_pages)
+        self._slots = threading.BoundedSemaphore(max(1, max_tabs))
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._browser = None
+        self._idle_tabs = []
+        self._active = 0
+        self._pages = 0
+        self._retire = False
+
+    def _acquire_tab(self):
+        """
+        登记一个正在使用的标签页，返回浏览器和可复用的空闲标签页（没有时为 None）。
+        """
+        # 空闲期间崩溃的浏览器直接丢弃；探测需要一次 CDP 往返，放在锁外进行
+        with self._lock:
+            idle = self._browser if self._active == 0 and not self._retire else None
+        if idle is not None and not self._is_alive(idle):
+            log.info("浏览器已崩溃，将重新启动")
+            self._discard(idle)
+
+        with self._ready:
+            # 即将回收的浏览器不再分配标签页，等它关闭后再启动新的
+            while self._browser is not None and self._retire:
+                self._ready.wait()
+            if self._browser is None:
+                self._browser = Chromium()
+                self._pages = 0
+                self._retire = False
+                self._idle_tabs = [self._browser.latest_tab]
+            self._active += 1
+            return self._browser, self._idle_tabs.pop() if self._idle_tabs else None
+
+    def _release_tab(self, browser, tab, reusable):
+        retired = None
+        with self._lock:
+            # 已被丢弃的浏览器上的标签页不再计数
+            if browser is not self._browser:
+                return
+            self._active -= 1
+            self._pages += 1
+            if self._pages >= self.max_pages:
+                self._retire = True
+            if tab is not None and reusable and not self._retire:
+                self._idle_tabs.append(tab)
+            elif tab is not None:
+                try:
+                    tab.close()
+                except Exception:
+                    pass
+            # 没有正在使用的标签页时才重启浏览器
+            if self._retire and self._active == 0:
+                retired = self._detach_browser()
+        if retired is not None:
+            self._quit(*retired)
+
+    def _detach_browser(self):
+        # 需持有锁：把当前浏览器移出池并唤醒等待的线程，关闭浏览器由调用方在锁外进行
+        browser, pages = self._browser, self._pages
+        self._browser, self._idle_tabs = None, []
+        self._active = 0
+        self._retire = False
+        self._ready.notify_all()
+        return browser, pages
+
+    def _discard(self, browser):
+        # browser 仍是当前浏览器时才移出，避免关掉其他线程刚启动的新浏览器
+        with self._lock:
+            detached = self._detach_browser() if browser is self._browser else None
+        if detached is not None:
+            self._quit(*detached)
+
+    def _quit(self, browser, pages):
+        try:
+            browser.quit(timeout=3)
+            log.info(f"浏览器已回收（加载页面数：{pages}）")
+        except Exception as e:
+            log.info(f"关闭浏览器时出错：{e}")
+
+    def _is_alive(self, browser):
+        try:
+            browser.tabs_count
+            return True
+        except Exception:
+            return False
+
+    @contextmanager
+    def tab(self, url):
+        """
+        取得一个已加载 url 的标签页，用完后归还给浏览器池。
+        :param url: 页面链接
+        :return: 已加载页面的标签页
+        """
+        with self._slots:
+            browser, tab = None, None
+            reusable = True
+            try:
+                browser, tab = self._acquire_tab()
+                if tab is None:
+                    tab = browser.new_tab()
+                tab.get(url)
+                yield tab
+            except Exception:
+                reusable = False
+                if browser is not None and not self._is_alive(browser):
+                    log.info("浏览器已崩溃，将重新启动")
+                    self._discard(browser)
+                raise
+            finally:
+                if browser is not None:
+                    self._release_tab(browser, tab, reusable)
+
+    def close(self):
+        """
+        关闭浏览器。
+        """
+        with self._lock:
+            browser = self._browser
+        if browser is not None:
+            self._discard(browser)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    获取全局浏览器池，首次调用时创建。
+    :return: BrowserPool 实例
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(
+                max_tabs=int(os.getenv("PAPERBOT_BROWSER_TABS", DEFAULT_MAX_TABS)),
+                max_pages=int(os.getenv("PAPERBOT_BROWSER_MAX_PAGES", DEFAULT_MAX_PAGES)),
+            )
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+from modules.logger import setup_logger
+
+script_dir = os.path.dirname(os.path.abspath(__file__))  # 当前脚本所在目录
+project_root = os.path.abspath(os.path.join(script_dir, ".."))  # 项目根目录
+log = setup_logger("checkpoint")
+
+
+class CheckpointStore:
+    """
+    按邮件来源保存增量读取进度：UIDVALIDITY、已取到的最大 UID，
+    以及已取出但还没处理完的邮件 UID。重启后从断点继续，不依赖邮件的已读状态。
+    """
+
+    def __init__(self, path):
+        """
+        :param path: JSON 文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = {}
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as file:
+                    self._data = json.load(file)
+        except Exception as e:
+            log.info(f"读取断点文件时出错：{e}")
+            self._data = {}
+
+    def get(self, sender, uidvalidity):
+        """
+        获取某个来源的断点。
+        :param sender: 发件人地址
+        :param uidvalidity: 当前邮箱的 UIDVALIDITY
+        :return: (last_uid, 未完成的 UID 集合)，没有断点或 UIDVALIDITY 变化时返回 None
+        """
+        with self._lock:
+            record = self._data.get(sender)
+        if not record:
+            return None
+        if str(record.get("uidvalidity")) != str(uidvalidity):
+            log.info(f"{sender} 的 UIDVALIDITY 已变化，断点失效，重新按未读邮件读取。")
+            return None
+        return int(record.get("last_uid", 0)), set(record.get("pending", []))
+
+    def begin(self, sender, uidvalidity, uids, searched_uid=None):
+        """
+        记录本次取出的邮件：推进 last_uid，并把这些邮件标记为未完成。
+        :param sender: 发件人地址
+        :param uidvalidity: 当前邮箱的 UIDVALIDITY
+        :param uids: UID 列表
+        :param searched_uid: 本次搜索已覆盖到的最大 UID（通常为 UIDNEXT - 1），last_uid 至少推进到这里
+        """
+        with self._lock:
+            record = self._data.get(sender)
+            if not record or str(record.get("uidvalidity")) != str(uidvalidity):
+                # 既没有取到邮件也不知道搜索范围时不建立断点，否则 last_uid 为 0，下次会重新扫描整个邮箱
+                if not uids and searched_uid is None:
+                    return
+                record = {"uidvalidity": str(uidvalidity), "last_uid": 0, "pending": []}
+                self._data[sender] = record
+            pending = set(record["pending"]) | set(uids)
+            record["pending"] = sorted(pending, key=int)
+            last_uid = max([int(record["last_uid"])] + [int(uid) for uid in uids])
+            if searched_uid is not None:
+                last_uid = max(last_uid, int(searched_uid))
+            record["last_uid"] = last_uid
+            self._save()
+
+    def complete(self, sender, uids):
+        """
+        记录处理完成的邮件。
+        :param sender: 发件人地址
+        :param uids: UID 列表
+        """
+        with self._lock:
+            record = self._data.get(sender)
+            if not record:
+                return
+            done = set(uids)
+            record["pending"] = [uid for uid in record["pending"] if uid not in done]
+            self._save()
+
+    def _save(self):
+        # 先写临时文件再替换，中途崩溃不会留下损坏的断点文件
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(self._data, file, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            log.info(f"保存断点文件时出错：{e}")
+
+
+class MessageTracker:
+    """
+    跟踪每封邮件中链接的处理进度，一封邮件的链接全部处理完后调用 on_complete。
+    """
+
+    def __init__(self, message_links, on_complete):
+        """
+        :param message_links: {邮件 UID: [链接, ...]} 字典
+        :param on_complete: 回调 on_complete(uids)，参数为刚完成的邮件 UID 列表
+        """
+        self.on_complete = on_complete
+        self._lock = threading.Lock()
+        self._remaining = {uid: set(links) for uid, links in message_links.items()}
+
+    def start(self):
+        """
+        没有待处理链接的邮件直接记为完成。
+        """
+        self._finish()
+
+    def link_done(self, link):
+        """
+        记录一个链接处理完成（无论成功与否，失败的链接已写入 error_links.txt）。
+        :param link: 链接
+        """
+        self._finish(link)
+
+    def _finish(self, link=None):
+        done = []
+        with self._lock:
+            for uid, links in list(self._remaining.items()):
+                links.discard(link)
+                if not links:
+                    done.append(uid)
+                    del self._remaining[uid]
+        if done:
+            try:
+                self.on_complete(done)
+            except Exception as e:
+                log.info(f"记录邮件完成状态时出错：{e}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """
+    获取全局断点存储，首次调用时创建。
+    :return: CheckpointStore 实例
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            path = os.getenv("PAPERBOT_CHECKPOINT_PATH", os.path.join(project_root, "cache", "mail_checkpoint.json"))
+            _store = CheckpointStore(path)
+        return _store
@@ -0,0 +1,293 @@
+import asyncio
+import html
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import unquote, urlparse
+from modules.logger import setup_logger
+from modules import http_client
+from modules import metrics
+
+log = setup_logger("crossref")
+
+# 可通过 CROSSREF_API_URL 指向本地测试服务器
+CROSSREF_API_URL = "https://api.crossref.org"
+# 每个 filter=doi:... 请求包含的 DOI 数、凑批等待时间（秒）、同时进行的请求数
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_MAX_WAIT = 0.2
+DEFAULT_CONCURRENCY = 2
+DEFAULT_TIMEOUT = (5, 20)
+# 批大小直方图的桶上限
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+# 链接路径中的 DOI，例如 /doi/full/10.1002/hipo.23456、/articles/10.3389/fpsyg.2024.01234/full
+DOI_PATTERN = re.compile(r'(10\.\d{4,9}/[^\s?#&"<>]+)')
+# 出版商在 DOI 后面附加的页面类型
+DOI_SUFFIXES = ("/full", "/abstract", "/pdf", "/epdf", "/html", "/meta", "/fulltext", "/references")
+JATS_TAG_PATTERN = re.compile(r'<[^>]+>')
+JATS_TITLE_PATTERN = re.compile(r'<jats:title>.*?</jats:title>', re.S)
+
+# 本次运行中已获取的 Crossref 元数据，抓取回退后生成引用时不必再请求
+_works = {}
+_works_lock = threading.Lock()
+MAX_MEMO_WORKS = 512
+
+
+def doi_from_url(url):
+    """
+    从文章链接中解析 DOI。
+    :param url: 文章链接
+    :return: DOI 字符串，链接中没有 DOI 时返回 None
+    """
+    path = unquote(urlparse(url).path)
+    match = DOI_PATTERN.search(path)
+    if not match:
+        return None
+    doi = match.group(1).rstrip("/.")
+    changed = True
+    while changed:
+        changed = False
+        for suffix in DOI_SUFFIXES:
+            if doi.lower().endswith(suffix):
+                doi = doi[:-len(suffix)]
+                changed = True
+    return doi or None
+
+
+def strip_jats(abstract):
+    """
+    将 Crossref 返回的 JATS XML 摘要转换为纯文本。
+    :param abstract: JATS 格式的摘要
+    :return: 纯文本摘要，内容为空时返回 None
+    """
+    if not abstract:
+        return None
+    text = JATS_TITLE_PATTERN.sub(" ", abstract)
+    text = JATS_TAG_PATTERN.sub(" ", text)
+    text = " ".join(html.unescape(text).split())
+    return text or None
+
+
+def _remember(doi, work):
+    with _works_lock:
+        if len(_works) >= MAX_MEMO_WORKS:
+            _works.pop(next(iter(_works)))
+        _works[doi.lower()] = work
+
+
+def _remembered(doi):
+    with _works_lock:
+        return _works.get(doi.lower())
+
+
+def works_url():
+    return os.getenv("CROSSREF_API_URL", CROSSREF_API_URL).rstrip("/") + "/works"
+
+
+def polite_params():
+    """
+    Crossref polite pool 需要的请求参数和请求头，联系邮箱从 CROSSREF_MAILTO 读取。
+    :return: (params, headers) 元组
+    """
+    mailto = os.getenv("CROSSREF_MAILTO")
+    user_agent = "PaperBot/1.0 (https://github.com/Weibin-Yang/atpaper"
+    user_agent += f"; mailto:{mailto})" if mailto else ")"
+    params = {"mailto": mailto} if mailto else {}
+    return params, {"User-Agent": user_agent}
+
+
+@metrics.timed("crossref", mode="single")
+def _fetch_single(doi):
+    params, headers = polite_params()
+    try:
+        response = http_client.get(f"{works_url()}/{doi}", params=params, headers=headers,
+                                   timeout=DEFAULT_TIMEOUT)
+        if response.status_code == 200:
+            return response.json().get("message", {})
+        log.info(f"Error: {response.status_code} - {response.text}")
+    except Exception as e:
+        log.info(f"Error fetching Crossref metadata: {e}")
+    return None
+
+
+@metrics.timed("crossref", mode="batch")
+def _fetch_many(dois):
+    """
+    用一次 filter=doi:a,doi:b 查询获取多个 DOI 的元数据。
+    :param dois: DOI 列表
+    :return: {小写 DOI: message} 字典，请求失败时返回 None
+    """
+    params, headers = polite_params()
+    params.update({
+        "filter": ",".join(f"doi:{doi}" for doi in dois),
+        "rows": len(dois),
+    })
+    try:
+        response = http_client.get(works_url(), params=params, headers=headers, timeout=DEFAULT_TIMEOUT)
+        if response.status_code != 200:
+            log.info(f"Error: {response.status_code} - {response.text}")
+            return None
+        items = response.json().get("message", {}).get("items", [])
+        return {item.get("DOI", "").lower(): item for item in items}
+    except Exception as e:
+        log.info(f"批量获取 Crossref 元数据时出错：{e}")
+        return None
+
+
+class CrossrefResolver:
+    """
+    Crossref 批量查询层：同一 DOI 只查询一次，并发提交的 DOI 合并成 filter 查询。
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT, concurrency=DEFAULT_CONCURRENCY):
+        """
+        :param batch_size: 每个批量请求最多包含的 DOI 数
+        :param max_wait: 凑批时最长等待时间（秒）
+        :param concurrency: 同时进行的请求数
+        """
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+        self._thread = None
+
+    def submit(self, doi):
+        """
+        提交一个 DOI，立即返回 Future。
+        :param doi: 文档的 DOI
+        :return: 结果为 Crossref 元数据（失败时为 None）的 Future
+        """
+        key = doi.lower()
+        work = _remembered(key)
+        metrics.incr("cache_requests_total", cache="crossref", result="hit" if work is not None else "miss")
+        if work is not None:
+            future = Future()
+            future.set_result(work)
+            return future
+
+        with self._lock:
+            if key in self._inflight:
+                return self._inflight[key]
+            future = Future()
+            self._inflight[key] = future
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._collect, name="crossref", daemon=True)
+                self._thread.start()
+
+        self._queue.put((key, doi, future))
+        return future
+
+    def prefetch(self, dois):
+        """
+        提前提交一批 DOI，不等待结果。
+        :param dois: DOI 列表，None 会被忽略
+        """
+        for doi in dois:
+            if doi:
+                self.submit(doi)
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._executor.submit(self._flush, batch)
+
+    def _flush(self, batch):
+        try:
+            # 含逗号的 DOI 会破坏 filter 语法，单独查询
+            batchable = [doi for _, doi, _ in batch if "," not in doi]
+            works = {}
+            if len(batchable) > 1:
+                log.info(f"批量查询 {len(batchable)} 个 DOI")
+                metrics.observe("crossref_batch_size", len(batchable), buckets=BATCH_BUCKETS)
+                works = _fetch_many(batchable) or {}
+
+            for key, doi, future in batch:
+                work = works.get(key)
+                # 批量结果中缺失的 DOI 单独补查
+                if work is None:
+                    if len(batchable) > 1:
+                        metrics.incr("fallback_total", stage="crossref", reason="missing_from_batch")
+                    work = _fetch_single(doi)
+                if work is not None:
+                    _remember(key, work)
+                self._resolve(key, future, work)
+        except Exception as e:
+            log.info(f"处理 Crossref 批次时出错：{e}")
+        finally:
+            for key, _, future in batch:
+                if not future.done():
+                    self._resolve(key, future, None)
+
+    def _resolve(self, key, future, work):
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(work)
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver():
+    """
+    获取全局 Crossref 查询器，首次调用时创建。
+    :return: CrossrefResolver 实例
+    """
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = CrossrefResolver(
+                batch_size=int(os.getenv("PAPERBOT_CROSSREF_BATCH", DEFAULT_BATCH_SIZE)),
+                max_wait=float(os.getenv("PAPERBOT_CROSSREF_WAIT", DEFAULT_MAX_WAIT)),
+                concurrency=int(os.getenv("PAPERBOT_CROSSREF_CONCURRENCY", DEFAULT_CONCURRENCY)),
+            )
+        return _resolver
+
+
+def prefetch_links(links):
+    """
+    从一批文章链接中解析 DOI 并提前批量查询 Crossref。
+    :param links: 文章链接列表
+    """
+    get_resolver().prefetch(doi_from_url(link) for link in links)
+
+
+def fetch_work(doi):
+    """
+    获取 DOI 对应的 Crossref 元数据，并发调用会合并为批量请求。
+    :param doi: 文档的 DOI
+    :return: Crossref 响应中的 message 字典，失败时返回 None
+    """
+    return get_resolver().submit(doi).result()
+
+
+async def fetch_work_async(doi):
+    """
+    fetch_work 的异步版本，与同步调用共用批量查询。
+    :param doi: 文档的 DOI
+    :return: Crossref 响应中的 message 字典，失败时返回 None
+    """
+    return await asyncio.wrap_future(get_resolver().submit(doi))
+
+
+def work_abstract(work):
+    """
+    取出 Crossref 元数据中的摘要。
+    :param work: Crossref 元数据
+    :return: 纯文本摘要，没有摘要时返回 None
+    """
+    return strip_jats(work.get("abstract")) if work else None
@@ -0,0 +1,216 @@
+import os
+import re
+import threading
+from concurrent.futures import Future
+from modules.logger import setup_logger
+from modules import http_client
+from modules import metrics
+from modules import pdf_store
+
+log = setup_logger("downloader")
+
+# PDF 文件头，规范允许前面有最多 1024 字节的其他内容
+PDF_MAGIC = b"%PDF-"
+MAGIC_WINDOW = 1024
+# 单个 PDF 的大小上限（MB），可用 PAPERBOT_PDF_MAX_MB 覆盖，0 表示不限制
+DEFAULT_MAX_MB = 50
+# 读取块大小的范围，按文件大小在两者之间选择
+MIN_CHUNK = 64 * 1024
+MAX_CHUNK = 1024 * 1024
+# 连接超时和两次读取之间的超时（秒）
+DEFAULT_TIMEOUT = (5, 30)
+SIZE_BUCKETS = (64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2, 64 * 1024 ** 2)
+
+_inflight = {}
+_lock = threading.Lock()
+
+
+class DownloadRejected(Exception):
+    """
+    下载到的内容不是 PDF，或者超过了大小上限。
+    """
+
+
+def _max_bytes():
+    return int(float(os.getenv("PAPERBOT_PDF_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024)
+
+
+def _chunk_size(total):
+    # 小文件用小块尽快写出，大文件用大块减少系统调用
+    if not total:
+        return MIN_CHUNK
+    return max(MIN_CHUNK, min(MAX_CHUNK, total // 16))
+
+
+def _record_error(link):
+    # 将出错链接保存到本地 txt 文件
+    with open("error_links.txt", "a", encoding="utf-8") as error_file:
+        error_file.write(f"{link}\n")
+
+
+def looks_like_pdf(head):
+    """
+    检查文件开头是否有 PDF 文件头。
+    :param head: 文件开头的字节
+    :return: 是 PDF 时返回 True
+    """
+    return PDF_MAGIC in head[:MAGIC_WINDOW]
+
+
+def is_pdf(path):
+    """
+    检查本地文件是否是 PDF。
+    :param path: 文件路径
+    :return: 文件存在且有 PDF 文件头时返回 True
+    """
+    try:
+        with open(path, 'rb') as f:
+            return looks_like_pdf(f.read(MAGIC_WINDOW))
+    except OSError:
+        return False
+
+
+def _check_content_type(response):
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    # 出版商常把登录页或跳转页以 200 返回，这类 HTML 不能当作 PDF 保存
+    if content_type.startswith("text/") or "html" in content_type:
+        raise DownloadRejected(f"Content-Type 为 {content_type}")
+
+
+def _stream_to_part(link, part_path, max_bytes):
+    """
+    把链接的内容写入 .part 文件，已有部分内容时用 Range 请求续传。
+    :return: (写入后的文件大小, 是否为续传)
+    """
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if offset and not is_pdf(part_path):
+        os.remove(part_path)
+        offset = 0
+    headers = {"Range": f"bytes={offset}-"} if offset else None
+
+    with http_client.get(link, timeout=DEFAULT_TIMEOUT, stream=True, headers=headers) as response:
+        if response.status_code == 416 and offset:
+            # 服务器认为续传的起点无效，丢掉旧的部分重新下载
+            os.remove(part_path)
+            return _stream_to_part(link, part_path, max_bytes)
+        if response.status_code == 206 and offset:
+            start = re.match(r"bytes (\d+)-", response.headers.get("Content-Range", ""))
+            if not start or int(start.group(1)) != offset:
+                raise DownloadRejected(f"Content-Range 与续传位置不一致：{response.headers.get('Content-Range')}")
+            mode, resumed = 'ab', True
+        elif response.status_code == 200:
+            # 服务器不支持 Range 时会返回整个文件，从头写入
+            mode, resumed, offset = 'wb', False, 0
+        else:
+            raise DownloadRejected(f"状态码 {response.status_code}")
+        _check_content_type(response)
+
+        length = int(response.headers.get("Content-Length") or 0)
+        if max_bytes and length and offset + length > max_bytes:
+            raise DownloadRejected(f"文件大小 {(offset + length) / 1024 ** 2:.1f} MB 超过上限")
+
+        size = offset
+        checked = resumed
+        head = b""
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=_chunk_size(length)):
+                if not chunk:
+                    continue
+                if not checked:
+                    # 在写入大量数据之前确认是 PDF
+                    head += chunk[:MAGIC_WINDOW - len(head)]
+                    if len(head) >= MAGIC_WINDOW or looks_like_pdf(head):
+                        if not looks_like_pdf(head):
+                            raise DownloadRejected("内容没有 PDF 文件头")
+                        checked = True
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise DownloadRejected(f"文件超过 {max_bytes / 1024 ** 2:.0f} MB 上限")
+                f.write(chunk)
+        if not checked and not looks_like_pdf(head):
+            raise DownloadRejected("内容没有 PDF 文件头")
+    return size, resumed
+
+
+def _download(link, file_path):
+    domain = metrics.domain_of(link)
+    if os.path.exists(file_path):
+        if is_pdf(file_path):
+            log.info(f"文件已存在，跳过下载：{file_path}")
+            metrics.incr("pdf_downloads_total", result="exists")
+            return file_path
+        # 之前保存的网页或损坏的文件，重新下载
+        log.info(f"已有文件不是 PDF，重新下载：{file_path}")
+        os.remove(file_path)
+
+    part_path = file_path + ".part"
+    try:
+        with metrics.timer("pdf_download", domain=domain):
+            size, resumed = _stream_to_part(link, part_path, _max_bytes())
+        # 写完后再改名，中断的下载不会留下看起来完整的 PDF
+        os.replace(part_path, file_path)
+        metrics.incr("pdf_downloads_total", result="resumed" if resumed else "ok")
+        metrics.observe("pdf_download_bytes", size, buckets=SIZE_BUCKETS)
+        log.info(f"PDF 文件已下载并保存到：{file_path}")
+        return file_path
+    except DownloadRejected as e:
+        log.info(f"下载失败：{link} -> {e}")
+        metrics.incr("pdf_downloads_total", result="rejected", domain=domain)
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        _record_error(link)
+        return None
+    except Exception as e:
+        # 网络错误时保留 .part 文件，下次运行从中断处续传
+        log.info(f"下载 PDF 时出错：{link} -> {e}")
+        metrics.incr("pdf_downloads_total", result="error", domain=domain)
+        _record_error(link)
+        return None
+
+
+def download_pdf(link, filename, save_folder="pdf_storage", title=None, doi=None):
+    """
+    下载 PDF 文件并保存到本地。先写入 .part 文件，确认是 PDF 且没有超过大小上限后再改名；
+    中断的下载下次从断点续传。多个线程同时下载同一链接时只会发出一次请求。
+    下载完成的文件移入按内容哈希保存的存储（pdf_store），链接、标题或 DOI 已登记过时不再下载。
+    :param link: PDF 文件链接
+    :param filename: 下载时使用的文件名
+    :param save_folder: 下载时使用的文件夹
+    :param title: 论文标题，默认由文件名推出
+    :param doi: 文档的 DOI
+    :return: 存储中的文件路径，下载失败或内容不是 PDF 时返回 None
+    """
+    title = title or filename
+    stored = pdf_store.find(url=link, title=title, doi=doi)
+    if stored:
+        log.info(f"PDF 已在存储中，跳过下载：{stored}")
+        metrics.incr("pdf_downloads_total", result="stored")
+        return stored
+
+    try:
+        os.makedirs(save_folder, exist_ok=True)
+        filename = re.sub(r'[\\/*?:"<>|&;]', '_', filename)
+        file_path = os.path.join(save_folder, filename)
+    except Exception as e:
+        log.info(f"下载 PDF 时出错：{link} -> {e}")
+        return None
+
+    with _lock:
+        future = _inflight.get(link)
+        owner = future is None
+        if owner:
+            future = _inflight[link] = Future()
+    if not owner:
+        metrics.incr("pdf_downloads_total", result="shared")
+        return future.result()
+
+    result = None
+    try:
+        result = _download(link, file_path)
+        if result:
+            result = pdf_store.add(result, url=link, title=title, doi=doi)
+    finally:
+        with _lock:
+            _inflight.pop(link, None)
+        future.set_result(result)
+    return result
@@ -0,0 +1,176 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from modules.logger import setup_logger
+
+log = setup_logger("http_client")
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+    HTTP2_AVAILABLE = httpx is not None
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# 默认超时（连接, 读取），单位秒
+DEFAULT_TIMEOUT = (5, 20)
+# 每个主机保持的长连接数
+DEFAULT_POOL_SIZE = 20
+# 失败后的重试次数
+DEFAULT_RETRIES = 3
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    为没有指定 timeout 的请求补上默认超时的连接池适配器。
+    """
+
+    def __init__(self, *args, timeout=DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+def _timeout():
+    connect = float(os.getenv("PAPERBOT_CONNECT_TIMEOUT", DEFAULT_TIMEOUT[0]))
+    read = float(os.getenv("PAPERBOT_READ_TIMEOUT", DEFAULT_TIMEOUT[1]))
+    return connect, read
+
+
+def _http2_enabled():
+    return HTTP2_AVAILABLE and os.getenv("PAPERBOT_HTTP2", "0") == "1"
+
+
+_session = None
+_httpx_client = None
+_lock = threading.Lock()
+
+
+def session():
+    """
+    获取全局共享的 requests.Session，按主机复用长连接，并对幂等请求自动重试。
+    :return: requests.Session 实例
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            pool_size = _env_int("PAPERBOT_HTTP_POOL_SIZE", DEFAULT_POOL_SIZE)
+            retry = Retry(
+                total=_env_int("PAPERBOT_HTTP_RETRIES", DEFAULT_RETRIES),
+                backoff_factor=0.5,
+                status_forcelist=RETRY_STATUS,
+                allowed_methods=frozenset({"GET", "HEAD"}),
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = TimeoutHTTPAdapter(
+                timeout=_timeout(),
+                pool_connections=pool_size,
+                pool_maxsize=pool_size,
+                max_retries=retry,
+            )
+            _session = requests.Session()
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def httpx_client():
+    """
+    获取全局共享的 httpx.Client，安装了 h2 且 PAPERBOT_HTTP2=1 时启用 HTTP/2。
+    :return: httpx.Client 实例，未安装 httpx 时返回 None
+    """
+    global _httpx_client
+    if httpx is None:
+        return None
+    with _lock:
+        if _httpx_client is None:
+            pool_size = _env_int("PAPERBOT_HTTP_POOL_SIZE", DEFAULT_POOL_SIZE)
+            connect, read = _timeout()
+            _httpx_client = httpx.Client(
+                http2=_http2_enabled(),
+                timeout=httpx.Timeout(read, connect=connect),
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                transport=httpx.HTTPTransport(
+                    http2=_http2_enabled(),
+                    retries=_env_int("PAPERBOT_HTTP_RETRIES", DEFAULT_RETRIES),
+                ),
+                follow_redirects=True,
+            )
+        return _httpx_client
+
+
+def _httpx_timeout(timeout):
+    if timeout is None:
+        return httpx.USE_CLIENT_DEFAULT
+    if isinstance(timeout, tuple):
+        return httpx.Timeout(timeout[1], connect=timeout[0])
+    return timeout
+
+
+def request(method, url, **kwargs):
+    """
+    通过共享连接池发送请求。启用 HTTP/2 时非流式请求走 httpx，其余走 requests。
+    :param method: 请求方法
+    :param url: 请求链接
+    :param kwargs: 传给 requests 的参数（params、json、data、headers、timeout、stream）
+    :return: 响应对象，两种客户端都提供 status_code、text、json()
+    """
+    if _http2_enabled() and not kwargs.get("stream"):
+        client = httpx_client()
+        return client.request(
+            method, url,
+            params=kwargs.get("params"),
+            json=kwargs.get("json"),
+            data=kwargs.get("data"),
+            headers=kwargs.get("headers"),
+            timeout=_httpx_timeout(kwargs.get("timeout")),
+        )
+    return session().request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    """
+    发送 GET 请求。
+    :param url: 请求链接
+    :return: 响应对象
+    """
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    """
+    发送 POST 请求。POST 不会自动重试，避免重复提交。
+    :param url: 请求链接
+    :return: 响应对象
+    """
+    return request("POST", url, **kwargs)
+
+
+def close():
+    """
+    关闭共享的连接池。
+    """
+    global _session, _httpx_client
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+        if _httpx_client is not None:
+            _httpx_client.close()
+            _httpx_client = None
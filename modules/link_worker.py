@@ -0,0 +1,113 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlparse
+from modules.logger import setup_logger
+from modules import metrics
+
+log = setup_logger("link_worker")
+
+# 默认并发设置，可通过 .env 覆盖
+DEFAULT_MAX_WORKERS = 6
+DEFAULT_PER_DOMAIN_LIMIT = 2
+
+
+class DomainDispatcher:
+    """
+    按域名限制并发数量，避免同一出版商被同时请求过多。
+    某个域名的名额用满时，后续链接在该域名的队列中等待，不占用线程池中的线程，
+    其他域名的链接照常提交；该域名有链接完成时再提交队列中的下一个。
+    """
+
+    def __init__(self, executor, limit):
+        """
+        :param executor: 执行任务的线程池
+        :param limit: 每个域名允许同时处理的链接数
+        """
+        self.executor = executor
+        self.limit = max(1, limit)
+        self._lock = threading.Lock()
+        self._active = {}
+        self._pending = {}
+
+    def submit(self, url, fn):
+        """
+        提交一个任务，该域名没有空闲名额时先放入等待队列。
+        :param url: 任务对应的链接
+        :param fn: 无参数的任务函数，不应抛出异常
+        """
+        domain = urlparse(url).netloc.lower()
+        with self._lock:
+            if self._active.get(domain, 0) >= self.limit:
+                self._pending.setdefault(domain, deque()).append(fn)
+                return
+            self._active[domain] = self._active.get(domain, 0) + 1
+        self.executor.submit(self._run, domain, fn)
+
+    def _run(self, domain, fn):
+        try:
+            fn()
+        finally:
+            # 名额直接交给同一域名的下一个等待任务
+            with self._lock:
+                queue = self._pending.get(domain)
+                next_fn = queue.popleft() if queue else None
+                if next_fn is None:
+                    self._active[domain] -= 1
+            if next_fn is not None:
+                self.executor.submit(self._run, domain, next_fn)
+
+
+def process_links(items, handler, max_workers=None, per_domain_limit=None, on_result=None):
+    """
+    在有界线程池中并发处理链接，结果按输入顺序返回。
+    :param items: 按顺序排列的 (link, info) 列表
+    :param handler: 处理函数 handler(link, info)，返回该链接的结果
+    :param max_workers: 同时处理的最大链接数，默认读取 PAPERBOT_MAX_WORKERS
+    :param per_domain_limit: 每个域名的最大并发数，默认读取 PAPERBOT_PER_DOMAIN_LIMIT
+    :param on_result: 按输入顺序在调用线程中执行的回调 on_result(link, result)
+    :return: 与 items 顺序一致的结果列表，出错的链接对应 None
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    if max_workers is None:
+        max_workers = int(os.getenv("PAPERBOT_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+    if per_domain_limit is None:
+        per_domain_limit = int(os.getenv("PAPERBOT_PER_DOMAIN_LIMIT", DEFAULT_PER_DOMAIN_LIMIT))
+
+    futures = [Future() for _ in items]
+
+    def run(index):
+        link, info = items[index]
+        try:
+            with metrics.timer("link", domain=metrics.domain_of(link)):
+                futures[index].set_result(handler(link, info))
+        except Exception as e:
+            futures[index].set_exception(e)
+
+    results = [None] * len(items)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        dispatcher = DomainDispatcher(executor, per_domain_limit)
+        for index, (link, _) in enumerate(items):
+            dispatcher.submit(link, partial(run, index))
+        # 按提交顺序等待并回调：已完成的连续前缀会立即依次回调，保证输出文件和日志顺序稳定
+        for index, future in enumerate(futures):
+            link = items[index][0]
+            try:
+                results[index] = future.result()
+                outcome = "ok" if results[index] is not None else "empty"
+            except Exception as e:
+                log.info(f"处理链接时出错：{link} -> {e}")
+                outcome = "error"
+            metrics.incr("links_total", domain=metrics.domain_of(link), result=outcome)
+            if on_result is not None:
+                try:
+                    on_result(link, results[index])
+                except Exception as e:
+                    log.info(f"处理链接结果时出错：{link} -> {e}")
+
+    return results
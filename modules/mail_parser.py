@@ -0,0 +1,136 @@
+import re
+import threading
+from lxml import etree
+from modules.logger import setup_logger
+
+log = setup_logger("mail_parser")
+
+# 预编译的 XPath 和正则表达式，三个邮件来源共用
+_HAS_CLASS = "contains(concat(' ', normalize-space(@class), ' '), ' {} ')"
+
+GOOGLE_TITLES = etree.XPath(f"//a[@href and {_HAS_CLASS.format('gse_alrt_title')}]")
+GOOGLE_PDF_SPAN = etree.XPath("(ancestor::h3[1]//span)[1]")
+GOOGLE_URL = re.compile(r"url=(https?://.*?)(?=&hl=en&)")
+GOOGLE_CLEARDOT = 'https://scholar.google.com/scholar/images/cleardot.gif'
+
+STORK_DIVS = etree.XPath("//div[@id]")
+STORK_ANCHOR = etree.XPath("(.//a[@href and @target])[1]")
+STORK_PREFIX = 'https://www.storkapp.me'
+STORK_PUBMED_URL = re.compile(r'url=\[pubmed[^\]]+\](https?://[^?\s&]+)')
+STORK_URL = re.compile(r'url=(https?://[^\s]+)')
+
+HIPPOCAMPUS_TITLES = etree.XPath(f"//a[@href and @style and {_HAS_CLASS.format('issue-item__title')}]")
+HIPPOCAMPUS_HEADING = etree.XPath("(.//h5[@style])[1]")
+
+# lxml 的解析器不能被多个线程同时使用
+_local = threading.local()
+
+
+def parse_html(html_content):
+    """
+    用 lxml 解析邮件的 HTML 正文。
+    :param html_content: HTML 文本
+    :return: lxml 根节点
+    """
+    parser = getattr(_local, "parser", None)
+    if parser is None:
+        parser = _local.parser = etree.HTMLParser(encoding="utf-8")
+    return etree.fromstring(html_content.encode("utf-8"), parser)
+
+
+def _text(element):
+    # 与 BeautifulSoup 的 get_text() 一致：拼接所有后代文本
+    return "".join(element.itertext())
+
+
+def _stripped_text(element):
+    # 与 BeautifulSoup 的 get_text(strip=True) 一致
+    return "".join(text.strip() for text in element.itertext())
+
+
+def extract_google_links(html_content):
+    """
+    提取 Google Scholar 提醒邮件中的文章链接。
+    :param html_content: 邮件的 HTML 正文
+    :return: {链接: {"title": 标题, "has_pdf": 是否为 PDF}} 字典
+    """
+    links_and_titles = {}
+    root = parse_html(html_content)
+    if root is None:
+        return links_and_titles
+
+    for a_tag in GOOGLE_TITLES(root):
+        match = GOOGLE_URL.search(a_tag.get("href"))
+        if not match:
+            continue
+        span = GOOGLE_PDF_SPAN(a_tag)
+        pdf_flag = bool(span) and "PDF" in _stripped_text(span[0])
+        extracted_link = match.group(1)
+        if '/pdf/' in extracted_link:
+            extracted_link = extracted_link.replace('/pdf/', '/full/', 1)
+            pdf_flag = False
+        links_and_titles[extracted_link] = {
+            "title": _text(a_tag),
+            "has_pdf": pdf_flag
+        }
+
+    # 删除特定链接
+    links_and_titles.pop(GOOGLE_CLEARDOT, None)
+    return links_and_titles
+
+
+def extract_stork_links(html_content):
+    """
+    提取 Stork 提醒邮件中 storkapp.me 跳转链接里的文章链接。
+    :param html_content: 邮件的 HTML 正文
+    :return: {链接: {"title": 标题, "stork_flag": 是否需要打开 Stork 页面}} 字典
+    """
+    links_and_titles = {}
+    root = parse_html(html_content)
+    if root is None:
+        return links_and_titles
+
+    for div_tag in STORK_DIVS(root):
+        anchor = STORK_ANCHOR(div_tag)
+        if not anchor:
+            continue
+        a_tag = anchor[0]
+        href = a_tag.get("href")
+        # 先用字符串判断过滤掉大多数链接，再做正则匹配
+        if not href.startswith(STORK_PREFIX) or 'url=' not in href:
+            continue
+        match1 = STORK_PUBMED_URL.search(href)
+        match2 = STORK_URL.search(href)
+        if match1:
+            extracted_link = match1.group(1)
+            if '/pdf/' in extracted_link:
+                extracted_link = extracted_link.replace('/pdf/', '/full/', 1)
+            links_and_titles[extracted_link] = {
+                "title": _text(a_tag),
+                "stork_flag": False
+            }
+        if match2:
+            links_and_titles[match2.group(1)] = {
+                "title": False,
+                "stork_flag": True
+            }
+    return links_and_titles
+
+
+def extract_hippocampus_links(html_content):
+    """
+    提取 Wiley（Hippocampus）目录提醒邮件中的文章链接。
+    :param html_content: 邮件的 HTML 正文
+    :return: {链接: {"title": 标题}} 字典
+    """
+    links_and_titles = {}
+    root = parse_html(html_content)
+    if root is None:
+        return links_and_titles
+
+    for a_tag in HIPPOCAMPUS_TITLES(root):
+        heading = HIPPOCAMPUS_HEADING(a_tag)
+        links_and_titles[a_tag.get("href")] = {
+            "title": _stripped_text(heading[0]) if heading else 'No Title'
+        }
+    return links_and_titles
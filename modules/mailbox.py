@@ -0,0 +1,413 @@
+import base64
+import email
+import imaplib
+import os
+import quopri
+import re
+import ssl
+import threading
+from datetime import datetime, timedelta
+from email.utils import parseaddr
+from dotenv import load_dotenv
+from modules.logger import setup_logger
+from modules import checkpoint as checkpoint_store
+from modules import metrics
+
+log = setup_logger("mailbox")
+
+# 每条 FETCH / STORE 命令包含的最大 UID 数
+DEFAULT_BATCH_SIZE = 50
+
+UID_PATTERN = re.compile(rb'UID (\d+)')
+SECTION_PATTERN = re.compile(rb'BODY\[([^\]]*)\]')
+LITERAL_PATTERN = re.compile(rb'\{(\d+)\}$')
+# BODYSTRUCTURE 的 s 表达式：括号、带引号的字符串、NIL、其他原子
+TOKEN_PATTERN = re.compile(rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|(NIL)(?=[\s()])|([^\s()"]+))')
+
+
+def since_date(date_range):
+    """
+    将 '10d'、'1m'、'6m'、'1y' 等日期范围转换为 IMAP 的 SINCE 日期。
+    :param date_range: 日期范围，支持最近 N 天（'Nd'）、N 月（'Nm'）、N 年（'Ny'）
+    :return: IMAP 日期格式字符串
+    """
+    unit = date_range[-1]  # 获取单位（d, m, y）
+    value = int(date_range[:-1])  # 获取时间值
+    if unit == 'd':  # 最近 N 天
+        since = datetime.now() - timedelta(days=value)
+    elif unit == 'm':  # 最近 N 月
+        since = datetime.now() - timedelta(days=value * 30)
+    elif unit == 'y':  # 最近 N 年
+        since = datetime.now() - timedelta(days=value * 365)
+    else:
+        raise ValueError("无效的日期范围格式，应为 '10d', '1m' 或 '6m' 等。")
+    return since.strftime("%d-%b-%Y")
+
+
+def _from_criteria(senders):
+    # IMAP 的 OR 只接受两个条件，多个发件人需要嵌套
+    if len(senders) == 1:
+        return f'FROM "{senders[0]}"'
+    return f'OR FROM "{senders[0]}" ({_from_criteria(senders[1:])})'
+
+
+def _resume_criteria(starts):
+    # 每个来源从自己的断点之后开始搜索，用嵌套 OR 合并成一条 SEARCH
+    sender, start = starts[0]
+    criteria = f'UID {start}:* FROM "{sender}"'
+    if len(starts) == 1:
+        return criteria
+    return f'OR ({criteria}) ({_resume_criteria(starts[1:])})'
+
+
+def parse_fetch_response(data):
+    """
+    解析 imaplib 的 FETCH 响应，按 UID 归并每封邮件的各个部分。
+    BODYSTRUCTURE 中以字面量形式返回的字符串会被还原成带引号的字符串写回响应文本。
+    :param data: imaplib 返回的响应列表
+    :return: {uid: {"meta": 响应文本, "sections": {段名: 字节串}}} 字典
+    """
+    messages = []
+    current = None
+    for part in data:
+        if isinstance(part, tuple):
+            header, literal = part
+            # 以 "<序号> (" 开头的是新邮件，否则是同一邮件的后续内容
+            if current is None or re.match(rb'\d+ \(', header):
+                current = {"uid": None, "meta": b"", "sections": {}}
+                messages.append(current)
+            section = SECTION_PATTERN.findall(header)
+            if section and LITERAL_PATTERN.search(header):
+                current["meta"] += header
+                current["sections"][section[-1].decode()] = literal
+            else:
+                escaped = literal.replace(b'\\', b'\\\\').replace(b'"', b'\\"')
+                current["meta"] += LITERAL_PATTERN.sub(b'', header) + b'"' + escaped + b'"'
+            uid = UID_PATTERN.search(header)
+            if uid:
+                current["uid"] = uid.group(1).decode()
+        elif isinstance(part, bytes) and current is not None:
+            # 有的服务器把 UID 放在字面量之后
+            current["meta"] += part
+            uid = UID_PATTERN.search(part)
+            if uid and current["uid"] is None:
+                current["uid"] = uid.group(1).decode()
+            if part.endswith(b')'):
+                current = None
+    return {m["uid"]: m for m in messages if m["uid"] is not None}
+
+
+def parse_bodystructure(meta):
+    """
+    将 FETCH 响应中的 BODYSTRUCTURE 解析为嵌套列表。
+    :param meta: FETCH 响应文本
+    :return: 嵌套列表，字符串为 str，NIL 为 None，没有 BODYSTRUCTURE 时返回 None
+    """
+    start = meta.find(b'BODYSTRUCTURE')
+    if start < 0:
+        return None
+    stack = [[]]
+    for match in TOKEN_PATTERN.finditer(meta, start + len(b'BODYSTRUCTURE')):
+        opening, closing, quoted, nil, atom = match.groups()
+        if opening:
+            stack.append([])
+        elif closing:
+            item = stack.pop()
+            if not stack:
+                return None
+            stack[-1].append(item)
+            if len(stack) == 1:
+                return item
+        elif quoted is not None:
+            stack[-1].append(re.sub(rb'\\(.)', rb'\1', quoted).decode("utf-8", "replace"))
+        elif nil:
+            stack[-1].append(None)
+        else:
+            stack[-1].append(atom.decode("utf-8", "replace"))
+    return None
+
+
+def find_html_part(body, section=""):
+    """
+    在 BODYSTRUCTURE 中查找第一个不是附件的 text/html 部分。
+    :param body: parse_bodystructure 的结果
+    :param section: 当前部分的段号
+    :return: (段号, 字符集, 传输编码)，没有 HTML 部分时返回 None
+    """
+    if not body:
+        return None
+    if isinstance(body[0], list):
+        # multipart：开头连续的列表是子部分，之后是子类型和扩展字段
+        for index, child in enumerate(body, 1):
+            if not isinstance(child, list):
+                break
+            found = find_html_part(child, f"{section}.{index}" if section else str(index))
+            if found:
+                return found
+        return None
+
+    if len(body) < 7 or str(body[0]).lower() != "text" or str(body[1]).lower() != "html":
+        return None
+    # text 类型的扩展字段：md5 在第 9 个，disposition 在第 10 个
+    disposition = body[9] if len(body) > 9 else None
+    if isinstance(disposition, list) and disposition and str(disposition[0]).lower() == "attachment":
+        return None
+    params = body[2] if isinstance(body[2], list) else []
+    params = {str(k).lower(): v for k, v in zip(params[::2], params[1::2])}
+    # 非 multipart 邮件的正文段号为 1
+    return section or "1", params.get("charset"), str(body[5] or "7bit").lower()
+
+
+def decode_part(payload, encoding, charset):
+    """
+    按传输编码和字符集解码邮件部分。
+    :param payload: 原始字节串
+    :param encoding: 传输编码（base64、quoted-printable 等）
+    :param charset: 字符集，为 None 时按 utf-8 处理
+    :return: 解码后的字符串
+    """
+    if encoding == "base64":
+        payload = base64.b64decode(payload)
+    elif encoding == "quoted-printable":
+        payload = quopri.decodestring(payload)
+    try:
+        return payload.decode(charset or "utf-8", errors="replace")
+    except LookupError:
+        return payload.decode("utf-8", errors="replace")
+
+
+class MailboxSession:
+    """
+    所有邮件来源共用的 IMAP 会话：只登录一次，用一次 SEARCH 找出所有发件人的邮件，
+    按 UID 批量获取邮件的 HTML 正文，并用一条 STORE 命令批量标记已读。
+    有断点的来源用 UID n:* 增量读取，没有断点时按未读邮件读取。
+    """
+
+    def __init__(self, server=None, port=None, batch_size=None, checkpoint=None):
+        """
+        :param server: IMAP 服务器地址，默认读取 PAPERBOT_IMAP_HOST，未设置时为 imap.gmail.com
+        :param port: IMAP 端口，默认读取 PAPERBOT_IMAP_PORT，未设置时为 993
+        :param batch_size: 每条 FETCH / STORE 命令包含的最大 UID 数
+        :param checkpoint: CheckpointStore 实例，默认使用全局断点；PAPERBOT_CHECKPOINT=0 时不使用断点
+        """
+        self.server = server or os.getenv("PAPERBOT_IMAP_HOST", "imap.gmail.com")
+        self.port = int(port or os.getenv("PAPERBOT_IMAP_PORT", 993))
+        # PAPERBOT_IMAP_SSL=0 时使用明文连接，仅用于本地测试服务器
+        self.use_ssl = os.getenv("PAPERBOT_IMAP_SSL", "1") != "0"
+        self.batch_size = batch_size or int(os.getenv("PAPERBOT_IMAP_BATCH", DEFAULT_BATCH_SIZE))
+        if checkpoint is None and os.getenv("PAPERBOT_CHECKPOINT", "1") != "0":
+            checkpoint = checkpoint_store.get_store()
+        self.checkpoint = checkpoint
+        self.uidvalidity = None
+        self.uidnext = None
+        self.mail = None
+        self._selected = False
+        self._messages = {}
+        # imaplib 连接不能被多个线程同时使用
+        self._lock = threading.RLock()
+
+    @metrics.timed("imap_connect")
+    def connect(self):
+        """
+        连接并登录邮箱，已连接时直接返回。
+        """
+        with self._lock:
+            if self.mail is not None:
+                return
+            try:
+                # 从 .env 文件中加载邮箱账号和密码
+                load_dotenv()
+                EMAIL_ACCOUNT = os.getenv("EMAIL_ACCOUNT")
+                EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
+
+                # 检查账号和密码是否正确加载
+                if not EMAIL_ACCOUNT or not EMAIL_PASSWORD:
+                    raise ValueError("邮箱账号或密码未正确加载，请检查 .env 文件。")
+
+                # 使用 SSL 连接到邮箱
+                if self.use_ssl:
+                    context = ssl.create_default_context()
+                    self.mail = imaplib.IMAP4_SSL(self.server, self.port, ssl_context=context)
+                else:
+                    self.mail = imaplib.IMAP4(self.server, self.port)
+                self.mail.login(EMAIL_ACCOUNT, EMAIL_PASSWORD)
+                log.info("成功连接到邮箱！")
+            except Exception as e:
+                self.mail = None
+                log.info(f"邮箱连接失败：{e}")
+
+    def _select(self):
+        if not self._selected:
+            self.mail.select("inbox")
+            status, data = self.mail.response('UIDVALIDITY')
+            self.uidvalidity = data[0].decode() if data and data[0] else None
+            status, data = self.mail.response('UIDNEXT')
+            self.uidnext = int(data[0]) if data and data[0] else None
+            self._selected = True
+
+    def _search(self, criteria, date_range):
+        if date_range:
+            criteria += f' SINCE "{since_date(date_range)}"'
+        status, data = self.mail.uid('SEARCH', None, f'({criteria})')
+        return {uid.decode() for uid in data[0].split()} if data and data[0] else set()
+
+    def _batches(self, uids):
+        for i in range(0, len(uids), self.batch_size):
+            yield ",".join(uids[i:i + self.batch_size])
+
+    @metrics.timed("imap_prefetch")
+    def prefetch(self, senders, date_range=None):
+        """
+        用一次 SEARCH 找出所有发件人的待处理邮件，并批量获取邮件的 HTML 正文。
+        :param senders: 发件人地址列表
+        :param date_range: 按日期筛选邮件（例如 '10d', '1m', '6m'）
+        """
+        with self._lock:
+            senders = [s for s in senders if (s, date_range) not in self._messages]
+            if not senders:
+                return
+            if self.mail is None:
+                raise ConnectionError("邮箱未连接，请先调用 connect()")
+            self._select()
+
+            # 有断点的来源：只搜索 last_uid 之后的新邮件，再补上次没处理完的邮件
+            checkpoints = {}
+            if self.checkpoint is not None and self.uidvalidity:
+                for sender in senders:
+                    saved = self.checkpoint.get(sender, self.uidvalidity)
+                    if saved is not None:
+                        checkpoints[sender] = saved
+            fresh = [s for s in senders if s not in checkpoints]
+
+            new_uids = set()
+            if checkpoints:
+                starts = [(sender, last_uid + 1) for sender, (last_uid, _) in checkpoints.items()]
+                new_uids = self._search(_resume_criteria(starts), date_range)
+            unseen_uids = self._search(f'UNSEEN {_from_criteria(fresh)}', date_range) if fresh else set()
+            pending_uids = set().union(*(pending for _, pending in checkpoints.values()))
+
+            uids = sorted(new_uids | unseen_uids | pending_uids, key=int)
+
+            grouped = {sender: [] for sender in senders}
+            for uid, sender, html in self.fetch_html(uids):
+                for candidate in senders:
+                    if sender != candidate.lower():
+                        continue
+                    if candidate in checkpoints:
+                        last_uid, pending = checkpoints[candidate]
+                        # UID n:* 在没有新邮件时也会返回最大的那封，需要再过滤一次
+                        wanted = int(uid) > last_uid or uid in pending
+                    else:
+                        wanted = uid in unseen_uids
+                    if wanted:
+                        grouped[candidate].append((uid, html))
+                    break
+
+            # 本次搜索已覆盖到的最大 UID，没有邮件的来源也从这里建立断点，下次不必从 UID 1 开始
+            if self.uidnext:
+                searched_uid = self.uidnext - 1
+            else:
+                searched_uid = max((int(uid) for uid in new_uids | unseen_uids), default=None)
+
+            log.info(f"共找到 {sum(len(m) for m in grouped.values())} 封来自 {len(senders)} 个发件人的待处理邮件。")
+            for sender, messages in grouped.items():
+                self._messages[(sender, date_range)] = messages
+                metrics.incr("emails_total", len(messages), sender=sender)
+                if self.checkpoint is not None and self.uidvalidity:
+                    fetched = [uid for uid, _ in messages]
+                    # 已被删除的邮件不会再取到，从未完成列表中移除
+                    missing = checkpoints.get(sender, (0, set()))[1] - set(fetched)
+                    if missing:
+                        self.checkpoint.complete(sender, missing)
+                    self.checkpoint.begin(sender, self.uidvalidity, fetched, searched_uid)
+
+    @metrics.timed("imap_fetch")
+    def fetch_html(self, uids):
+        """
+        先批量获取 BODYSTRUCTURE 和发件人，再按段号批量获取 HTML 部分，
+        不下载图片、附件等其他部分。BODY.PEEK 不会自动标记已读。
+        :param uids: UID 列表
+        :return: 按 UID 顺序排列的 (uid, 发件人地址, HTML 文本) 列表，没有 HTML 部分时 HTML 为 None
+        """
+        senders = {}
+        parts = {}
+        html = {}
+        with self._lock:
+            for uid_set in self._batches(uids):
+                status, data = self.mail.uid('FETCH', uid_set, '(UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS (FROM)])')
+                for uid, item in parse_fetch_response(data).items():
+                    header = next((v for k, v in item["sections"].items() if k.startswith("HEADER")), b"")
+                    senders[uid] = parseaddr(email.message_from_bytes(header).get("From", ""))[1].lower()
+                    part = find_html_part(parse_bodystructure(item["meta"]))
+                    if part:
+                        parts[uid] = part
+                    else:
+                        log.info(f"邮件 {uid} 没有 HTML 正文，跳过。")
+
+            # HTML 所在的段号相同的邮件合并成一条 FETCH 命令
+            by_section = {}
+            for uid, (section, charset, encoding) in parts.items():
+                by_section.setdefault(section, []).append(uid)
+            for section, section_uids in by_section.items():
+                for uid_set in self._batches(section_uids):
+                    status, data = self.mail.uid('FETCH', uid_set, f'(UID BODY.PEEK[{section}])')
+                    for uid, item in parse_fetch_response(data).items():
+                        if uid not in parts or section not in item["sections"]:
+                            continue
+                        _, charset, encoding = parts[uid]
+                        html[uid] = decode_part(item["sections"][section], encoding, charset)
+
+        return [(uid, senders[uid], html.get(uid)) for uid in uids if uid in senders]
+
+    def messages(self, sender, limit=None, date_range=None):
+        """
+        获取某个发件人的待处理邮件，未预取时会单独搜索一次。
+        :param sender: 发件人地址
+        :param limit: 只返回最近的 limit 封邮件
+        :param date_range: 按日期筛选邮件
+        :return: (uid, HTML 文本) 列表，没有 HTML 部分的邮件 HTML 为 None
+        """
+        with self._lock:
+            self.prefetch([sender], date_range)
+            messages = self._messages[(sender, date_range)]
+        if limit:
+            messages = messages[-limit:]
+        return messages
+
+    @metrics.timed("imap_store")
+    def mark_seen(self, uids):
+        """
+        用批量 STORE 命令把邮件标记为已读。
+        :param uids: UID 列表
+        """
+        uids = list(uids)
+        if not uids:
+            return
+        with self._lock:
+            if self.mail is None:
+                raise ConnectionError("邮箱未连接，请先调用 connect()")
+            self._select()
+            for uid_set in self._batches(uids):
+                self.mail.uid('STORE', uid_set, '+FLAGS', '(\\Seen)')
+
+    def complete(self, sender, uids):
+        """
+        记录邮件已处理完成，下次运行不再读取。
+        :param sender: 发件人地址
+        :param uids: UID 列表
+        """
+        if self.checkpoint is not None and self.uidvalidity:
+            self.checkpoint.complete(sender, uids)
+
+    def logout(self):
+        # 退出登录
+        with self._lock:
+            if self.mail:
+                try:
+                    self.mail.logout()
+                    log.info("成功断开邮箱连接。")
+                except Exception as e:
+                    log.info(f"断开连接时出错：{e}")
+                self.mail = None
+                self._selected = False
+                self._messages = {}
@@ -0,0 +1,335 @@
+import asyncio
+import functools
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlparse
+from modules.logger import setup_logger
+
+script_dir = os.path.dirname(os.path.abspath(__file__))  # 当前脚本所在目录
+project_root = os.path.abspath(os.path.join(script_dir, ".."))  # 项目根目录
+log = setup_logger("metrics")
+
+PREFIX = "paperbot_"
+# 耗时直方图的桶上限（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# 每个直方图保留的样本数，用于计算分位数
+MAX_SAMPLES = 2048
+# OpenAI 模型每百万 token 的美元价格（输入, 输出），用于估算费用
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+
+def domain_of(url):
+    """
+    取链接的主机名（去掉 www.），用作按出版商统计的标签。
+    :param url: 链接
+    :return: 主机名，无法解析时返回 "unknown"
+    """
+    host = (urlparse(url).hostname or "").lower() if url else ""
+    if host.startswith("www."):
+        host = host[4:]
+    return host or "unknown"
+
+
+def _labels_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _quantile(ordered, q):
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+class Histogram:
+    """
+    分桶计数加上一份蓄水池样本，蓄水池用来估计 p50 / p95 / p99。
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.samples = []
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(value)
+        else:
+            slot = random.randrange(self.count)
+            if slot < MAX_SAMPLES:
+                self.samples[slot] = value
+
+    def snapshot(self):
+        ordered = sorted(self.samples)
+        cumulative, total = [], 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            cumulative.append([bound, total])
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "p50": _quantile(ordered, 0.50),
+            "p95": _quantile(ordered, 0.95),
+            "p99": _quantile(ordered, 0.99),
+            "buckets": cumulative,
+        }
+
+
+class MetricsRegistry:
+    """
+    一次运行内的计数器和直方图，按指标名和标签区分，多线程安全。
+    """
+
+    def __init__(self):
+        self.run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.started = time.time()
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name, value=1, **labels):
+        """
+        计数器加 value。
+        :param name: 指标名，例如 cache_requests_total
+        :param value: 增量
+        :param labels: 标签，值为 None 的标签会被忽略
+        """
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        """
+        向直方图记录一个数值。
+        :param name: 指标名
+        :param value: 数值
+        :param buckets: 首次创建该直方图时使用的桶上限
+        :param labels: 标签
+        """
+        key = (name, _labels_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        """
+        记录代码块的耗时到 stage_seconds，抛出异常时另外计入 stage_errors_total。
+        :param stage: 阶段名，例如 page_fetch、translate
+        :param labels: 额外标签，例如 domain
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.incr("stage_errors_total", stage=stage, **labels)
+            raise
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+    def timed(self, stage, **labels):
+        """
+        timer 的装饰器形式，同时支持普通函数和协程函数。
+        """
+        def decorator(func):
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.timer(stage, **labels):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def report(self):
+        """
+        生成本次运行的指标报告。
+        :return: 可直接序列化为 JSON 的字典
+        """
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = [{"name": name, "labels": dict(labels), **histogram.snapshot()}
+                          for (name, labels), histogram in sorted(self._histograms.items())]
+        return {
+            "run_id": self.run_id,
+            "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "duration_s": time.time() - self.started,
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+    def prometheus(self):
+        """
+        按 Prometheus 文本格式导出，可供 node_exporter 的 textfile collector 读取。
+        :return: 文本
+        """
+        def render(labels, extra=None):
+            pairs = list(labels) + (extra or [])
+            if not pairs:
+                return ""
+            escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {PREFIX}{name} counter")
+                    typed.add(name)
+                lines.append(f"{PREFIX}{name}{render(labels)} {value}")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {PREFIX}{name} histogram")
+                    typed.add(name)
+                total = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    total += count
+                    lines.append(f"{PREFIX}{name}_bucket{render(labels, [('le', bound)])} {total}")
+                lines.append(f"{PREFIX}{name}_bucket{render(labels, [('le', '+Inf')])} {histogram.count}")
+                lines.append(f"{PREFIX}{name}_sum{render(labels)} {histogram.sum}")
+                lines.append(f"{PREFIX}{name}_count{render(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary_lines(self):
+        """
+        按总耗时从高到低列出各阶段，用于写入日志。
+        """
+        stages = {}
+        with self._lock:
+            for (name, labels), histogram in self._histograms.items():
+                if name != "stage_seconds":
+                    continue
+                stage = dict(labels).get("stage")
+                merged = stages.setdefault(stage, [0, 0.0, []])
+                merged[0] += histogram.count
+                merged[1] += histogram.sum
+                merged[2].extend(histogram.samples)
+        lines = []
+        for stage, (count, total, samples) in sorted(stages.items(), key=lambda item: -item[1][1]):
+            ordered = sorted(samples)
+            lines.append(f"阶段 {stage}：{count} 次，合计 {total:.2f} s，"
+                         f"p50 {_quantile(ordered, 0.5) * 1000:.0f} ms，p95 {_quantile(ordered, 0.95) * 1000:.0f} ms")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+        self.run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.started = time.time()
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry():
+    return _registry
+
+
+def incr(name, value=1, **labels):
+    _registry.incr(name, value, **labels)
+
+
+def observe(name, value, buckets=DEFAULT_BUCKETS, **labels):
+    _registry.observe(name, value, buckets, **labels)
+
+
+def timer(stage, **labels):
+    return _registry.timer(stage, **labels)
+
+
+def timed(stage, **labels):
+    return _registry.timed(stage, **labels)
+
+
+def record_usage(stage, model, usage):
+    """
+    记录一次 OpenAI 请求的 token 用量和估算费用。
+    :param stage: 阶段名，例如 translate、pdf
+    :param model: 请求使用的模型
+    :param usage: 响应中的 usage 对象，为 None 时只计请求数
+    """
+    _registry.incr("openai_requests_total", stage=stage, model=model)
+    if usage is None:
+        return
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", 0) or 0
+    _registry.incr("openai_tokens_total", prompt, stage=stage, model=model, kind="prompt")
+    _registry.incr("openai_tokens_total", completion, stage=stage, model=model, kind="completion")
+    price = MODEL_PRICES.get(model)
+    if price:
+        cost = (prompt * price[0] + completion * price[1]) / 1_000_000
+        _registry.incr("openai_cost_usd_total", cost, stage=stage, model=model)
+
+
+def report():
+    return _registry.report()
+
+
+def prometheus():
+    return _registry.prometheus()
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write(content)
+    os.replace(tmp_path, path)
+
+
+def write_reports():
+    """
+    运行结束时输出指标：各阶段耗时写入日志，JSON 报告默认写到 logs/metrics_<run_id>.json，
+    设置 PAPERBOT_METRICS_PROM 时另外写一份 Prometheus 文本。
+    PAPERBOT_METRICS_REPORT 可指定 JSON 报告路径，设为 0 时不写。
+    :return: JSON 报告路径，未写入时返回 None
+    """
+    for line in _registry.summary_lines():
+        log.info(line)
+
+    json_path = os.getenv("PAPERBOT_METRICS_REPORT",
+                          os.path.join(project_root, "logs", f"metrics_{_registry.run_id}.json"))
+    if json_path == "0":
+        json_path = None
+    try:
+        if json_path:
+            _write(json_path, json.dumps(report(), ensure_ascii=False, indent=2))
+            log.info(f"指标报告已保存到：{json_path}")
+        prom_path = os.getenv("PAPERBOT_METRICS_PROM")
+        if prom_path:
+            _write(prom_path, prometheus())
+    except Exception as e:
+        log.info(f"保存指标报告时出错：{e}")
+    return json_path
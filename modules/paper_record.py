@@ -0,0 +1,148 @@
+import json
+from collections.abc import Mapping
+from dataclasses import dataclass, fields
+
+# 字段名与原有 link_types 字典中的键一一对应，顺序即 txt 文件和 Telegram 消息中的顺序
+LEGACY_KEYS = {
+    "type": "type",
+    "title": "title",
+    "file_path": "file_path",
+    "authors": "Authors",
+    "abstract_cn": "Abstract(cn)",
+    "abstract": "Abstract",
+    "keywords": "Keywords",
+    "journal": "Journal",
+    "year": "Year",
+    "volume": "Volume",
+    "issue": "Issue",
+    "pages": "pages",
+    "doi": "DOI",
+    "apa_citation": "APA Citation",
+}
+FIELD_NAMES = {legacy: name for name, legacy in LEGACY_KEYS.items()}
+
+
+def _joined(value, default=None):
+    # GPT 和 stork_url 返回的作者、关键词是列表，统一拼成字符串
+    if isinstance(value, list):
+        return ", ".join(str(item) for item in value)
+    return default if value is None else value
+
+
+@dataclass(slots=True)
+class PaperRecord(Mapping):
+    """
+    一篇论文的详细信息。同时实现只读的 Mapping 接口，按原有的键（Authors、Abstract(cn)、APA Citation 等）
+    访问字段，Telegram、Markdown 和记录存储可以像使用原来的字典一样使用它。
+    """
+    type: str = "HTML"
+    title: object = None
+    file_path: object = "None"
+    authors: object = None
+    abstract_cn: object = None
+    abstract: object = None
+    keywords: object = None
+    journal: object = None
+    year: object = None
+    volume: object = None
+    issue: object = None
+    pages: object = None
+    doi: object = None
+    apa_citation: object = None
+
+    @classmethod
+    def from_reference(cls, results, title=None, type="HTML"):
+        """
+        由 getabstract / stork_url 返回的参考文献字典创建记录。
+        :param results: 参考文献字典
+        :param title: 标题，默认使用参考文献中的标题
+        :param type: 来源类型
+        :return: PaperRecord
+        """
+        get = results.get
+        return cls(
+            type=type,
+            title=title if title is not None else get('title'),
+            authors=_joined(get('authors')),
+            abstract_cn=get('translation'),
+            abstract=get('abstract'),
+            keywords=_joined(get('keywords')),
+            journal=get('journal'),
+            year=get('year'),
+            volume=get('volume'),
+            issue=get('issue'),
+            pages=get('pages'),
+            doi=get('doi'),
+            apa_citation=get('apa_citation'),
+        )
+
+    @classmethod
+    def from_pdf(cls, results, title, file_path):
+        """
+        由 PDF 解析结果（gpt_handler 返回的 JSON）创建记录，PDF 中没有的出版信息记为 Unknown。
+        :param results: 解析结果字典
+        :param title: 邮件中的标题
+        :param file_path: PDF 文件路径
+        :return: PaperRecord
+        """
+        get = results.get
+        return cls(
+            type="PDF",
+            title=title,
+            file_path=file_path,
+            authors=_joined(get('authors')) if isinstance(get('authors'), list) else 'Unknown',
+            abstract_cn=get('translation', 'Unknown'),
+            abstract=get('abstract', 'Unknown'),
+            keywords=_joined(get('keywords')) if isinstance(get('keywords'), list) else 'Unknown',
+            journal="Unknown",
+            year="Unknown",
+            volume="Unknown",
+            issue="Unknown",
+            pages="Unknown",
+            doi="Unknown",
+            apa_citation="Unknown",
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        由原有键或字段名组成的字典创建记录，忽略其他键（例如 Link）。
+        """
+        values = {}
+        for key, value in data.items():
+            name = FIELD_NAMES.get(key, key)
+            if name in LEGACY_KEYS:
+                values[name] = value
+        return cls(**values)
+
+    def to_dict(self):
+        """
+        :return: 使用原有键的字典
+        """
+        return {LEGACY_KEYS[f.name]: getattr(self, f.name) for f in fields(self)}
+
+    def to_json(self):
+        """
+        序列化为按字段顺序排列的紧凑 JSON 数组，不丢失换行等内容。
+        """
+        return json.dumps([getattr(self, f.name) for f in fields(self)], ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        if isinstance(data, dict):
+            return cls.from_dict(data)
+        return cls(*data)
+
+    # Mapping 接口：按原有键访问
+    def __getitem__(self, key):
+        name = FIELD_NAMES.get(key)
+        if name is None:
+            raise KeyError(key)
+        return getattr(self, name)
+
+    def __iter__(self):
+        return iter(LEGACY_KEYS.values())
+
+    def __len__(self):
+        return len(LEGACY_KEYS)
@@ -1,11 +1,23 @@
+import functools
 import json
+import multiprocessing
 import os
 import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from modules.logger import setup_logger
-import pymupdf4llm
+from modules import metrics
+from modules import pdf_store
+from modules.pdf_pages import extract_page_window
 from dotenv import load_dotenv
 from openai import OpenAI
 
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
 script_dir = os.path.dirname(os.path.abspath(__file__))  # 当前脚本所在目录
 project_root = os.path.abspath(os.path.join(script_dir, ".."))  # 项目根目录
 log = setup_logger("pdf_handler")
@@ -18,43 +30,173 @@ except Exception as e:
     log.info(f"初始化 OpenAI API 时出错：{e}")
 
 
+DEFAULT_MODEL = "gpt-4o-mini"
+# 发送给 GPT 的页面内容上限（token），0 表示不限制
+DEFAULT_TOKEN_BUDGET = 6000
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _pdf_workers():
+    # 默认给主进程留一个核心，单核机器上直接在当前进程中解析；PAPERBOT_PDF_WORKERS=0 时同样不用进程池
+    default = min(4, (os.cpu_count() or 1) - 1)
+    return int(os.getenv("PAPERBOT_PDF_WORKERS", default))
+
+
+def get_pool():
+    """
+    获取解析 PDF 的进程池，首次调用时创建。PyMuPDF 的解析是 CPU 密集型的，
+    放到子进程中不会占用 GIL，其他链接的网页抓取可以同时进行。
+    :return: ProcessPoolExecutor 实例，PAPERBOT_PDF_WORKERS=0 时返回 None
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = _pdf_workers()
+            if workers <= 0:
+                return None
+            # 主进程中已有多个线程，用 spawn 启动子进程，避免 fork 复制锁的状态
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            log.info(f"PDF 解析进程池已启动，进程数：{workers}")
+        return _pool
+
+
+def close_pool():
+    """
+    关闭 PDF 解析进程池。
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def page_window(pdf_full_path, keyword="Abstract"):
+    """
+    在进程池中找到包含关键词的页面，并把它前后的几页转换为 Markdown。
+    :param pdf_full_path: PDF 文件的完整路径
+    :param keyword: 搜索的关键词
+    :return: [(页码, Markdown 文本)] 列表，页码从 0 开始；未找到关键词时返回 None
+    """
+    global _pool
+    pool = get_pool()
+    if pool is None:
+        pages = extract_page_window(pdf_full_path, keyword)
+    else:
+        try:
+            pages = pool.submit(extract_page_window, pdf_full_path, keyword).result()
+        except BrokenProcessPool as e:
+            # 子进程异常退出后进程池不能再用，丢弃后在当前进程中重试
+            log.info(f"PDF 解析进程池已损坏，改为在当前进程中解析：{e}")
+            with _pool_lock:
+                if _pool is pool:
+                    _pool = None
+            pages = extract_page_window(pdf_full_path, keyword)
+    if pages:
+        metrics.observe("pdf_pages_converted", len(pages), buckets=(1, 2, 4, 8, 16, 32, 64))
+    return pages
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model):
+    # 结果按模型缓存，下面的提示只会出现一次
+    if tiktoken is None:
+        log.info("未安装 tiktoken，token 数改为按字符数估算，中文等非 ASCII 文本按每字 1 个 token 计")
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        try:
+            return tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            log.info(f"加载 tiktoken 编码时出错，改为按字符数估算：{e}")
+            return None
+
+
+def count_tokens(text, model=DEFAULT_MODEL):
+    """
+    计算文本的 token 数。没有安装 tiktoken 时估算：ASCII 字符按 4 个约 1 个 token，
+    中文等非 ASCII 字符按每个 1 个 token，宁可多估也不超出预算。
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        ascii_chars = len(text.encode("ascii", "ignore"))
+        return (ascii_chars + 3) // 4 + len(text) - ascii_chars
+    return len(encoding.encode(text))
+
+
+def truncate_tokens(text, max_tokens, model=DEFAULT_MODEL):
+    """
+    截取文本开头的 max_tokens 个 token。
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text)
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+def build_page_text(pages, token_budget=None, model=DEFAULT_MODEL):
+    """
+    把页面窗口拼成一段文本，总长度超过 token 预算时，放不下的那一页只保留开头部分，之后的页面丢弃。
+    :param pages: page_window 返回的 [(页码, Markdown 文本)] 列表
+    :param token_budget: token 上限，默认读取 PAPERBOT_PDF_TOKEN_BUDGET，0 表示不限制
+    :param model: 用于选择分词器的模型
+    :return: 拼接后的文本
+    """
+    if token_budget is None:
+        token_budget = int(os.getenv("PAPERBOT_PDF_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+    page_text = ""
+    used = 0
+    for page_num, page in pages:
+        chunk = f"# Page {page_num + 1}\n{page}\n"
+        if token_budget <= 0:
+            page_text += chunk
+            continue
+        tokens = count_tokens(chunk, model)
+        if used + tokens > token_budget:
+            page_text += truncate_tokens(chunk, token_budget - used, model)
+            log.info(f"页面内容超过 {token_budget} token，截断在第 {page_num + 1} 页")
+            break
+        page_text += chunk
+        used += tokens
+    return page_text
+
+
+@metrics.timed("pdf_extract")
 def extract_relevant_pages(pdf_path, keyword="Abstract"):
     """
-    提取包含关键词的页面以及前后一共四页的内容。
-    :param pdf_path: PDF 文件路径
+    提取包含关键词的页面以及前后一共四页的内容。内容相同的 PDF 只解析一次，结果按内容哈希保存。
+    :param pdf_path: PDF 文件路径，或 pdf_storage 中的文件名
     :param keyword: 搜索的关键词
     :return: 提取的 Markdown 文本
     """
     try:
-        pdf_path = re.sub(r'[\\/*?:"<>|&;]', '_', pdf_path)
-        pdf_full_path = os.path.join(project_root, "pdf_storage", pdf_path)
-        txt_full_path = pdf_path + ".txt"
-        # 打开 PDF 文件
-        abstract_page = None
-        md_text = pymupdf4llm.to_markdown(pdf_full_path)
-
-        # 以“-----”作为分隔符将该对象分割成多个页面
-        pages = md_text.split("-----")
-        for page in pages:
-            if keyword in page:
-                abstract_page = pages.index(page)
-                start_page = max(0, abstract_page - 1)
-                end_page = min(len(pages), abstract_page + 3)
-                break
-
-        if abstract_page is None:
+        if os.path.exists(pdf_path):
+            pdf_full_path = pdf_path
+        else:
+            pdf_path = re.sub(r'[\\/*?:"<>|&;]', '_', pdf_path)
+            pdf_full_path = os.path.join(project_root, "pdf_storage", pdf_path)
+        txt_full_path = os.path.abspath(pdf_full_path) + ".txt"
+
+        digest, cached = pdf_store.cached_result(pdf_full_path)
+        if cached is not None:
+            log.info(f"使用已保存的解析结果：{pdf_full_path}")
+            return cached
+
+        pages = page_window(pdf_full_path, keyword)
+
+        if pages is None:
             log.info(f"未找到关键词 '{keyword}' 的页面")
             return None
 
-            # 提取页面文本并转为 Markdown
-        page_text = ""
-        for page_num in range(start_page, end_page):
-            page = pages[page_num]
-            page_text += f"# Page {page_num + 1}\n"
-            page_text += page + "\n"
-            result = gpt_handler(page_text)
-            # 保存结果为 .txt 文件
+        # 整个页面窗口只发送一次请求
+        result = gpt_handler(build_page_text(pages))
+        # 保存结果为 .txt 文件
         if result:
+            pdf_store.store_result(digest, result)
             save_result_as_txt(result, txt_full_path)
         return result
 
@@ -62,7 +204,8 @@ def extract_relevant_pages(pdf_path, keyword="Abstract"):
         log.info(f"提取页面内容时出错：{e}")
         return None
 
-def gpt_handler(text, model="gpt-4o-mini"):
+@metrics.timed("gpt")
+def gpt_handler(text, model=DEFAULT_MODEL):
     """
     调用 GPT API，发送输入数据并返回结果。
     :param text: 要发送的 Markdown 文本
@@ -137,6 +280,7 @@ def gpt_handler(text, model="gpt-4o-mini"):
                 }
             }
         )
+        metrics.record_usage("pdf", model, getattr(response, "usage", None))
         return response.choices[0].message.content
     except Exception as e:
         log.info(f"调用 GPT API 时出错：{e}")
@@ -0,0 +1,55 @@
+import os
+import pymupdf
+import pymupdf4llm
+
+# 这个模块在 PDF 进程池的子进程中运行，只依赖 PyMuPDF，不导入 OpenAI 客户端和日志
+
+# 关键词页之前取 1 页、之后取 2 页，一共四页
+PAGES_BEFORE = 1
+PAGES_AFTER = 2
+
+
+def _streaming_enabled():
+    # PAPERBOT_PDF_STREAMING=0 时恢复整篇转换后再查找的旧流程
+    return os.getenv("PAPERBOT_PDF_STREAMING", "1") != "0"
+
+
+def _window(page_number, page_count):
+    return range(max(0, page_number - PAGES_BEFORE), min(page_count, page_number + PAGES_AFTER + 1))
+
+
+def find_keyword_page(doc, keyword):
+    """
+    逐页提取纯文本查找关键词，找到后立即停止，不会转换后面的页面。
+    :param doc: 已打开的 PyMuPDF 文档
+    :param keyword: 搜索的关键词
+    :return: 第一个包含关键词的页码（从 0 开始），未找到时返回 None
+    """
+    for page_number in range(doc.page_count):
+        if keyword in doc.load_page(page_number).get_text("text"):
+            return page_number
+    return None
+
+
+def extract_page_window(pdf_full_path, keyword="Abstract"):
+    """
+    找到包含关键词的页面，只把它前后的几页转换为 Markdown。
+    :param pdf_full_path: PDF 文件的完整路径
+    :param keyword: 搜索的关键词
+    :return: [(页码, Markdown 文本)] 列表，页码从 0 开始；未找到关键词时返回 None
+    """
+    if not _streaming_enabled():
+        # 以“-----”作为分隔符将整篇转换结果分割成多个页面
+        pages = pymupdf4llm.to_markdown(pdf_full_path).split("-----")
+        for page_number, page in enumerate(pages):
+            if keyword in page:
+                return [(n, pages[n]) for n in _window(page_number, len(pages))]
+        return None
+
+    with pymupdf.open(pdf_full_path) as doc:
+        page_number = find_keyword_page(doc, keyword)
+        if page_number is None:
+            return None
+        selected = list(_window(page_number, doc.page_count))
+        chunks = pymupdf4llm.to_markdown(doc, pages=selected, page_chunks=True, show_progress=False)
+    return [(n, chunk["text"]) for n, chunk in zip(selected, chunks)]
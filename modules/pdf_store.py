@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from modules.logger import setup_logger
+from modules import metrics
+from modules.result_cache import normalize_url, normalize_doi
+
+script_dir = os.path.dirname(os.path.abspath(__file__))  # 当前脚本所在目录
+project_root = os.path.abspath(os.path.join(script_dir, ".."))  # 项目根目录
+log = setup_logger("pdf_store")
+
+HASH_CHUNK = 1024 * 1024
+# 标题少于这么多个词时不用作键，避免 Editorial、Erratum 之类的标题把不同论文合并
+MIN_TITLE_WORDS = 4
+
+
+def normalize_title(title):
+    """
+    规范化标题，大小写、标点和空白不同的同一标题得到相同的键。
+    :param title: 标题或由标题生成的文件名
+    :return: 规范化后的标题
+    """
+    title = re.sub(r'\.pdf$', '', title.strip(), flags=re.IGNORECASE)
+    return " ".join(re.sub(r'[\W_]+', ' ', title.lower()).split())
+
+
+def hash_file(path):
+    """
+    计算文件内容的 SHA-256。
+    :param path: 文件路径
+    :return: 十六进制摘要
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PdfStore:
+    """
+    按内容哈希保存 PDF：文件放在 objects/<哈希前两位>/<哈希>.pdf，
+    SQLite 索引记录标题、链接、DOI 到哈希的对应关系，以及按哈希保存的解析结果。
+    """
+
+    def __init__(self, root):
+        """
+        :param root: 存储根目录，通常是 pdf_storage
+        """
+        self.root = root
+        self.objects = os.path.join(root, "objects")
+        self._lock = threading.Lock()
+        os.makedirs(self.objects, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS aliases ("
+            "key TEXT PRIMARY KEY, "
+            "hash TEXT NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_aliases_hash ON aliases (hash)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extractions ("
+            "hash TEXT PRIMARY KEY, "
+            "result TEXT NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def object_path(self, digest):
+        return os.path.join(self.objects, digest[:2], f"{digest}.pdf")
+
+    def digest_of(self, path):
+        """
+        取得 PDF 的内容哈希。存储中的文件直接从路径 objects/<h[:2]>/<h>.pdf 得到，
+        只有存储之外的文件才读取并计算。
+        :param path: PDF 文件路径
+        :return: 十六进制摘要
+        """
+        name, ext = os.path.splitext(os.path.basename(path))
+        if ext == ".pdf" and re.fullmatch(r"[0-9a-f]{64}", name) and \
+                os.path.abspath(path) == os.path.abspath(self.object_path(name)):
+            return name
+        return hash_file(path)
+
+    def _keys(self, url=None, title=None, doi=None):
+        keys = []
+        if doi and doi != "Unknown":
+            keys.append("doi:" + normalize_doi(doi))
+        if url:
+            keys.append("url:" + normalize_url(url))
+        title = normalize_title(title) if title else ""
+        if len(title.split()) >= MIN_TITLE_WORDS:
+            keys.append("title:" + title)
+        return keys
+
+    def find(self, url=None, title=None, doi=None):
+        """
+        按 DOI、链接或标题查找已保存的 PDF，依次尝试。
+        :return: 内容哈希，未找到或文件已被删除时返回 None
+        """
+        with self._lock:
+            for key in self._keys(url, title, doi):
+                row = self._conn.execute("SELECT hash FROM aliases WHERE key = ?", (key,)).fetchone()
+                if row and os.path.exists(self.object_path(row[0])):
+                    return row[0]
+        return None
+
+    def link(self, digest, url=None, title=None, doi=None):
+        """
+        登记标题、链接、DOI 到哈希的对应关系。
+        """
+        keys = self._keys(url, title, doi)
+        if not keys:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO aliases (key, hash, created_at) VALUES (?, ?, ?)",
+                [(key, digest, now) for key in keys]
+            )
+            self._conn.commit()
+
+    def add(self, path, url=None, title=None, doi=None):
+        """
+        把下载好的文件移入存储。内容相同的文件已存在时直接删除新文件。
+        :param path: 下载好的文件路径
+        :return: 内容哈希
+        """
+        digest = hash_file(path)
+        target = self.object_path(digest)
+        if os.path.exists(target):
+            os.remove(path)
+            metrics.incr("pdf_store_total", result="duplicate")
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(path, target)
+            metrics.incr("pdf_store_total", result="added")
+        self.link(digest, url, title, doi)
+        return digest
+
+    def get_result(self, digest):
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM extractions WHERE hash = ?", (digest,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_result(self, digest, result):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractions (hash, result, created_at) VALUES (?, ?, ?)",
+                (digest, json.dumps(result, ensure_ascii=False), time.time())
+            )
+            self._conn.commit()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """
+    获取全局存储实例，首次调用时创建。
+    :return: PdfStore 实例，创建失败时返回 None
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = PdfStore(os.getenv("PAPERBOT_PDF_STORAGE", os.path.join(project_root, "pdf_storage")))
+            except Exception as e:
+                log.info(f"初始化 PDF 存储时出错：{e}")
+                return None
+        return _store
+
+
+def find(url=None, title=None, doi=None):
+    """
+    查找已下载过的同一篇 PDF。
+    :param url: PDF 链接
+    :param title: 论文标题
+    :param doi: 文档的 DOI
+    :return: PDF 文件路径，未找到时返回 None
+    """
+    store = get_store()
+    if store is None:
+        return None
+    try:
+        digest = store.find(url=url, title=title, doi=doi)
+    except Exception as e:
+        log.info(f"查询 PDF 索引时出错：{e}")
+        return None
+    metrics.incr("cache_requests_total", cache="pdf", result="hit" if digest else "miss")
+    return store.object_path(digest) if digest else None
+
+
+def add(path, url=None, title=None, doi=None):
+    """
+    把下载好的 PDF 移入按内容哈希保存的存储，并登记标题、链接和 DOI。
+    :param path: 下载好的文件路径
+    :return: 存储中的文件路径，出错时返回原路径
+    """
+    store = get_store()
+    if store is None:
+        return path
+    try:
+        return store.object_path(store.add(path, url=url, title=title, doi=doi))
+    except Exception as e:
+        log.info(f"保存 PDF 到存储时出错：{path} -> {e}")
+        return path
+
+
+def cached_result(pdf_path):
+    """
+    读取同一内容的 PDF 之前的解析结果。
+    :param pdf_path: PDF 文件路径
+    :return: (内容哈希, 解析结果)，没有结果时解析结果为 None
+    """
+    store = get_store()
+    if store is None:
+        return None, None
+    try:
+        digest = store.digest_of(pdf_path)
+        result = store.get_result(digest)
+    except Exception as e:
+        log.info(f"读取 PDF 解析结果时出错：{e}")
+        return None, None
+    metrics.incr("cache_requests_total", cache="pdf_extract", result="hit" if result is not None else "miss")
+    return digest, result
+
+
+def store_result(digest, result):
+    """
+    按内容哈希保存解析结果。
+    :param digest: 内容哈希
+    :param result: gpt_handler 返回的结果
+    """
+    store = get_store()
+    if store is None or not digest or not result:
+        return
+    try:
+        store.put_result(digest, result)
+    except Exception as e:
+        log.info(f"保存 PDF 解析结果时出错：{e}")
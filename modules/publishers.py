@@ -0,0 +1,203 @@
+from dataclasses import dataclass
+from urllib.parse import urlparse
+import tldextract
+from modules.logger import setup_logger
+
+log = setup_logger("publishers")
+
+DOI_PREFIX = "https://doi.org/"
+
+# 只使用 tldextract 自带的后缀列表，不联网更新
+_extract = tldextract.TLDExtract(suffix_list_urls=())
+
+
+# ---- DOI 提取策略：每个函数返回 strategy(page) -> DOI 字符串或 None ----
+
+def doi_href(selector, prefix=DOI_PREFIX):
+    """
+    取第一个匹配元素的 href 作为 DOI。
+    """
+    def strategy(page):
+        elements = page.eles(selector)
+        href = elements[0].attr('href') if elements else None
+        return href.replace(prefix, "") if href else None
+    return strategy
+
+
+def doi_text(selector, prefix=DOI_PREFIX):
+    """
+    取第一个匹配元素的文本作为 DOI。
+    """
+    def strategy(page):
+        elements = page.eles(selector)
+        return elements[0].text.replace(prefix, "") if elements else None
+    return strategy
+
+
+def doi_filtered_text(selector, keyword, prefix=DOI_PREFIX):
+    """
+    在匹配的元素中取第一个文本包含 keyword 的元素作为 DOI。
+    """
+    def strategy(page):
+        elements = page.eles(selector)
+        element = elements.filter_one.text(keyword) if elements else None
+        return element.text.replace(prefix, "") if element else None
+    return strategy
+
+
+def doi_labelled_text(selector, separator=": ", prefix=DOI_PREFIX):
+    """
+    取 "doi: 10.xxx" 形式的文本中分隔符后面的部分作为 DOI。
+    """
+    def strategy(page):
+        element = page.ele(selector)
+        return element.text.split(separator)[1].replace(prefix, "") if element else None
+    return strategy
+
+
+def doi_link_scan(selector='@text():doi.org', marker='doi.org', prefix=DOI_PREFIX):
+    """
+    在匹配的元素中取第一个 href 含有 marker 的链接作为 DOI。
+    """
+    def strategy(page):
+        for element in page.eles(selector):
+            href = element.attr('href')
+            if isinstance(href, str) and marker in href:
+                return href.replace(prefix, "")
+        return None
+    return strategy
+
+
+@dataclass(frozen=True)
+class PublisherSpec:
+    """
+    出版商页面的提取规则。
+    :param name: 出版商名称，用于日志
+    :param hosts: 匹配的主机名或注册域名
+    :param abstract: 摘要元素的选择器，按顺序尝试，取第一个有文本的元素
+    :param doi: DOI 提取策略
+    :param browser: 'fallback' 会话页面失败时用浏览器重试，'always' 只用浏览器，'never' 不用浏览器
+    """
+    name: str
+    hosts: tuple
+    abstract: tuple
+    doi: object
+    browser: str = "fallback"
+
+
+PUBLISHERS = (
+    PublisherSpec(
+        "ScienceDirect", ("sciencedirect.com",),
+        tuple(f"@@class=u-margin-s-bottom@@id={pid}"
+              for pid in ("sp0010", "sp0040", "abspara0010", "sp0075", "sp0015", "sp0050")),
+        doi_href('@@class=anchor doi anchor-primary@@title=Persistent link using digital object identifier'),
+        browser="never",
+    ),
+    PublisherSpec(
+        "Frontiers", ("frontiersin.org",),
+        ("@class=mb0", "@class=JournalAbstract__AcceptedArticle"),
+        doi_labelled_text('text:doi'),
+        browser="never",
+    ),
+    PublisherSpec(
+        "Springer Nature", ("link.springer.com", "nature.com", "biomedcentral.com"),
+        ("@id=Abs1-content",),
+        doi_filtered_text('@class=c-bibliographic-information__value', 'doi'),
+    ),
+    PublisherSpec(
+        "Taylor & Francis", ("tandfonline.com",),
+        ("tag:p@class=last",),
+        doi_text('tag:li@class=dx-doi'),
+    ),
+    PublisherSpec(
+        "SAGE", ("sagepub.com",),
+        ("tag:div@role=paragraph",),
+        doi_href('tag:a@property=sameAs'),
+    ),
+    PublisherSpec(
+        "Hogrefe", ("hogrefe.com",),
+        ("tag:div@class=abstractSection abstractInFull",),
+        doi_href('tag:a@class=epub-section__doi__text'),
+    ),
+    PublisherSpec(
+        "Wiley", ("onlinelibrary.wiley.com", "el.wiley.com"),
+        ("tag:div@class=article-section__content en main",),
+        doi_href('tag:a@class=epub-doi'),
+    ),
+    PublisherSpec(
+        "Liebert", ("liebertpub.com",),
+        ("tag:section@id=abstract",),
+        doi_href('tag:a@property=sameAs'),
+    ),
+    PublisherSpec(
+        "APA PsycNet", ("psycnet.apa.org",),
+        ("xpath=/html/body/app/main/recorddisplay/div/div/div/div[3]/div[1]/abstract/div/div/p",
+         "tag:div@class=col-md-12 p-0"),
+        doi_link_scan(marker='/doi/', prefix="https://psycnet.apa.org/doi/"),
+        browser="always",
+    ),
+    PublisherSpec(
+        "MDPI", ("mdpi.com",),
+        ("tag:div@class=html-p",),
+        doi_link_scan(),
+    ),
+    PublisherSpec(
+        "Oxford Academic", ("academic.oup.com",),
+        ("tag:p@class=chapter-para",),
+        doi_link_scan(),
+    ),
+    PublisherSpec(
+        "JNeurosci", ("jneurosci.org",),
+        ("tag:p@id=p-5",),
+        doi_text('tag:span@class=highwire-cite-metadata-doi highwire-cite-metadata'),
+    ),
+    PublisherSpec(
+        "MIT Press", ("direct.mit.edu",),
+        ("tag:section@class=abstract",),
+        doi_link_scan(),
+    ),
+    PublisherSpec(
+        "PNAS", ("pnas.org",),
+        ("tag:div@id=abstracts",),
+        doi_href('tag:a@property=sameAs'),
+    ),
+    PublisherSpec(
+        "PubMed Central", ("pmc.ncbi.nlm.nih.gov",),
+        ("tag:section@@class=abstract@@id=abstract1",),
+        doi_href('tag:a@class=usa-link usa-link--external'),
+    ),
+)
+
+# 主机名 / 注册域名 → 规则
+REGISTRY = {host: spec for spec in PUBLISHERS for host in spec.hosts}
+
+
+def find_spec(url):
+    """
+    按主机名查找出版商规则：先精确匹配主机名（去掉 www.），再匹配注册域名。
+    :param url: 文章链接
+    :return: PublisherSpec，不支持的网站返回 None
+    """
+    host = (urlparse(url).hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    spec = REGISTRY.get(host)
+    if spec is None:
+        spec = REGISTRY.get(_extract(host).registered_domain)
+    return spec
+
+
+def extract(spec, page):
+    """
+    按规则从已加载的页面（SessionPage 或浏览器标签页）中提取摘要和 DOI。
+    :param spec: PublisherSpec
+    :param page: 已加载文章页面的页面对象
+    :return: (abstract, doi_text) 元组，未找到的项为 None
+    """
+    abstract = None
+    for selector in spec.abstract:
+        elements = page.eles(selector)
+        if elements and elements[0].text:
+            abstract = elements[0].text
+            break
+    return abstract, spec.doi(page)
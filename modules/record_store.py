@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from modules.logger import setup_logger
+from modules import metrics
+from modules.result_cache import normalize_url, normalize_doi
+from modules.paper_record import PaperRecord
+
+script_dir = os.path.dirname(os.path.abspath(__file__))  # 当前脚本所在目录
+project_root = os.path.abspath(os.path.join(script_dir, ".."))  # 项目根目录
+log = setup_logger("record_store")
+
+
+def _doi_of(details):
+    doi = details.get("DOI")
+    if not doi or str(doi) in ("Unknown", "None"):
+        return None
+    return normalize_doi(str(doi))
+
+
+def record_id(link, details):
+    """
+    生成论文记录的稳定 ID：有 DOI 时由 DOI 生成，否则由规范化后的链接生成。
+    同一篇论文在不同运行、不同来源中得到相同的 ID，标题相同的不同论文不会互相覆盖。
+    :param link: 文章链接
+    :param details: 链接详细信息字典
+    :return: 16 位十六进制 ID
+    """
+    doi = _doi_of(details)
+    key = f"doi:{doi}" if doi else f"url:{normalize_url(link)}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+class RecordStore:
+    """
+    基于 SQLite 的论文记录存储，按 ID、DOI、链接、运行和日期建立索引，
+    取代 output 文件夹中不断增长的 txt 文件。
+    """
+
+    def __init__(self, db_path):
+        """
+        :param db_path: SQLite 数据库文件路径
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "id TEXT NOT NULL UNIQUE, "
+            "link TEXT NOT NULL, "
+            "url TEXT, "
+            "doi TEXT, "
+            "title TEXT, "
+            "run_id TEXT NOT NULL, "
+            "day TEXT NOT NULL, "
+            "created_at REAL NOT NULL, "
+            "updated_at REAL NOT NULL, "
+            "details TEXT NOT NULL)"
+        )
+        # 旧版本的表没有 url 列，原始链接保存在 details 的 JSON 中
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(records)")}
+        if "url" not in columns:
+            self._conn.execute("ALTER TABLE records ADD COLUMN url TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_records_run ON records (run_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_records_day ON records (day)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_records_doi ON records (doi)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_records_link ON records (link)")
+        self._conn.commit()
+
+    def put(self, link, details, run_id):
+        """
+        写入一条记录。同一 ID 的记录已存在时更新内容，并计入本次运行。
+        链接单独存一列，详细信息用 PaperRecord.to_json 序列化。
+        :param link: 文章链接
+        :param details: PaperRecord 或使用原有键的链接详细信息字典
+        :param run_id: 运行 ID
+        :return: 记录 ID
+        """
+        record = details if isinstance(details, PaperRecord) else PaperRecord.from_dict(details)
+        rid = record_id(link, record)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO records (id, link, url, doi, title, run_id, day, created_at, updated_at, details) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET link = excluded.link, url = excluded.url, doi = excluded.doi, "
+                "title = excluded.title, run_id = excluded.run_id, day = excluded.day, "
+                "updated_at = excluded.updated_at, details = excluded.details",
+                (rid, normalize_url(link), link, _doi_of(record), record.title, run_id,
+                 date.today().isoformat(), now, now, record.to_json())
+            )
+            self._conn.commit()
+        return rid
+
+    def _query(self, where, params):
+        with self._lock:
+            rows = self._conn.execute(f"SELECT url, details FROM records WHERE {where} ORDER BY seq",
+                                      params).fetchall()
+        records = {}
+        for url, data in rows:
+            if url is None:
+                # 旧版本写入的记录：details 是带 Link 键的字典
+                url = json.loads(data)["Link"]
+            records[url] = PaperRecord.from_json(data)
+        return records
+
+    def get(self, rid):
+        return self._query("id = ?", (rid,))
+
+    def by_doi(self, doi):
+        return self._query("doi = ?", (normalize_doi(doi),))
+
+    def by_link(self, link):
+        return self._query("link = ?", (normalize_url(link),))
+
+    def for_run(self, run_id):
+        return self._query("run_id = ?", (run_id,))
+
+    def since_run(self, run_id):
+        # 运行 ID 是时间戳（YYYYmmdd-HHMMSS），可以直接按字符串比较
+        return self._query("run_id >= ?", (run_id,))
+
+    def on_day(self, day):
+        return self._query("day = ?", (day.isoformat() if isinstance(day, (date, datetime)) else day,))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """
+    获取全局记录存储，首次调用时创建。
+    :return: RecordStore 实例，创建失败时返回 None
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = RecordStore(os.getenv("PAPERBOT_RECORD_STORE",
+                                               os.path.join(project_root, "cache", "records.sqlite3")))
+            except Exception as e:
+                log.info(f"初始化记录存储时出错：{e}")
+                return None
+        return _store
+
+
+def save(link_types, run_id=None):
+    """
+    保存一批论文记录，默认计入当前运行。
+    :param link_types: {链接: 链接详细信息字典}
+    :param run_id: 运行 ID，默认使用本次运行的指标 run_id
+    :return: 记录 ID 列表
+    """
+    store = get_store()
+    if store is None:
+        return []
+    run_id = run_id or metrics.get_registry().run_id
+    ids = []
+    for link, details in link_types.items():
+        try:
+            ids.append(store.put(link, details, run_id))
+        except Exception as e:
+            log.info(f"保存论文记录时出错：{link} -> {e}")
+    return ids
+
+
+def _read(method, *args):
+    store = get_store()
+    if store is None:
+        return None
+    try:
+        return getattr(store, method)(*args)
+    except Exception as e:
+        log.info(f"读取论文记录时出错：{e}")
+        return None
+
+
+def records_for_run(run_id):
+    """
+    查询某次运行写入或更新的记录。
+    :return: {链接: PaperRecord}，存储不可用时返回 None
+    """
+    return _read("for_run", run_id)
+
+
+def records_since(run_id):
+    """
+    查询某次运行及之后写入或更新的记录。
+    :return: {链接: PaperRecord}，存储不可用时返回 None
+    """
+    return _read("since_run", run_id)
+
+
+def records_on(day):
+    """
+    查询某一天写入或更新的记录。
+    :param day: date 对象或 YYYY-MM-DD 字符串
+    :return: {链接: PaperRecord}，存储不可用时返回 None
+    """
+    return _read("on_day", day)
+
+
+def record_by_doi(doi):
+    """
+    按 DOI 查询记录。
+    :return: {链接: PaperRecord}，存储不可用时返回 None
+    """
+    return _read("by_doi", doi)
@@ -0,0 +1,210 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+from modules.logger import setup_logger
+from modules import metrics
+
+script_dir = os.path.dirname(os.path.abspath(__file__))  # 当前脚本所在目录
+project_root = os.path.abspath(os.path.join(script_dir, ".."))  # 项目根目录
+log = setup_logger("result_cache")
+
+# 缓存条目的有效期（天）和最大条目数，可通过 .env 覆盖
+DEFAULT_TTL_DAYS = 90
+DEFAULT_MAX_ENTRIES = 20000
+
+# 规范化链接时去掉的跟踪参数
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid")
+
+
+def normalize_url(url):
+    """
+    规范化链接，使同一篇文章的不同写法得到相同的缓存键。
+    :param url: 原始链接
+    :return: 规范化后的链接
+    """
+    parsed = urlparse(url.strip())
+    netloc = parsed.netloc.lower()
+    path = parsed.path.replace('/pdf/', '/full/', 1).rstrip('/') or '/'
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAMS)
+    ))
+    return urlunparse(("https", netloc, path, "", query, ""))
+
+
+def normalize_doi(doi):
+    """
+    规范化 DOI，去掉 doi.org 前缀并统一为小写。
+    :param doi: DOI 字符串或 doi.org 链接
+    :return: 规范化后的 DOI
+    """
+    doi = doi.strip()
+    doi = re.sub(r'^(https?://(dx\.)?doi\.org/|doi:\s*)', '', doi, flags=re.IGNORECASE)
+    return doi.lower()
+
+
+class ResultCache:
+    """
+    基于 SQLite 的参考文献结果缓存，同时以规范化链接和 DOI 作为键。
+    """
+
+    def __init__(self, db_path, ttl_days=DEFAULT_TTL_DAYS, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        :param db_path: SQLite 数据库文件路径
+        :param ttl_days: 缓存有效期（天）
+        :param max_entries: 最多保留的条目数，超出后淘汰最久未访问的条目
+        """
+        self.db_path = db_path
+        self.ttl = ttl_days * 24 * 3600
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, "
+            "reference TEXT NOT NULL, "
+            "created_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results (accessed_at)")
+        self._conn.commit()
+        self.evict()
+
+    def _keys(self, url=None, doi=None):
+        keys = []
+        if url:
+            keys.append("url:" + normalize_url(url))
+        if doi:
+            keys.append("doi:" + normalize_doi(doi))
+        return keys
+
+    def get(self, url=None, doi=None):
+        """
+        按链接或 DOI 查询缓存。
+        :param url: 文章链接
+        :param doi: 文档的 DOI
+        :return: 缓存的参考文献字典，未命中时返回 None
+        """
+        now = time.time()
+        with self._lock:
+            for key in self._keys(url, doi):
+                row = self._conn.execute(
+                    "SELECT reference, created_at FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    continue
+                if now - row[1] > self.ttl:
+                    self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                    self._conn.commit()
+                    continue
+                self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                return json.loads(row[0])
+        return None
+
+    def put(self, reference, url=None):
+        """
+        写入缓存，同时登记链接键和参考文献中的 DOI 键。
+        :param reference: getabstract / stork_url 返回的参考文献字典
+        :param url: 文章链接
+        """
+        doi = reference.get("doi")
+        if not doi or doi == "Unknown":
+            doi = None
+        keys = self._keys(url, doi)
+        if not keys:
+            return
+        now = time.time()
+        data = json.dumps(reference, ensure_ascii=False)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO results (key, reference, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                [(key, data, now, now) for key in keys]
+            )
+            self._conn.commit()
+
+    def evict(self):
+        """
+        淘汰过期条目，并在超出容量时删除最久未访问的条目。
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM results WHERE created_at < ?", (time.time() - self.ttl,))
+            count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM results WHERE key IN "
+                    "(SELECT key FROM results ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    获取全局缓存实例，首次调用时创建。
+    :return: ResultCache 实例，创建失败时返回 None
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                db_path = os.getenv("PAPERBOT_CACHE_PATH", os.path.join(project_root, "cache", "results.sqlite3"))
+                _cache = ResultCache(
+                    db_path,
+                    ttl_days=int(os.getenv("PAPERBOT_CACHE_TTL_DAYS", DEFAULT_TTL_DAYS)),
+                    max_entries=int(os.getenv("PAPERBOT_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+                )
+            except Exception as e:
+                log.info(f"初始化结果缓存时出错：{e}")
+                return None
+        return _cache
+
+
+def lookup(url=None, doi=None):
+    """
+    查询缓存的参考文献，缓存不可用时返回 None。
+    :param url: 文章链接
+    :param doi: 文档的 DOI
+    :return: 参考文献字典或 None
+    """
+    cache = get_cache()
+    if cache is None:
+        return None
+    try:
+        reference = cache.get(url=url, doi=doi)
+    except Exception as e:
+        log.info(f"读取结果缓存时出错：{e}")
+        return None
+    metrics.incr("cache_requests_total", cache="results", key="doi" if doi else "url",
+                 result="hit" if reference else "miss")
+    return reference
+
+
+def store(reference, url=None):
+    """
+    缓存参考文献字典。只缓存摘要、翻译和 APA 引用都齐全的完整结果，
+    翻译失败或没查到引用的结果下次仍会重试。
+    :param reference: 参考文献字典
+    :param url: 文章链接
+    """
+    if not isinstance(reference, dict) or not reference.get("abstract"):
+        return
+    if not reference.get("translation") or reference.get("apa_citation", "Unknown") == "Unknown":
+        return
+    cache = get_cache()
+    if cache is None:
+        return
+    try:
+        cache.put(reference, url=url)
+    except Exception as e:
+        log.info(f"写入结果缓存时出错：{e}")
@@ -0,0 +1,273 @@
+import itertools
+import json
+import os
+import threading
+import time
+from modules.logger import setup_logger
+from modules import metrics
+
+script_dir = os.path.dirname(os.path.abspath(__file__))  # 当前脚本所在目录
+project_root = os.path.abspath(os.path.join(script_dir, ".."))  # 项目根目录
+log = setup_logger("telegram_queue")
+
+# Telegram 单条消息的字符上限
+MESSAGE_LIMIT = 4096
+# 同一会话每秒最多发送的消息数和允许的突发条数，Telegram 建议同一会话每秒不超过一条
+DEFAULT_RATE = 1.0
+DEFAULT_BURST = 3
+# 收到第一条消息后等待更多消息一起打包的时间（秒）
+DEFAULT_MAX_WAIT = 0.5
+PACK_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16)
+
+
+class TokenBucket:
+    """
+    令牌桶：按固定速率补充令牌，发送前取一个令牌，没有令牌时等待。
+    """
+
+    def __init__(self, rate, capacity):
+        """
+        :param rate: 每秒补充的令牌数
+        :param capacity: 桶的容量，即允许的突发条数
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """
+        取一个令牌，必要时阻塞等待。
+        """
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        服务器要求等待时清空令牌，seconds 秒内不再发送。
+        :param seconds: 等待时间（秒）
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket_for(chat_id):
+    """
+    获取某个会话的令牌桶，同一会话的所有发送共用一个。
+    :param chat_id: Telegram Chat ID
+    :return: TokenBucket 实例
+    """
+    with _buckets_lock:
+        bucket = _buckets.get(str(chat_id))
+        if bucket is None:
+            rate = float(os.getenv("PAPERBOT_TELEGRAM_RATE", DEFAULT_RATE))
+            burst = float(os.getenv("PAPERBOT_TELEGRAM_BURST", DEFAULT_BURST))
+            bucket = _buckets[str(chat_id)] = TokenBucket(rate, burst)
+        return bucket
+
+
+def split_message(text, limit=MESSAGE_LIMIT):
+    """
+    把超过上限的文本按行拆成多段，单行超过上限时直接截断成几段。
+    :param text: 文本
+    :param limit: 每段的字符上限
+    :return: 文本段列表
+    """
+    if len(text) <= limit:
+        return [text]
+    parts, current = [], ""
+    for line in text.splitlines(keepends=True):
+        while len(line) > limit:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(line[:limit])
+            line = line[limit:]
+        if len(current) + len(line) > limit:
+            parts.append(current)
+            current = ""
+        current += line
+    if current:
+        parts.append(current)
+    return parts
+
+
+def pack_messages(texts, limit=MESSAGE_LIMIT):
+    """
+    从队首开始把几条短消息拼成一条，总长度不超过上限。
+    :param texts: 待发送的文本列表
+    :return: (拼接后的文本, 用掉的条数)
+    """
+    packed, count = "", 0
+    for text in texts:
+        chunk = text.rstrip("\n") + "\n\n"
+        if count and len(packed) + len(chunk.rstrip("\n")) > limit:
+            break
+        packed += chunk
+        count += 1
+    return packed.rstrip("\n"), count
+
+
+class DeliveryQueue:
+    """
+    Telegram 发送队列：后台线程把待发送的消息打包发送，未送达的消息保存在 JSON 文件中，
+    下次运行时继续发送。
+    """
+
+    def __init__(self, send, path, max_wait=DEFAULT_MAX_WAIT, limit=MESSAGE_LIMIT):
+        """
+        :param send: 发送函数 send(chat_id, text)，送达返回 True，无法送达返回 False，
+                     重试用尽仍失败时返回 None
+        :param path: 保存未送达消息的 JSON 文件路径
+        :param max_wait: 等待更多消息一起打包的时间（秒）
+        :param limit: 单条消息的字符上限
+        """
+        self.send = send
+        self.path = path
+        self.max_wait = max_wait
+        self.limit = limit
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._pending = []
+        # 待发送列表每变化一次 _version 加一，落盘时只写比上次更新的内容
+        self._save_lock = threading.Lock()
+        self._version = 0
+        self._saved_version = 0
+        self._thread = None
+        self._stalled = False
+        self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as file:
+                    entries = json.load(file)
+                for entry in entries:
+                    self._pending.append({"id": next(self._ids), "chat_id": entry["chat_id"], "text": entry["text"]})
+                if self._pending:
+                    log.info(f"读取到 {len(self._pending)} 条上次未送达的消息")
+                    self._start()
+        except Exception as e:
+            log.info(f"读取待发送消息时出错：{e}")
+
+    def _save(self):
+        """
+        把待发送消息写入文件。在锁内取快照，在锁外写文件，不阻塞 put 和发送线程。
+        """
+        with self._save_lock:
+            with self._cond:
+                version = self._version
+                if version == self._saved_version:
+                    return
+                entries = [{"chat_id": e["chat_id"], "text": e["text"]} for e in self._pending]
+            # 先写临时文件再替换，中途崩溃不会留下损坏的文件
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as file:
+                    json.dump(entries, file, ensure_ascii=False, separators=(",", ":"))
+                os.replace(tmp_path, self.path)
+                self._saved_version = version
+            except Exception as e:
+                log.info(f"保存待发送消息时出错：{e}")
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stalled = False
+            self._thread = threading.Thread(target=self._run, name="telegram", daemon=True)
+            self._thread.start()
+
+    def put(self, chat_id, text):
+        """
+        加入一条消息，立即返回。超过上限的消息会拆成几条。
+        消息由发送线程在每次取出一批时统一落盘，flush 时也会保存一次。
+        :param chat_id: Telegram Chat ID
+        :param text: 消息内容
+        """
+        with self._cond:
+            for part in split_message(text, self.limit):
+                self._pending.append({"id": next(self._ids), "chat_id": chat_id, "text": part})
+            self._version += 1
+            self._start()
+            self._cond.notify_all()
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            # 等一小段时间，让同时到达的论文拼到同一条消息里
+            deadline = time.monotonic() + self.max_wait
+            while sum(len(e["text"]) for e in self._pending) < self.limit:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            chat_id = self._pending[0]["chat_id"]
+            same_chat = [e for e in self._pending if e["chat_id"] == chat_id]
+            text, count = pack_messages([e["text"] for e in same_chat], self.limit)
+            return chat_id, text, same_chat[:count]
+
+    def _run(self):
+        while True:
+            chat_id, text, batch = self._next_batch()
+            # 打包等待期间加入的消息一起落盘，不必每加入一条就重写整个文件
+            self._save()
+            metrics.observe("telegram_packed_records", len(batch), buckets=PACK_BUCKETS)
+            try:
+                delivered = self.send(chat_id, text)
+            except Exception as e:
+                log.info(f"发送消息时出错：{e}")
+                delivered = None
+            with self._cond:
+                if delivered is None:
+                    # 重试用尽，留在文件中下次运行再发送
+                    log.info(f"消息暂时无法送达，{len(self._pending)} 条消息留到下次发送")
+                    self._stalled = True
+                    self._cond.notify_all()
+                else:
+                    if delivered is False:
+                        metrics.incr("telegram_dropped_total", value=len(batch))
+                    sent = {e["id"] for e in batch}
+                    self._pending = [e for e in self._pending if e["id"] not in sent]
+                    self._version += 1
+                    self._cond.notify_all()
+            self._save()
+            if delivered is None:
+                return
+
+    def flush(self, timeout=None):
+        """
+        等待队列中的消息全部发送。
+        :param timeout: 最长等待时间（秒），None 表示一直等待
+        :return: 队列已清空时返回 True
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending and not self._stalled:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            empty = not self._pending
+        self._save()
+        return empty
+
+    def __len__(self):
+        with self._cond:
+            return len(self._pending)
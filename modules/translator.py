@@ -0,0 +1,372 @@
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dotenv import load_dotenv
+from openai import OpenAI, AsyncOpenAI
+from modules.logger import setup_logger
+from modules import metrics
+
+script_dir = os.path.dirname(os.path.abspath(__file__))  # 当前脚本所在目录
+project_root = os.path.abspath(os.path.join(script_dir, ".."))  # 项目根目录
+log = setup_logger("translator")
+
+try:
+    load_dotenv()
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    client = OpenAI(api_key=openai_api_key)
+except Exception as e:
+    log.info(f"初始化 OpenAI API 时出错：{e}")
+
+DEFAULT_MODEL = "gpt-4o-mini"
+# 每个批量请求最多包含的摘要数，以及凑批时最长等待时间（秒）
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_MAX_WAIT = 0.5
+# 同时进行的批量请求数
+DEFAULT_MAX_REQUESTS = 4
+# 批大小直方图的桶上限
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+SYSTEM_PROMPT = (
+    "You are a professional translator specializing in academic research articles, "
+    "particularly in the fields of psychology and neuroscience. Your task is to produce "
+    "high-quality, accurate, and elegant Chinese translations of English abstracts. "
+    "Ensure the translation retains the original meaning while using professional and precise terminology."
+)
+
+REQUIREMENTS = (
+    "Requirements:\n"
+    "1. Maintain high accuracy and fidelity to the original meaning.\n"
+    "2. Use professional terminology commonly used in psychology and neuroscience.\n"
+    "3. Ensure the translation reads naturally and elegantly in Chinese."
+)
+
+
+def text_hash(text, model=DEFAULT_MODEL):
+    """
+    计算摘要内容的哈希值，空白差异不影响结果。
+    :param text: 英文摘要
+    :param model: 使用的 GPT 模型
+    :return: 十六进制哈希字符串
+    """
+    normalized = " ".join(text.split())
+    return hashlib.sha256(f"{model}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+class TranslationMemo:
+    """
+    摘要哈希 → 中文翻译 的持久化记忆表。
+    """
+
+    def __init__(self, db_path):
+        """
+        :param db_path: SQLite 数据库文件路径
+        """
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "hash TEXT PRIMARY KEY, "
+            "translation TEXT NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT translation FROM translations WHERE hash = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key, translation):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (hash, translation, created_at) VALUES (?, ?, ?)",
+                (key, translation, time.time())
+            )
+            self._conn.commit()
+
+
+def _single_messages(text):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": f"Translate the following academic abstract to Chinese:\n\n{text}\n\n{REQUIREMENTS}"
+        }
+    ]
+
+
+@metrics.timed("translate", mode="single")
+def translate_single(text, model=DEFAULT_MODEL):
+    """
+    单条请求翻译一篇摘要。
+    :param text: 需要翻译的英文摘要
+    :param model: 使用的 GPT 模型
+    :return: 中文翻译文本，出错时返回 None
+    """
+    try:
+        response = client.chat.completions.create(model=model, messages=_single_messages(text))
+        metrics.record_usage("translate", model, getattr(response, "usage", None))
+        # 提取翻译结果
+        return response.choices[0].message.content.strip()
+    except Exception as e:
+        log.info(f"调用 GPT API 进行翻译时出错：{e}")
+        return None
+
+
+@metrics.timed("translate", mode="batch")
+def translate_batch(texts, model=DEFAULT_MODEL):
+    """
+    将多篇摘要打包进一次结构化输出请求。
+    :param texts: 英文摘要列表
+    :param model: 使用的 GPT 模型
+    :return: 与 texts 顺序一致的翻译列表，缺失的条目为 None
+    """
+    items = [{"id": i, "abstract": text} for i, text in enumerate(texts)]
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {
+                    "role": "user",
+                    "content": (
+                        "Translate each of the following academic abstracts to Chinese. "
+                        "Return one translation per abstract, using the same id.\n\n"
+                        f"{json.dumps(items, ensure_ascii=False)}\n\n{REQUIREMENTS}"
+                    )
+                }
+            ],
+            response_format={
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "batch_translation",
+                    "strict": True,
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            "translations": {
+                                "type": "array",
+                                "items": {
+                                    "type": "object",
+                                    "properties": {
+                                        "id": {"type": "integer"},
+                                        "translation": {"type": "string"}
+                                    },
+                                    "required": ["id", "translation"],
+                                    "additionalProperties": False
+                                }
+                            }
+                        },
+                        "required": ["translations"],
+                        "additionalProperties": False
+                    }
+                }
+            }
+        )
+        metrics.record_usage("translate", model, getattr(response, "usage", None))
+        data = json.loads(response.choices[0].message.content)
+        results = [None] * len(texts)
+        for entry in data.get("translations", []):
+            index = entry.get("id")
+            if isinstance(index, int) and 0 <= index < len(texts) and entry.get("translation"):
+                results[index] = entry["translation"].strip()
+        return results
+    except Exception as e:
+        log.info(f"批量翻译时出错：{e}")
+        return [None] * len(texts)
+
+
+class Translator:
+    """
+    翻译层：相同摘要只翻译一次，并发提交的摘要自动合并成批量请求。
+    """
+
+    def __init__(self, memo=None, model=DEFAULT_MODEL, batch_size=DEFAULT_BATCH_SIZE,
+                 max_wait=DEFAULT_MAX_WAIT, max_requests=DEFAULT_MAX_REQUESTS):
+        """
+        :param memo: TranslationMemo 实例，为 None 时只在内存中去重
+        :param model: 使用的 GPT 模型
+        :param batch_size: 每个批量请求最多包含的摘要数，1 表示不合并
+        :param max_wait: 凑批时最长等待时间（秒）
+        :param max_requests: 同时进行的请求数
+        """
+        self.memo = memo
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_requests))
+        self._thread = None
+
+    def submit(self, text):
+        """
+        提交一篇摘要，立即返回 Future，调用方可在翻译进行时继续其他工作。
+        :param text: 英文摘要
+        :return: 结果为中文翻译（出错时为 None）的 Future
+        """
+        key = text_hash(text, self.model)
+        if self.memo is not None:
+            cached = self.memo.get(key)
+            metrics.incr("cache_requests_total", cache="translations", result="hit" if cached else "miss")
+            if cached:
+                future = Future()
+                future.set_result(cached)
+                return future
+
+        with self._lock:
+            # 同一摘要正在翻译时直接复用
+            if key in self._inflight:
+                return self._inflight[key]
+            future = Future()
+            self._inflight[key] = future
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._collect, name="translator", daemon=True)
+                self._thread.start()
+
+        self._queue.put((key, text, future))
+        return future
+
+    def translate(self, text):
+        """
+        同步翻译一篇摘要。
+        :param text: 英文摘要
+        :return: 中文翻译文本，出错时返回 None
+        """
+        return self.submit(text).result()
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._executor.submit(self._flush, batch)
+
+    def _flush(self, batch):
+        try:
+            texts = [text for _, text, _ in batch]
+            if len(batch) == 1:
+                results = [translate_single(texts[0], self.model)]
+            else:
+                log.info(f"批量翻译 {len(batch)} 篇摘要")
+                metrics.observe("translate_batch_size", len(batch), buckets=BATCH_BUCKETS)
+                results = translate_batch(texts, self.model)
+
+            for (key, text, future), translation in zip(batch, results):
+                # 批量结果缺失的条目单独补翻
+                if translation is None and len(batch) > 1:
+                    metrics.incr("fallback_total", stage="translate", reason="missing_from_batch")
+                    translation = translate_single(text, self.model)
+                if translation and self.memo is not None:
+                    try:
+                        self.memo.put(key, translation)
+                    except Exception as e:
+                        log.info(f"保存翻译记忆时出错：{e}")
+                self._resolve(key, future, translation)
+        except Exception as e:
+            log.info(f"处理翻译批次时出错：{e}")
+        finally:
+            # 保证每个 Future 都有结果，调用方不会一直等待
+            for key, _, future in batch:
+                if not future.done():
+                    self._resolve(key, future, None)
+
+    def _resolve(self, key, future, translation):
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(translation)
+
+
+_translator = None
+_translator_lock = threading.Lock()
+
+
+def get_translator():
+    """
+    获取全局翻译器实例，首次调用时创建。
+    :return: Translator 实例
+    """
+    global _translator
+    with _translator_lock:
+        if _translator is None:
+            memo = None
+            try:
+                db_path = os.getenv("PAPERBOT_TRANSLATION_MEMO", os.path.join(project_root, "cache", "translations.sqlite3"))
+                memo = TranslationMemo(db_path)
+            except Exception as e:
+                log.info(f"初始化翻译记忆时出错：{e}")
+            _translator = Translator(
+                memo=memo,
+                batch_size=int(os.getenv("PAPERBOT_TRANSLATE_BATCH", DEFAULT_BATCH_SIZE)),
+                max_wait=float(os.getenv("PAPERBOT_TRANSLATE_WAIT", DEFAULT_MAX_WAIT)),
+            )
+        return _translator
+
+
+def submit(text):
+    """
+    提交一篇摘要进行翻译。
+    :param text: 英文摘要
+    :return: 结果为中文翻译的 Future
+    """
+    return get_translator().submit(text)
+
+
+_async_client = None
+
+
+def async_client():
+    """
+    获取异步 OpenAI 客户端，首次调用时创建。
+    :return: AsyncOpenAI 实例
+    """
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _async_client
+
+
+async def translate_async(text, model=DEFAULT_MODEL):
+    """
+    异步翻译一篇摘要，与同步翻译共用翻译记忆。
+    :param text: 英文摘要
+    :param model: 使用的 GPT 模型
+    :return: 中文翻译文本，出错时返回 None
+    """
+    memo = get_translator().memo
+    key = text_hash(text, model)
+    if memo is not None:
+        cached = memo.get(key)
+        metrics.incr("cache_requests_total", cache="translations", result="hit" if cached else "miss")
+        if cached:
+            return cached
+
+    try:
+        with metrics.timer("translate", mode="async"):
+            response = await async_client().chat.completions.create(model=model, messages=_single_messages(text))
+        metrics.record_usage("translate", model, getattr(response, "usage", None))
+        translation = response.choices[0].message.content.strip()
+    except Exception as e:
+        log.info(f"调用 GPT API 进行翻译时出错：{e}")
+        return None
+
+    if translation and memo is not None:
+        try:
+            memo.put(key, translation)
+        except Exception as e:
+            log.info(f"保存翻译记忆时出错：{e}")
+    return translation
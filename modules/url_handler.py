@@ -1,741 +1,400 @@
-from DrissionPage import Chromium
 from DrissionPage import SessionPage
-import requests
+import asyncio
+import threading
 from dotenv import load_dotenv
-from openai import OpenAI
 import os
 from modules.logger import setup_logger
+from modules import result_cache
+from modules import translator
+from modules import browser_pool
+from modules import publishers
+from modules import crossref
+from modules import metrics
 import traceback
 
 log = setup_logger("url_handler")
 
-try:
-    load_dotenv()
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    client = OpenAI(api_key=openai_api_key)
-except Exception as e:
-    log.info(f"初始化 OpenAI API 时出错：{e}")
+load_dotenv()
 
-def getabstract(url):
-
-    reference = None
-    doi_text = None
-    page = SessionPage()
-
-    try:
-        page.get(url,retry=1, interval=1, timeout=3)
-        if "www.sciencedirect.com" in url:
-            try:
-                # 提取摘要
-                abstract_elements = page.eles("@@class=u-margin-s-bottom@@id=sp0010") or \
-                    page.eles("@@class=u-margin-s-bottom@@id=sp0040") or \
-                    page.eles("@@class=u-margin-s-bottom@@id=abspara0010") or \
-                    page.eles("@@class=u-margin-s-bottom@@id=sp0075") or \
-                    page.eles("@@class=u-margin-s-bottom@@id=sp0015") or \
-                    page.eles("@@class=u-margin-s-bottom@@id=sp0050")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                # 调用 GPT 翻译摘要
-                if abstract:
-                    translation = gpt_translate(abstract)
-                else:
-                    log.info("未找到摘要")
-                    with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                        error_file.write(f"{url}\n")
-                    translation = None
-
-                # 提取 DOI 链接
-                # 提取 class="anchor doi anchor-primary" 的 href 属性
-                doi_element = page.eles('@@class=anchor doi anchor-primary@@title=Persistent link using digital object identifier')
-                if doi_element:
-                    doi_link = doi_element[0].attr('href')  # 获取 href 属性
-                    doi_link = doi_link.replace("https://doi.org/","")
-                    reference = get_apa_citation(doi_link)
-
-                    # 添加摘要原文和翻译到字典中
-                    reference["abstract"] = abstract
-                    reference["translation"] = translation
-                else:
-                    log.info("DOI 链接未找到")
-                    with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                        error_file.write(f"{url}\n")
+def browser_tab(url):
+    """
+    从浏览器池取得已加载页面的标签页，用于 SessionPage 抓取失败时的回退。
+    :param url: 页面链接
+    :return: 标签页上下文管理器
+    """
+    return browser_pool.get_pool().tab(url)
 
-                return reference
+_local = threading.local()
 
-            except Exception as e:
-                log.info(f"Error: {e}")
-                return None
+def _session_page():
+    """
+    获取当前线程复用的 SessionPage，同一线程内的请求共享长连接。
+    :return: SessionPage 实例
+    """
+    page = getattr(_local, "page", None)
+    if page is None:
+        page = SessionPage()
+        _local.page = page
+    return page
 
-        elif "www.frontiersin.org" in url:
-            # 提取摘要
-            abstract_elements = page.eles("@class=mb0")
-            if not abstract_elements:
-                abstract_elements = page.eles("@class=JournalAbstract__AcceptedArticle")
-            abstract = abstract_elements[0].text if abstract_elements else None
-            log.info(abstract)
-            # 调用 GPT 翻译摘要
-            if abstract:
-                translation = gpt_translate(abstract)
-            else:
-                log.info("未找到摘要")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-                translation = None
+def getabstract(url):
+    with metrics.timer("getabstract", domain=metrics.domain_of(url)):
+        return _getabstract(url)
 
-            # 提取 DOI 链接
-            doi_element = page.ele('text:doi')
-            doi_text = doi_element.text.split(": ")[1] if doi_element else None
-            doi_text = doi_text.replace("https://doi.org/","")
-            if doi_text:
-                reference = get_apa_citation(doi_text)
-
-                reference["abstract"] = abstract
-                reference["translation"] = translation
-            else:
-                log.info("DOI 链接未找到")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-
-        elif 'link.springer.com' in url or 'www.nature.com' in url or 'bmcpsychiatry.biomedcentral.com' in url:
-            try:
-                abstract_elements = page.eles("@id=Abs1-content")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                doi_element = page.eles('@class=c-bibliographic-information__value')
-                doi_text = doi_element.filter_one.text('doi') if doi_element else None
-                doi_text = doi_text.text.replace("https://doi.org/","")
-            except Exception as e:
-                browser = Chromium()
-                tab = browser.latest_tab
-                tab.get(url)
-                abstract_elements = tab.eles("@id=Abs1-content")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                # 提取 DOI 链接
-                doi_element = tab.eles('@class=c-bibliographic-information__value')
-                doi_text = doi_element.filter_one.text('doi') if doi_element else None
-                doi_text = doi_text.text.replace("https://doi.org/","")
-                browser.quit(timeout=3)
-
-            if abstract:
-                translation = gpt_translate(abstract)
-            else:
-                log.info("未找到摘要")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-                translation = None
+def _getabstract(url):
 
-            if doi_text:
-                reference = get_apa_citation(doi_text)
+    cached = result_cache.lookup(url=url)
+    if cached:
+        log.info(f"命中缓存：{url}")
+        return cached
 
-                reference["abstract"] = abstract
-                reference["translation"] = translation
-            else:
-                log.info("DOI 链接未找到")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-
-        elif 'www.tandfonline.com' in url:
-            try:
-                abstract_elements = page.eles("tag:p@class=last")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                doi_element = page.eles('tag:li@class=dx-doi')
-                doi_text = doi_element[0].text.replace("https://doi.org/", "") if doi_element else None
-            except Exception as e:
-                browser = Chromium()
-                tab = browser.latest_tab
-                tab.get(url)
-                abstract_elements = tab.eles("tag:p@class=last")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                # 提取 DOI 链接
-                doi_element = tab.eles('tag:li@class=dx-doi')
-                doi_text = doi_element[0].text.replace("https://doi.org/", "") if doi_element else None
-                browser.quit(timeout=3)
-
-            if abstract:
-                translation = gpt_translate(abstract)
-            else:
-                log.info("未找到摘要")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-                translation = None
+    try:
+        # Crossref 已有摘要时不必打开页面
+        reference = resolve_by_doi(url)
+        if reference is None:
+            scraped = scrape_abstract(url)
+            if scraped is None:
+                return None
+            abstract, doi_text = scraped
+            reference = _build_reference(url, abstract, doi_text)
 
-            if doi_text:
-                reference = get_apa_citation(doi_text)
+        if reference:
+            result_cache.store(reference, url=url)
+            return reference
+    
+    except Exception as e:
+        log.info(e.__traceback__)
+        with open("error_links.txt", "a", encoding="utf-8") as error_file:
+            error_file.write(f"{url}\n")
+        log.info(f"Error: {e}")
 
-                reference["abstract"] = abstract
-                reference["translation"] = translation
-            else:
-                log.info("DOI 链接未找到")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-
-        elif 'journals.sagepub.com' in url:
-            try:
-                abstract_elements = page.eles("tag:div@role=paragraph")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                doi_element = page.eles('tag:a@property=sameAs')
-                doi_text = doi_element[0].attr('href') if doi_element else None
-                doi_text = doi_text.replace("https://doi.org/", "")
-            except Exception as e:
-                browser = Chromium()
-                tab = browser.latest_tab
-                tab.get(url)
-                abstract_elements = tab.eles("tag:div@role=paragraph")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                # 提取 DOI 链接
-                doi_element = tab.eles('tag:a@property=sameAs')
-                doi_text = doi_element[0].attr('href') if doi_element else None
-                doi_text = doi_text.replace("https://doi.org/","")
-                browser.quit(timeout=3)
-
-            if abstract:
-                translation = gpt_translate(abstract)
-            else:
-                log.info("未找到摘要")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-                translation = None
+def _doi_first_enabled():
+    return os.getenv("PAPERBOT_DOI_FIRST", "1") != "0"
 
-            if doi_text:
-                reference = get_apa_citation(doi_text)
+def resolve_by_doi(url):
+    """
+    从链接中解析 DOI，并直接用 Crossref 元数据中的摘要生成参考文献。
+    :param url: 文章链接
+    :return: 参考文献字典；链接中没有 DOI 或 Crossref 没有摘要时返回 None，由调用方改为抓取页面
+    """
+    if not _doi_first_enabled():
+        return None
+    doi_text = crossref.doi_from_url(url)
+    if not doi_text:
+        metrics.incr("doi_first_total", result="no_doi")
+        return None
 
-                reference["abstract"] = abstract
-                reference["translation"] = translation
-            else:
-                log.info("DOI 链接未找到")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-
-        elif 'econtent.hogrefe.com' in url:
-            try:
-                abstract_elements = page.eles("tag:div@class=abstractSection abstractInFull")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                doi_element = page.eles('tag:a@class=epub-section__doi__text')
-                doi_text = doi_element[0].attr('href') if doi_element else None
-                doi_text = doi_text.replace("https://doi.org/", "") if doi_text else None
-            except Exception as e:
-                browser = Chromium()
-                tab = browser.latest_tab
-                tab.get(url)
-                abstract_elements = tab.eles("tag:div@class=abstractSection abstractInFull")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                # 提取 DOI 链接
-                doi_element = tab.eles('tag:a@class=epub-section__doi__text')
-                doi_text = doi_element[0].attr('href') if doi_element else None
-                doi_text = doi_text.replace("https://doi.org/","")
-                browser.quit(timeout=3)
-
-            if abstract:
-                translation = gpt_translate(abstract)
-            else:
-                log.info("未找到摘要")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-                translation = None
+    cached = result_cache.lookup(doi=doi_text)
+    if cached:
+        log.info(f"命中缓存（DOI）：{doi_text}")
+        return cached
 
-            if doi_text:
-                reference = get_apa_citation(doi_text)
+    work = crossref.fetch_work(doi_text)
+    abstract = crossref.work_abstract(work)
+    if not abstract:
+        log.info(f"Crossref 没有摘要，改为抓取页面：{url}")
+        metrics.incr("doi_first_total", result="no_abstract")
+        return None
+    metrics.incr("doi_first_total", result="hit")
 
-                reference["abstract"] = abstract
-                reference["translation"] = translation
-            else:
-                log.info("DOI 链接未找到")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-
-        elif 'onlinelibrary.wiley.com' in url or "el.wiley.com" in url:
-            try:
-                abstract_elements = page.eles("tag:div@class=article-section__content en main")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                doi_element = page.eles('tag:a@class=epub-doi')
-                doi_text = doi_element[0].attr('href') if doi_element else None
-                doi_text = doi_text.replace("https://doi.org/", "")
-            except Exception as e:
-                browser = Chromium()
-                tab = browser.latest_tab
-                tab.get(url)
-                abstract_elements = tab.eles("tag:div@class=article-section__content en main")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                # 提取 DOI 链接
-                doi_element = tab.eles('tag:a@class=epub-doi')
-                doi_text = doi_element[0].attr('href') if doi_element else None
-                doi_text = doi_text.replace("https://doi.org/","")
-                browser.quit(timeout=3)
-
-            if abstract:
-                translation = gpt_translate(abstract)
-            else:
-                log.info("未找到摘要")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-                translation = None
+    log.info(f"使用 Crossref 摘要：{doi_text}")
+    translation = translator.submit(abstract)
+    reference = citation_from_work(doi_text, work)
+    reference["abstract"] = abstract
+    reference["translation"] = translation.result()
+    return reference
 
-            if doi_text:
-                reference = get_apa_citation(doi_text)
+async def resolve_by_doi_async(url):
+    """
+    resolve_by_doi 的异步版本。
+    """
+    if not _doi_first_enabled():
+        return None
+    doi_text = crossref.doi_from_url(url)
+    if not doi_text:
+        metrics.incr("doi_first_total", result="no_doi")
+        return None
 
-                reference["abstract"] = abstract
-                reference["translation"] = translation
-            else:
-                log.info("DOI 链接未找到")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-
-        elif 'www.liebertpub.com' in url:
-            try:
-                abstract_elements = page.eles("tag:section@id=abstract")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                doi_element = page.eles('tag:a@property=sameAs')
-                doi_text = doi_element[0].attr('href') if doi_element else None
-                doi_text = doi_text.replace("https://doi.org/", "")
-            except Exception as e:
-                browser = Chromium()
-                tab = browser.latest_tab
-                tab.get(url)
-                abstract_elements = tab.eles("tag:section@id=abstract")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                # 提取 DOI 链接
-                doi_element = tab.eles('tag:a@property=sameAs')
-                doi_text = doi_element[0].attr('href') if doi_element else None
-                doi_text = doi_text.replace("https://doi.org/","")
-                browser.quit(timeout=3)
-
-            if abstract:
-                translation = gpt_translate(abstract)
-            else:
-                log.info("未找到摘要")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-                translation = None
+    cached = result_cache.lookup(doi=doi_text)
+    if cached:
+        log.info(f"命中缓存（DOI）：{doi_text}")
+        return cached
 
-            if doi_text:
-                reference = get_apa_citation(doi_text)
+    work = await crossref.fetch_work_async(doi_text)
+    abstract = crossref.work_abstract(work)
+    if not abstract:
+        log.info(f"Crossref 没有摘要，改为抓取页面：{url}")
+        metrics.incr("doi_first_total", result="no_abstract")
+        return None
+    metrics.incr("doi_first_total", result="hit")
 
-                reference["abstract"] = abstract
-                reference["translation"] = translation
-            else:
-                log.info("DOI 链接未找到")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-
-        elif 'psycnet.apa.org' in url:
-            browser = Chromium()
-            tab = browser.latest_tab
-            tab.get(url)
-            abstract_elements = tab.ele("xpath=/html/body/app/main/recorddisplay/div/div/div/div[3]/div[1]/abstract/div/div/p")
-            abstract = abstract_elements.text if abstract_elements else None
-            if not abstract:
-                abstract_elements = tab.eles("tag:div@class=col-md-12 p-0")
-                abstract = abstract_elements[0].text if abstract_elements else None
-            # 提取 DOI 链接
-            doi_element = tab.eles('@text():doi.org')
-            for doi in doi_element:
-                d = doi.attr('href')
-                doi_text = d.replace("https://psycnet.apa.org/doi/", "")
-            browser.quit(timeout=3)
+    log.info(f"使用 Crossref 摘要：{doi_text}")
+    reference = citation_from_work(doi_text, work)
+    reference["abstract"] = abstract
+    reference["translation"] = await translator.translate_async(abstract)
+    return reference
 
-            if abstract:
-                translation = gpt_translate(abstract)
-            else:
-                log.info("未找到摘要")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-                translation = None
+def scrape_abstract(url):
+    """
+    按出版商规则抓取页面中的英文摘要和 DOI。规则见 modules/publishers.py。
+    :param url: 文章链接
+    :return: (abstract, doi_text) 元组，不支持的网站返回 None
+    """
+    spec = publishers.find_spec(url)
+    domain = metrics.domain_of(url)
+    if spec is None:
+        metrics.incr("unsupported_links_total", domain=domain)
+        log.info(f"不支持的网站：{url}")
+        with open("error_links.txt", "a", encoding="utf-8") as error_file:
+            error_file.write(f"{url}\n")
+        return None
 
-            if doi_text:
-                reference = get_apa_citation(doi_text)
+    if spec.browser != "always":
+        try:
+            with metrics.timer("page_fetch", domain=domain):
+                page = _session_page()
+                page.get(url, retry=1, interval=1, timeout=3)
+                abstract, doi_text = publishers.extract(spec, page)
+            if spec.browser == "never" or (abstract and doi_text):
+                return abstract, doi_text
+            reason = "incomplete"
+        except Exception as e:
+            log.info(f"{spec.name} 页面解析出错：{e}")
+            if spec.browser == "never":
+                return None, None
+            reason = "error"
+        metrics.incr("fallback_total", stage="browser", reason=reason, domain=domain)
+
+    # 会话页面拿不到内容时（动态渲染、反爬），用浏览器重新加载
+    with metrics.timer("browser_fetch", domain=domain):
+        with browser_tab(url) as tab:
+            return publishers.extract(spec, tab)
+
+def _build_reference(url, abstract, doi_text):
+    """
+    根据摘要和 DOI 生成参考文献字典：先按 DOI 查缓存，未命中再翻译摘要并获取 APA 引用。
+    :param url: 文章链接，用于记录出错链接
+    :param abstract: 英文摘要
+    :param doi_text: 文档的 DOI
+    :return: 参考文献字典，未找到 DOI 时返回 None
+    """
+    if doi_text:
+        cached = result_cache.lookup(doi=doi_text)
+        if cached:
+            log.info(f"命中缓存（DOI）：{doi_text}")
+            return cached
 
-                reference["abstract"] = abstract
-                reference["translation"] = translation
-            else:
-                log.info("DOI 链接未找到")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-
-        elif 'www.mdpi.com' in url:
-            try:
-                abstract_elements = page.eles("tag:div@class=html-p")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                log.info(abstract)
-                doi_element = page.eles('@text():doi.org')
-                for doi in doi_element:
-                    log.info(doi)
-                    d = doi.attr('href')
-                    log.info(d)
-                    if isinstance(d, str) and 'doi.org' in d:
-                        doi_text = d.replace("https://doi.org/", "")
-                        break
-                    else:
-                        doi_text = None
-            except Exception as e:
-
-                browser = Chromium()
-                tab = browser.latest_tab
-                tab.get(url)
-                abstract_elements = tab.eles("tag:div@class=html-p")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                # 提取 DOI 链接
-                doi_element = tab.eles('@text():doi.org')
-                for doi in doi_element:
-                    d = doi.attr('href')
-                    if isinstance(d, str) and 'doi.org' in d:
-                        doi_text = d.replace("https://doi.org/", "")
-                        break
-                    else:
-                        doi_text = None
-                browser.quit(timeout=3)
-
-            if abstract:
-                translation = gpt_translate(abstract)
-            else:
-                log.info("未找到摘要")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-                translation = None
+    # 先提交翻译，在等待翻译的同时获取 APA 引用
+    if abstract:
+        translation = translator.submit(abstract)
+    else:
+        log.info("未找到摘要")
+        with open("error_links.txt", "a", encoding="utf-8") as error_file:
+            error_file.write(f"{url}\n")
+        translation = None
 
-            if doi_text:
-                reference = get_apa_citation(doi_text)
+    if doi_text:
+        reference = get_apa_citation(doi_text)
+        if translation is not None:
+            translation = translation.result()
 
-                reference["abstract"] = abstract
-                reference["translation"] = translation
-            else:
-                log.info("DOI 链接未找到")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-
-        elif 'academic.oup.com' in url:
-            try:
-                abstract_elements = page.eles("tag:p@class=chapter-para")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                doi_element = page.eles('@text():doi.org')
-                for doi in doi_element:
-                    d = doi.attr('href')
-                    if 'doi.org' in d:
-                        doi_text = d.replace("https://doi.org/", "")
-                    else:
-                        doi_text = None
-            except Exception as e:
-                browser = Chromium()
-                tab = browser.latest_tab
-                tab.get(url)
-                abstract_elements = tab.eles("tag:p@class=chapter-para")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                # 提取 DOI 链接
-                doi_element = tab.eles('@text():doi.org')
-                for doi in doi_element:
-                    d = doi.attr('href')
-                    if isinstance(d, str) and 'doi.org' in d:
-                        doi_text = d.replace("https://doi.org/", "")
-                        break
-                    else:
-                        doi_text = None
-                browser.quit(timeout=3)
-
-            if abstract:
-                translation = gpt_translate(abstract)
-            else:
-                log.info("未找到摘要")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-                translation = None
+        reference["abstract"] = abstract
+        reference["translation"] = translation
+        return reference
 
-            if doi_text:
-                reference = get_apa_citation(doi_text)
+    log.info("DOI 链接未找到")
+    with open("error_links.txt", "a", encoding="utf-8") as error_file:
+        error_file.write(f"{url}\n")
+    return None
 
-                reference["abstract"] = abstract
-                reference["translation"] = translation
-            else:
-                log.info("DOI 链接未找到")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-
-        elif 'www.jneurosci.org' in url:
-            try:
-                abstract_elements = page.eles("tag:p@id=p-5")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                doi_element = page.eles('tag:span@class=highwire-cite-metadata-doi highwire-cite-metadata')
-                doi_text = doi_element[0].text if doi_element else None
-                doi_text = doi_text.replace("https://doi.org/", "")
-            except Exception as e:
-                browser = Chromium()
-                tab = browser.latest_tab
-                tab.get(url)
-                abstract_elements = tab.eles("tag:p@id=p-5")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                # 提取 DOI 链接
-                doi_element = tab.eles('tag:span@class=highwire-cite-metadata-doi highwire-cite-metadata')
-                doi_text = doi_element[0].text if doi_element else None
-                doi_text = doi_text.replace("https://doi.org/","")
-                browser.quit(timeout=3)
-
-            if abstract:
-                translation = gpt_translate(abstract)
-            else:
-                log.info("未找到摘要")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-                translation = None
+async def getabstract_async(url):
+    """
+    getabstract 的异步版本：页面抓取在线程中进行，翻译和 Crossref 查询异步进行。
+    :param url: 文章链接
+    :return: 参考文献字典，失败时返回 None
+    """
+    with metrics.timer("getabstract", domain=metrics.domain_of(url)):
+        return await _getabstract_async(url)
 
-            if doi_text:
-                reference = get_apa_citation(doi_text)
+async def _getabstract_async(url):
+    cached = result_cache.lookup(url=url)
+    if cached:
+        log.info(f"命中缓存：{url}")
+        return cached
 
-                reference["abstract"] = abstract
-                reference["translation"] = translation
-            else:
-                log.info("DOI 链接未找到")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-
-        elif 'direct.mit.edu' in url:
-            try:
-                abstract_elements = page.eles("tag:section@class=abstract")
-                abstract = abstract_elements[0].text if abstract_elements else None
-
-                doi_element = page.eles('@text():doi.org')
-                for doi in doi_element:
-                    d = doi.attr('href')
-                    if isinstance(d, str) and 'doi.org' in d:
-                        doi_text = d.replace("https://doi.org/", "")
-                        break
-                    else:
-                        doi_text = None
-
-            except Exception as e:
-                browser = Chromium()
-                tab = browser.latest_tab
-                tab.get(url)
-                abstract_elements = tab.eles("tag:section@class=abstract")
-                abstract = abstract_elements[0].text if abstract_elements else None
-
-                # 提取 DOI 链接
-                doi_element = tab.eles('@text():doi.org')
-                for doi in doi_element:
-                    d = doi.attr('href')
-                    if isinstance(d, str) and 'doi.org' in d:
-                        doi_text = d.replace("https://doi.org/", "")
-                        break
-                    else:
-                        doi_text = None
-                browser.quit(timeout=3)
-
-            if abstract:
-                translation = gpt_translate(abstract)
-            else:
-                log.info("未找到摘要")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-                translation = None
+    try:
+        reference = await resolve_by_doi_async(url)
+        if reference is None:
+            scraped = await asyncio.to_thread(scrape_abstract, url)
+            if scraped is None:
+                return None
+            abstract, doi_text = scraped
+            reference = await _build_reference_async(url, abstract, doi_text)
 
-            if doi_text:
-                reference = get_apa_citation(doi_text)
+        if reference:
+            result_cache.store(reference, url=url)
+            return reference
 
-                reference["abstract"] = abstract
-                reference["translation"] = translation
-            else:
-                log.info("DOI 链接未找到")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-
-        elif 'www.pnas.org' in url:
-            try:
-                abstract_elements = page.eles("tag:div@id=abstracts")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                doi_element = page.eles('tag:a@property=sameAs')
-                doi_text = doi_element[0].attr('href') if doi_element else None
-                doi_text = doi_text.replace("https://doi.org/", "")
-            except Exception as e:
-                browser = Chromium()
-                tab = browser.latest_tab
-                tab.get(url)
-                abstract_elements = tab.eles("tag:div@id=abstracts")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                # 提取 DOI 链接
-                doi_element = tab.eles('tag:a@property=sameAs')
-                doi_text = doi_element[0].attr('href') if doi_element else None
-                doi_text = doi_text.replace("https://doi.org/","")
-                browser.quit(timeout=3)
-
-            if abstract:
-                translation = gpt_translate(abstract)
-            else:
-                log.info("未找到摘要")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-                translation = None
+    except Exception as e:
+        with open("error_links.txt", "a", encoding="utf-8") as error_file:
+            error_file.write(f"{url}\n")
+        log.info(f"Error: {e}")
 
-            if doi_text:
-                reference = get_apa_citation(doi_text)
+async def _build_reference_async(url, abstract, doi_text):
+    """
+    _build_reference 的异步版本，翻译与 APA 引用查询并发进行。
+    """
+    if doi_text:
+        cached = result_cache.lookup(doi=doi_text)
+        if cached:
+            log.info(f"命中缓存（DOI）：{doi_text}")
+            return cached
 
-                reference["abstract"] = abstract
-                reference["translation"] = translation
-            else:
-                log.info("DOI 链接未找到")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-
-        elif 'pmc.ncbi.nlm.nih.gov' in url:
-            try:
-                abstract_elements = page.eles("tag:section@@class=abstract@@id=abstract1")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                doi_element = page.eles('tag:a@class=usa-link usa-link--external')
-                doi_text = doi_element[0].attr('href') if doi_element else None
-                doi_text = doi_text.replace("https://doi.org/", "")
-            except Exception as e:
-                browser = Chromium()
-                tab = browser.latest_tab
-                tab.get(url)
-                abstract_elements = tab.eles("tag:section@@class=abstract@@id=abstract1")
-                abstract = abstract_elements[0].text if abstract_elements else None
-                # 提取 DOI 链接
-                doi_element = tab.eles('tag:a@class=usa-link usa-link--external')
-                doi_text = doi_element[0].attr('href') if doi_element else None
-                doi_text = doi_text.replace("https://doi.org/","")
-                browser.quit(timeout=3)
-
-            if abstract:
-                translation = gpt_translate(abstract)
-            else:
-                log.info("未找到摘要")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
-                translation = None
+    if not abstract:
+        log.info("未找到摘要")
+        with open("error_links.txt", "a", encoding="utf-8") as error_file:
+            error_file.write(f"{url}\n")
 
-            if doi_text:
-                reference = get_apa_citation(doi_text)
+    if not doi_text:
+        log.info("DOI 链接未找到")
+        with open("error_links.txt", "a", encoding="utf-8") as error_file:
+            error_file.write(f"{url}\n")
+        return None
 
-                reference["abstract"] = abstract
-                reference["translation"] = translation
-            else:
-                log.info("DOI 链接未找到")
-                with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                    error_file.write(f"{url}\n")
+    if abstract:
+        translation, reference = await asyncio.gather(
+            translator.translate_async(abstract),
+            get_apa_citation_async(doi_text),
+        )
+    else:
+        translation = None
+        reference = await get_apa_citation_async(doi_text)
 
-        else:
-            with open("error_links.txt", "a", encoding="utf-8") as error_file:
-                error_file.write(f"{url}\n")
-            pass
+    reference["abstract"] = abstract
+    reference["translation"] = translation
+    return reference
 
-        if reference:
-            return reference
-    
-    except Exception as e:
-        log.info(e.__traceback__)
-        with open("error_links.txt", "a", encoding="utf-8") as error_file:
-            error_file.write(f"{url}\n")
-        log.info(f"Error: {e}")
+@metrics.timed("citation")
+async def get_apa_citation_async(doi):
+    """
+    get_apa_citation 的异步版本。
+    :param doi: 文档的 DOI
+    :return: 参考文献字典
+    """
+    work = await crossref.fetch_work_async(doi)
+    if work is None:
+        return unknown_citation(doi)
+    return citation_from_work(doi, work)
 
+@metrics.timed("citation")
 def get_apa_citation(doi):
     """
     通过 DOI 获取论文的 APA 格式引用。
     :param doi: 文档的 DOI
     :return: APA 格式的引用字符串
     """
-    url = f"https://api.crossref.org/works/{doi}"
+    work = crossref.fetch_work(doi)
+    if work is None:
+        return unknown_citation(doi)
+    return citation_from_work(doi, work)
 
-    try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            item = data.get("message", {})
-
-            # 提取 APA 引用所需信息
-            authors = item.get("author", [])
-            title = item.get("title", [""])[0]
-            journal = item.get("container-title", [""])[0]
-            year = item.get("created", {}).get("date-parts", [[None]])[0][0]
-            volume = item.get("volume", "")
-            issue = item.get("issue", "")
-            pages = item.get("page", "")
-            doi_link = f"{doi}"
-
-            # 生成 APA 格式引用
-            author_names = ", ".join(
-                [f"{author['given']} {author['family']}" for author in authors]
-            )
-            apa_citation = (
-                f"{author_names} ({year}). {title}. *{journal}*, *{volume}*" +
-                (f"({issue})" if issue else "") +
-                f", {pages}. {doi_link}"
-            )
-
-            # 返回字典
-            return {
-                "authors": author_names,
-                "title": title,
-                "journal": journal,
-                "year": year,
-                "volume": volume,
-                "issue": issue,
-                "pages": pages,
-                "doi": "https://doi.org/{}".format(doi_link),
-                "apa_citation": apa_citation,
-            }
-
-        else:
-            log.info(f"Error: {response.status_code} - {response.text}")
-            return {
-                "authors": "Unknown",
-                "title": "Unknown",
-                "journal": "Unknown",
-                "year": "Unknown",
-                "volume": "Unknown",
-                "issue": "Unknown",
-                "pages": "Unknown",
-                "doi": "https://doi.org/{}".format(doi),
-                "apa_citation": "Unknown",
-            }
-    except Exception as e:
-        log.info(f"Error fetching APA citation: {e}")
-        return {
-            "authors": "Unknown",
-            "title": "Unknown",
-            "journal": "Unknown",
-            "year": "Unknown",
-            "volume": "Unknown",
-            "issue": "Unknown",
-            "pages": "Unknown",
-            "doi": "https://doi.org/{}".format(doi),
-            "apa_citation": "Unknown",
-        }
+def citation_from_work(doi, item):
+    """
+    根据 Crossref 返回的 work 元数据生成 APA 引用字典。
+    :param doi: 文档的 DOI
+    :param item: Crossref 响应中的 message 字段
+    :return: 参考文献字典
+    """
+    # 提取 APA 引用所需信息
+    authors = item.get("author", [])
+    title = item.get("title", [""])[0]
+    journal = item.get("container-title", [""])[0]
+    year = item.get("created", {}).get("date-parts", [[None]])[0][0]
+    volume = item.get("volume", "")
+    issue = item.get("issue", "")
+    pages = item.get("page", "")
+    doi_link = f"{doi}"
+
+    # 生成 APA 格式引用
+    author_names = ", ".join(
+        [f"{author['given']} {author['family']}" for author in authors]
+    )
+    apa_citation = (
+        f"{author_names} ({year}). {title}. *{journal}*, *{volume}*" +
+        (f"({issue})" if issue else "") +
+        f", {pages}. {doi_link}"
+    )
+
+    # 返回字典
+    return {
+        "authors": author_names,
+        "title": title,
+        "journal": journal,
+        "year": year,
+        "volume": volume,
+        "issue": issue,
+        "pages": pages,
+        "doi": "https://doi.org/{}".format(doi_link),
+        "apa_citation": apa_citation,
+    }
+
+def unknown_citation(doi):
+    """
+    Crossref 查询失败时使用的占位参考文献字典。
+    :param doi: 文档的 DOI
+    :return: 参考文献字典
+    """
+    return {
+        "authors": "Unknown",
+        "title": "Unknown",
+        "journal": "Unknown",
+        "year": "Unknown",
+        "volume": "Unknown",
+        "issue": "Unknown",
+        "pages": "Unknown",
+        "doi": "https://doi.org/{}".format(doi),
+        "apa_citation": "Unknown",
+    }
 
 def gpt_translate(text, model="gpt-4o-mini"):
     """
     使用 GPT 进行摘要翻译，专注于心理学和神经科学领域。
+    相同摘要只翻译一次，并发调用会自动合并为批量请求。
     :param text: 需要翻译的英文摘要
     :param model: 使用的 GPT 模型
     :return: 专业、优雅的中文翻译文本
     """
+    if model != translator.DEFAULT_MODEL:
+        return translator.translate_single(text, model)
+    return translator.submit(text).result()
+
+def stork_url (storkurl):
+    cached = result_cache.lookup(url=storkurl)
+    if cached:
+        log.info(f"命中缓存：{storkurl}")
+        return cached
+
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a professional translator specializing in academic research articles, "
-                        "particularly in the fields of psychology and neuroscience. Your task is to produce "
-                        "high-quality, accurate, and elegant Chinese translations of English abstracts. "
-                        "Ensure the translation retains the original meaning while using professional and precise terminology."
-                    )
-                },
-                {
-                    "role": "user",
-                    "content": (
-                        f"Translate the following academic abstract to Chinese:\n\n{text}\n\n"
-                        "Requirements:\n"
-                        "1. Maintain high accuracy and fidelity to the original meaning.\n"
-                        "2. Use professional terminology commonly used in psychology and neuroscience.\n"
-                        "3. Ensure the translation reads naturally and elegantly in Chinese."
-                    )
-                }
-            ]
-        )
-        # 提取翻译结果
-        return response.choices[0].message.content.strip()
+        scraped = scrape_stork(storkurl)
+        reference = _build_reference(storkurl, *scraped)
     except Exception as e:
-        log.info(f"调用 GPT API 进行翻译时出错：{e}")
+        log.info(f"Error: {e}")
+        with open("error_links.txt", "a", encoding="utf-8") as error_file:
+            error_file.write(f"{storkurl}\n")
         return None
 
-def stork_url (storkurl):
-    page = SessionPage()
-    reference = None
+    if reference:
+        result_cache.store(reference, url=storkurl)
+        return reference
+
+@metrics.timed("page_fetch", domain="storkapp.me")
+def scrape_stork(storkurl):
+    """
+    抓取 Stork 文章页面中的英文摘要和 DOI。
+    :param storkurl: Stork 文章链接
+    :return: (abstract, doi_text) 元组
+    """
+    page = _session_page()
     doi_text = None
     try:
         page.get(storkurl, retry=1, interval=1, timeout=3)
@@ -752,43 +411,23 @@ def stork_url (storkurl):
             else:
                 doi_text = None
     except Exception as e:
-        browser = Chromium()
-        tab = browser.latest_tab
-        tab.get(url)
-        title_element = tab.eles("tag:h1@class=h3")
-        title = title_element[0].text if title_element else None
-        abstract_element = tab.eles("tag:p@id=abstractHolder")
-        abstract = abstract_element[0].text if abstract_element else None
-        # 提取 DOI 链接
-        doi_element = tab.eles('@text():doi.org')
-        for doi in doi_element:
-            d = doi.attr('href')
-            if isinstance(d, str) and 'doi.org' in d:
-                doi_text = d.replace("https://doi.org/", "")
-                break
-            else:
-                doi_text = None
-        browser.quit(timeout=3)
-    if abstract:
-        translation = gpt_translate(abstract)
-    else:
-        log.info("未找到摘要")
-        with open("error_links.txt", "a", encoding="utf-8") as error_file:
-            error_file.write(f"{url}\n")
-        translation = None
-
-    if doi_text:
-        reference = get_apa_citation(doi_text)
-
-        reference["abstract"] = abstract
-        reference["translation"] = translation
-    else:
-        log.info("DOI 链接未找到")
-        with open("error_links.txt", "a", encoding="utf-8") as error_file:
-            error_file.write(f"{url}\n")
+        metrics.incr("fallback_total", stage="browser", reason="error", domain="storkapp.me")
+        with browser_tab(storkurl) as tab:
+            title_element = tab.eles("tag:h1@class=h3")
+            title = title_element[0].text if title_element else None
+            abstract_element = tab.eles("tag:p@id=abstractHolder")
+            abstract = abstract_element[0].text if abstract_element else None
+            # 提取 DOI 链接
+            doi_element = tab.eles('@text():doi.org')
+            for doi in doi_element:
+                d = doi.attr('href')
+                if isinstance(d, str) and 'doi.org' in d:
+                    doi_text = d.replace("https://doi.org/", "")
+                    break
+                else:
+                    doi_text = None
 
-    if reference:
-        return reference
+    return abstract, doi_text
 
 if __name__ == '__main__':
     url = "https://www.storkapp.me/paper/showPaper.php?id=1947272613&displayKey=n6ubCqAUEh"
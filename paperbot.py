@@ -1,54 +1,137 @@
-
+import sys
 from GoogleScholar import *
 from Hippocampus import *
 from Stork import *
 from markdown_write import *
 from TeleBot import *
 from modules.logger import setup_logger
+from modules.async_pipeline import run_pipeline
+from modules.mailbox import MailboxSession
+from modules import metrics
+from modules import pdf_handler
 from DrissionPage import ChromiumOptions
 
+OUTPUT_FOLDER = "output"  # 存储 txt 文件的相对路径
+MARKDOWN_FOLDER = "/Users/weibin/Documents/Memory/PaperBot"  # Markdown 文件夹的绝对路径
+# 三个邮件来源的发件人
+SENDERS = [EmailClientGoogleScholar.sender, EmailClientHippocampus.sender, EmailClientStork.sender]
 
-if __name__ == '__main__':
-    path = r'/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge'
-    ChromiumOptions().set_browser_path(path).save()
-    logger = setup_logger("PaperBot")
+
+def open_mailbox():
+    """
+    登录一次邮箱，并用一次搜索预取三个来源的未读邮件。
+    :return: 共用的 MailboxSession
+    """
+    mailbox = MailboxSession()
+    mailbox.connect()
+    mailbox.prefetch(SENDERS)
+    return mailbox
+
+
+def collect_records(*results):
+    """
+    合并各来源返回的 link_types，忽略出错时返回的 None 和空列表。
+    :return: {链接: 链接详细信息字典}
+    """
+    records = {}
+    for link_types in results:
+        if isinstance(link_types, dict):
+            records.update(link_types)
+    return records
+
+
+def run_sync(logger):
+    """
+    依次处理 Google → Hippocampus → Stork，最后统一发送 Telegram 消息并生成 Markdown。
+    三个来源共用一个邮箱连接，收集到的记录直接交给 Telegram 和 Markdown，不再重新读取 output 文件夹。
+    """
+    mailbox = open_mailbox()
     try:
-        logger.info("开始执行 PaperBot")
-        Google_email_client = EmailClientGoogleScholar()
+        Google_email_client = EmailClientGoogleScholar(mailbox)
         Google_email_client.connect()
         Google_emails = Google_email_client.fetch_Google_emails()
         logger.info("Google邮件处理完成。")
-        Google_email_client.logout()
 
-        Hippocampus_email_client = EmailClientHippocampus()
+        Hippocampus_email_client = EmailClientHippocampus(mailbox)
         Hippocampus_email_client.connect()
         Hippocampus_emails = Hippocampus_email_client.fetch_Hippocampus_emails()
-        Hippocampus_email_client.logout()
         logger.info("Hippocampus邮件处理完成。")
 
-        Stork_email_client = EmailClientStork()
+        Stork_email_client = EmailClientStork(mailbox)
         Stork_email_client.connect()
         Stork_emails = Stork_email_client.fetch_Stork_emails()
         extra_emails = Stork_email_client.check_errortxt()
         logger.info("Stork邮件处理完成。")
+    finally:
+        mailbox.logout()
+
+    records = collect_records(Google_emails, Hippocampus_emails, Stork_emails, extra_emails)
+    # 创建时会继续发送上次运行未送达的消息
+    bot = TelegramBot(BOT_TOKEN, CHAT_ID)
+    if records:
+        bot.send_records(records)
+        logger.info("Telegram 消息处理完成。")
+
+        markdown_handler = MarkdownHandler(OUTPUT_FOLDER, MARKDOWN_FOLDER)
+        markdown_handler.process_records(records)
+        logger.info("Markdown 文件生成完成。")
+    else:
+        logger.info("没有新邮件，无需处理")
+        bot.flush()
 
-        if Google_emails != {} or extra_emails != [] or Stork_emails != {} or Hippocampus_emails != {}:
-            bot = TelegramBot(BOT_TOKEN, CHAT_ID)
-            OUTPUT_FOLDER = "output"  # 替换为实际路径
-            bot.process_folder(OUTPUT_FOLDER)
-            logger.info("Telegram 消息处理完成。")
 
-            output_folder = "output"  # 替换为存储 txt 文件的相对路径
-            markdown_folder = "/Users/weibin/Documents/Memory/PaperBot"  # Markdown 文件夹的绝对路径
+def run_async(logger):
+    """
+    异步模式：三个邮件来源同时处理，每篇论文完成后立即发送 Telegram 消息并生成 Markdown。
+    """
+    bot = TelegramBot(BOT_TOKEN, CHAT_ID)
+    markdown_handler = MarkdownHandler(OUTPUT_FOLDER, MARKDOWN_FOLDER)
 
-            markdown_handler = MarkdownHandler(output_folder, markdown_folder)
-            markdown_handler.process_all_txt_files()
-            logger.info("Markdown 文件生成完成。")
+    def on_record(link, details):
+        bot.send_record(link, details)
+        markdown_handler.process_record(link, details)
+
+    mailbox = open_mailbox()
+    Stork_email_client = EmailClientStork(mailbox)
+    sources = [
+        ("Google", EmailClientGoogleScholar(mailbox)),
+        ("Hippocampus", EmailClientHippocampus(mailbox)),
+        ("Stork", Stork_email_client),
+    ]
+    try:
+        results = run_pipeline(sources, on_record=on_record)
+    finally:
+        mailbox.logout()
+    for name, link_types in results.items():
+        logger.info(f"{name}邮件处理完成，共 {len(link_types)} 篇。")
+
+    # 重新处理之前出错的链接
+    extra_emails = Stork_email_client.check_errortxt() or {}
+    for link, details in extra_emails.items():
+        on_record(link, details)
+    bot.flush()
+    logger.info("Telegram 消息处理完成。")
+
+    if not extra_emails and not any(results.values()):
+        logger.info("没有新邮件，无需处理")
+
+
+if __name__ == '__main__':
+    path = r'/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge'
+    ChromiumOptions().set_browser_path(path).save()
+    logger = setup_logger("PaperBot")
+    try:
+        logger.info("开始执行 PaperBot")
+        # 使用 --async 或 PAPERBOT_ASYNC=1 启用异步流水线
+        if "--async" in sys.argv or os.getenv("PAPERBOT_ASYNC") == "1":
+            run_async(logger)
         else:
-            logger.info("没有新邮件，无需处理")
+            run_sync(logger)
 
     except Exception as e:
         logger.info(f"PaperBot 执行时出错：{e}")
     finally:
+        pdf_handler.close_pool()
+        # 各阶段耗时写入日志，指标报告保存到 logs 文件夹
+        metrics.write_reports()
         logger.info("PaperBot 执行结束。")
-